@@ -169,3 +169,90 @@ except KeyError:
         port=get_from_env('RABBITMQ_PORT', '5672'),
     )
 CELERY_TIMEZONE = TIME_ZONE
+
+# Users' tweets are synced by plan_tweet_syncs_task every TWEET_SYNC_PLAN_INTERVAL seconds.
+# Each run queues at most TWEET_SYNC_BUDGET syncs, spread evenly over the interval.
+SYNC_TWEETS_ON_PAGE_VIEW = False
+TWEET_SYNC_PLAN_INTERVAL = 300
+TWEET_SYNC_BUDGET = 300
+
+# Recurring tweets are scheduled by expand_recurring_tweets_task every RECURRING_TWEET_EXPAND_INTERVAL seconds,
+# one occurrence at a time as they come within RECURRING_TWEET_HORIZON seconds, which has to be the longer of the two.
+# The create form previews the next RECURRING_TWEET_PREVIEW_SIZE occurrences.
+RECURRING_TWEET_EXPAND_INTERVAL = 300
+RECURRING_TWEET_HORIZON = 60 * 60
+RECURRING_TWEET_PREVIEW_SIZE = 5
+
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-due-tweets': {
+        'task': 'twitterscheduler.tasks.dispatch_due_tweets_task',
+        'schedule': 10.0,
+    },
+    'plan-tweet-syncs': {
+        'task': 'twitterscheduler.tasks.plan_tweet_syncs_task',
+        'schedule': float(TWEET_SYNC_PLAN_INTERVAL),
+    },
+    'reclaim-scheduled-tweets': {
+        'task': 'twitterscheduler.tasks.reclaim_scheduled_tweets_task',
+        'schedule': 60.0,
+    },
+    'expand-recurring-tweets': {
+        'task': 'twitterscheduler.tasks.expand_recurring_tweets_task',
+        'schedule': float(RECURRING_TWEET_EXPAND_INTERVAL),
+    },
+    'archive-tweets': {
+        'task': 'twitterscheduler.tasks.archive_tweets_task',
+        'schedule': 60.0 * 60 * 24,
+    },
+}
+
+# How scheduled tweets reach the workers.
+# 'eta' - one celery task per scheduled tweet, held by the broker until its eta.
+# 'poll' - dispatch_due_tweets_task claims due scheduled tweets from the db in batches.
+TWEET_DISPATCH_MODE = os.environ.get('TWEET_DISPATCH_MODE', 'eta')
+TWEET_DISPATCH_BATCH_SIZE = 100
+
+# Retries of a tweet twitter failed to post for a reason that may pass. The wait doubles every attempt,
+# from TWEET_RETRY_BACKOFF seconds up to TWEET_RETRY_BACKOFF_MAX, and is jittered by up to half.
+TWEET_MAX_RETRIES = 5
+TWEET_RETRY_BACKOFF = 30
+TWEET_RETRY_BACKOFF_MAX = 30 * 60
+TIMELINE_PAGE_SIZE = 50
+
+# Posted tweets older than TWEET_ARCHIVE_AFTER_DAYS are moved to the archive table once a day,
+# TWEET_ARCHIVE_BATCH_SIZE per transaction.
+TWEET_ARCHIVE_AFTER_DAYS = 365
+TWEET_ARCHIVE_BATCH_SIZE = 1000
+
+# The first page of each users timelines is cached until their tweets change, or for TIMELINE_CACHE_TIMEOUT seconds.
+# The celery workers invalidate it, so processes have to share a cache, set MEMCACHED_LOCATION to one.
+# Without it every process caches in its own memory, which is only right when a single process does everything.
+TIMELINE_CACHE_TIMEOUT = 60 * 60
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        }
+    }
+
+# Authed tweepy clients kept per process, and how long the twitter SocialApp credentials are cached for.
+TWEEPY_CLIENT_CACHE_SIZE = 1000
+TWITTER_APP_CACHE_TIMEOUT = 300
+
+# Word list used to enforce Profile.require_correctly_spelled, one word per line.
+SPELLCHECK_WORDLIST = os.environ.get('SPELLCHECK_WORDLIST', '/usr/share/dict/words')
+
+# Host tweepy sends api requests to. Point it at `manage.py run_fake_twitter` to work without twitter,
+# tweepy always uses https so the fake server's certificate also has to be trusted through REQUESTS_CA_BUNDLE.
+TWITTER_API_HOST = os.environ.get('TWITTER_API_HOST', 'api.twitter.com')
+
+# Twitter's rate limits as (requests, window in seconds), per user token and per app.
+# Tasks wait for a token from both before calling twitter, see twitterscheduler.ratelimit.
+TWITTER_RATE_LIMITS = {
+    'statuses/update': {'user': (300, 3 * 60 * 60), 'app': (300, 3 * 60 * 60)},
+    'statuses/user_timeline': {'user': (900, 15 * 60), 'app': (1500, 15 * 60)},
+}
+
+# Bearer token prometheus has to send to scrape /scheduler/metrics/, the endpoint is off when it isn't set.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
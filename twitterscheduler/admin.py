@@ -1,8 +1,31 @@
 from django.contrib import admin
 
-from .models import Profile, Tweet, ScheduledTweet
+from .models import (Profile, Tweet, ArchivedTweet, ScheduledTweet, RecurringTweet, PostRecord, DeadLetter,
+                     PostingTimeBucket, RateLimitBucket)
+from .tasks import redrive_dead_letters
 
 
 admin.site.register(Profile)
 admin.site.register(Tweet)
 admin.site.register(ScheduledTweet)
+admin.site.register(RecurringTweet)
+admin.site.register(PostRecord)
+admin.site.register(ArchivedTweet)
+admin.site.register(PostingTimeBucket)
+admin.site.register(RateLimitBucket)
+
+
+@admin.register(DeadLetter)
+class DeadLetterAdmin(admin.ModelAdmin):
+    """Tweets tweet_task gave up on, newest first, to look into and re-drive once whatever broke is fixed."""
+    list_display = ('scheduled_tweet', 'error', 'api_code', 'status_code', 'permanent', 'attempts', 'created_at',
+                    'redriven_at')
+    list_filter = ('permanent', 'api_code', 'created_at')
+    list_select_related = ('scheduled_tweet__tweet__user',)
+    ordering = ('-created_at',)
+    actions = ['redrive']
+
+    def redrive(self, request, queryset):
+        redriven = redrive_dead_letters(queryset)
+        self.message_user(request, f'Sent {redriven} tweets to be posted again.')
+    redrive.short_description = 'Re-drive the selected tweets'
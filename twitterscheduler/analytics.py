@@ -0,0 +1,85 @@
+"""
+When a user tweets, as counts of their posted tweets per hour of the week, for the best time to tweet view.
+The counts live in PostingTimeBucket rows that sync_tweets_task and tweet_task add to as they save tweets,
+so reading them costs the same 168 rows however many tweets the user has.
+`manage.py rebuild_posting_times` recounts them from the tweets.
+"""
+from collections import Counter
+
+from django.db import transaction, IntegrityError
+from django.db.models import Case, When, Value, F, Count, IntegerField
+from django.db.models.functions import ExtractWeekDay, ExtractHour
+from django.utils import timezone
+
+from .models import PostingTimeBucket, Tweet, ArchivedTweet
+
+HOURS_IN_WEEK = 7 * 24
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def hour_of_week(time):
+    time = timezone.localtime(time)
+    return time.weekday() * 24 + time.hour
+
+
+def record_posting_times(user_id, times):
+    """Counts tweets the user posted at times in their buckets, with a single update once the buckets exist."""
+    counts = Counter(hour_of_week(time) for time in times if time is not None)
+    if not counts:
+        return
+    if add_to_buckets(user_id, counts) < len(counts):
+        create_buckets(user_id)
+        add_to_buckets(user_id, counts)
+
+
+def add_to_buckets(user_id, counts):
+    added = Case(*[When(hour_of_week=hour, then=Value(count)) for hour, count in counts.items()],
+                 default=Value(0), output_field=IntegerField())
+    return PostingTimeBucket.objects.filter(user_id=user_id, hour_of_week__in=counts).update(tweets=F('tweets') + added)
+
+
+def create_buckets(user_id):
+    """Creates the users empty buckets, all 168 of them so they only ever have to be created once."""
+    existing = set(PostingTimeBucket.objects.filter(user_id=user_id).values_list('hour_of_week', flat=True))
+    try:
+        with transaction.atomic():
+            PostingTimeBucket.objects.bulk_create([
+                PostingTimeBucket(user_id=user_id, hour_of_week=hour)
+                for hour in range(HOURS_IN_WEEK) if hour not in existing
+            ])
+    except IntegrityError:
+        # created by another task in the meantime
+        pass
+
+
+def rebuild_posting_times(user_ids):
+    """
+    Recounts the buckets of the users from their posted tweets, archived ones included.
+    Returns the number of tweets counted.
+    """
+    counts = Counter()
+    for tweets in [Tweet.objects.filter(is_posted=True), ArchivedTweet.objects.all()]:
+        # ExtractWeekDay counts from sunday = 1
+        rows = (tweets.filter(user_id__in=user_ids, time_posted_at__isnull=False)
+                .annotate(week_day=ExtractWeekDay('time_posted_at'), hour=ExtractHour('time_posted_at'))
+                .order_by().values('user_id', 'week_day', 'hour').annotate(tweets=Count('id')))
+        for row in rows:
+            counts[row['user_id'], (row['week_day'] + 5) % 7 * 24 + row['hour']] += row['tweets']
+    with transaction.atomic():
+        PostingTimeBucket.objects.filter(user_id__in=user_ids).delete()
+        PostingTimeBucket.objects.bulk_create([
+            PostingTimeBucket(user_id=user_id, hour_of_week=hour, tweets=counts[user_id, hour])
+            for user_id in user_ids for hour in range(HOURS_IN_WEEK)
+        ])
+    return sum(counts.values())
+
+
+def best_times(user, count=5):
+    """
+    Returns the users tweets per hour as a list of (day, [tweets in each hour of the day]) for every day,
+    and the count (day, hour, tweets) they tweeted the most at, most first.
+    """
+    tweets = dict(PostingTimeBucket.objects.filter(user=user).values_list('hour_of_week', 'tweets'))
+    week = [(day, [tweets.get(i * 24 + hour, 0) for hour in range(24)]) for i, day in enumerate(DAYS)]
+    busiest = sorted((hour for hour in tweets if tweets[hour]), key=lambda hour: (-tweets[hour], hour))[:count]
+    return week, [(DAYS[hour // 24], hour % 24, tweets[hour]) for hour in busiest]
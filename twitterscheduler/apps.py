@@ -7,3 +7,5 @@ class TwitterschedulerConfig(AppConfig):
     def ready(self):
         super().ready()
         from . import signals
+        # registers the word list system check
+        from . import spelling
@@ -0,0 +1,46 @@
+"""
+Moves old posted tweets out of the tweet table into ArchivedTweet, so the table the timelines, syncs and
+dispatcher query stays small enough to keep its indexes in memory.
+Archived tweets are still found by search and included in exports, and syncs don't save them again.
+Tweets posted through a scheduled tweet stay, their scheduling history and post records point at them.
+"""
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Tweet, ArchivedTweet, ScheduledTweet, PostRecord
+from .timeline_cache import invalidate_timelines
+
+
+def archivable_tweets(before):
+    """Returns a queryset of the posted tweets from before that can be archived."""
+    return (Tweet.objects.filter(is_posted=True, time_posted_at__lt=before)
+            .annotate(scheduled=Exists(ScheduledTweet.objects.filter(tweet=OuterRef('pk'))),
+                      recorded=Exists(PostRecord.objects.filter(tweet=OuterRef('pk'))))
+            .filter(scheduled=False, recorded=False))
+
+
+def archive_tweets(before, batch_size=1000):
+    """
+    Archives the posted tweets from before, batch_size at a time, each batch in its own transaction.
+    Returns the number of tweets archived.
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            tweets = list(archivable_tweets(before).order_by('pk')[:batch_size])
+            if not tweets:
+                return archived
+            now = timezone.now()
+            ArchivedTweet.objects.bulk_create([
+                ArchivedTweet(id=tweet.id, tweet_id=tweet.tweet_id, user_id=tweet.user_id, text=tweet.text,
+                              sentiment=tweet.sentiment, time_posted_at=tweet.time_posted_at, archived_at=now)
+                for tweet in tweets
+            ])
+            # nothing references these tweets, so they are deleted directly instead of through the orm,
+            # which would fetch them again and send a post_delete signal for each one
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {Tweet._meta.db_table} WHERE id IN ({", ".join(["%s"] * len(tweets))})',
+                               [tweet.id for tweet in tweets])
+        invalidate_timelines({tweet.user_id for tweet in tweets})
+        archived += len(tweets)
@@ -0,0 +1,211 @@
+"""
+End to end benchmarks of the index view, sync_tweets_task and the dispatch of scheduled tweets,
+run against synthetic data and the fake twitter api. See `manage.py run_benchmarks`.
+
+Every benchmark returns a dict of metrics. Metrics ending in _ms and queries are better lower,
+metrics ending in _per_second are better higher, compare_results uses that to find regressions.
+"""
+import contextlib
+import datetime
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from allauth.socialaccount.models import SocialApp, SocialAccount, SocialToken
+from celery.utils import uuid
+
+from .importer import bulk_create
+from .models import Tweet, ScheduledTweet
+from .tasks import sync_tweets_task, tweet_task, dispatch_due_tweets_task
+from .timeline_cache import invalidate_timelines
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def timing_metrics(name, seconds):
+    """p50, p95 and max of a list of durations, in milliseconds."""
+    milliseconds = [second * 1000 for second in seconds]
+    return {
+        f'{name}_p50_ms': round(statistics.median(milliseconds), 3),
+        f'{name}_p95_ms': round(percentile(milliseconds, 95), 3),
+        f'{name}_max_ms': round(max(milliseconds), 3),
+    }
+
+
+def create_twitter_app():
+    app, created = SocialApp.objects.get_or_create(provider='twitter', name='twitter',
+                                                   defaults={'client_id': 'bench', 'secret': 'bench'})
+    return app
+
+
+def create_user(app, username):
+    """Creates a user with a twitter token, their access token is their username."""
+    user = User.objects.create_user(username)
+    account = SocialAccount.objects.create(user=user, provider='twitter', uid=username)
+    SocialToken.objects.create(account=account, app=app, token=username, token_secret=username)
+    return user
+
+
+def seed(scale, users):
+    """
+    Creates users with scale posted tweets each, and scale / 10 tweets scheduled a minute apart from tomorrow on.
+    Returns the users.
+    """
+    app = create_twitter_app()
+    now = timezone.now()
+    seeded_users = []
+    for n in range(users):
+        user = create_user(app, f'bench_{scale}_{n}')
+        bulk_create(Tweet, [
+            Tweet(user=user, tweet_id=str(i), text=f'posted tweet {i}', is_posted=True,
+                  time_posted_at=now - datetime.timedelta(minutes=i))
+            for i in range(1, scale + 1)
+        ])
+        scheduled = bulk_create(Tweet, [Tweet(user=user, text=f'scheduled tweet {i}') for i in range(scale // 10)])
+        bulk_create(ScheduledTweet, [
+            ScheduledTweet(tweet=tweet, task_id=uuid(), time_to_tweet=now + datetime.timedelta(days=1, minutes=i))
+            for i, tweet in enumerate(scheduled)
+        ])
+        seeded_users.append(user)
+    return seeded_users
+
+
+def benchmark_index_view(users, requests):
+    """
+    Latency and query count of the index view, for requests page views spread over the users.
+    Every page view is timed cold, just after the users cached timelines are dropped, and then warm.
+    """
+    client = Client()
+    url = reverse('twitterscheduler:index')
+    durations = {'cold': [], 'warm': []}
+    queries = {'cold': 0, 'warm': 0}
+    for i in range(requests):
+        user = users[i % len(users)]
+        client.force_login(user)
+        invalidate_timelines([user.id])
+        for cache_state in ['cold', 'warm']:
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(url)
+                durations[cache_state].append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+            queries[cache_state] = max(queries[cache_state], len(context.captured_queries))
+    return dict(timing_metrics('cold_latency', durations['cold']), **timing_metrics('warm_latency', durations['warm']),
+                cold_queries=queries['cold'], warm_queries=queries['warm'], requests=requests)
+
+
+def benchmark_sync(twitter, scale, syncs):
+    """Time taken by sync_tweets_task to save the scale tweets on the timeline of a new user."""
+    app = create_twitter_app()
+    twitter.timeline_size = scale
+    durations = []
+    for n in range(syncs):
+        user = create_user(app, f'bench_sync_{scale}_{n}')
+        start = time.perf_counter()
+        sync_tweets_task(user.username)
+        durations.append(time.perf_counter() - start)
+        assert Tweet.objects.filter(user=user).count() == scale
+    return dict(timing_metrics('sync', durations),
+                tweets_per_second=round(scale * syncs / sum(durations), 3), syncs=syncs)
+
+
+def benchmark_dispatch(twitter, users, tweets, window, workers, poll_interval=0.05):
+    """
+    Lag between time_to_tweet and the fake api receiving the tweet,
+    for tweets scheduled over the next window seconds and dispatched by dispatch_due_tweets_task
+    to a pool of workers threads standing in for the celery workers.
+    """
+    start = timezone.now() + datetime.timedelta(seconds=1)
+    scheduled = bulk_create(Tweet, [
+        Tweet(user=users[i % len(users)], text=f'dispatched tweet {i} {start.timestamp()}') for i in range(tweets)
+    ])
+    due_times = {}
+    scheduled_tweets = []
+    for i, tweet in enumerate(scheduled):
+        due = start + datetime.timedelta(seconds=window * i / tweets)
+        due_times[tweet.text] = due.timestamp()
+        scheduled_tweets.append(ScheduledTweet(tweet=tweet, time_to_tweet=due))
+    bulk_create(ScheduledTweet, scheduled_tweets)
+
+    posted_before = len(twitter.posts)
+    pool = ThreadPoolExecutor(workers)
+    errors = []
+    # sqlite's in-memory test database fails rather than waits on concurrent writes, so there tasks run one at a time
+    database_lock = threading.Lock() if connection.vendor == 'sqlite' else contextlib.suppress()
+
+    def run_tweet_task(*args):
+        try:
+            with database_lock:
+                tweet_task(*args)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def apply_async(args, **options):
+        pool.submit(run_tweet_task, *args)
+
+    deadline = time.time() + window + 60
+    with override_settings(TWEET_DISPATCH_MODE='poll'), mock.patch.object(tweet_task, 'apply_async', apply_async):
+        while len(twitter.posts) - posted_before + len(errors) < tweets and time.time() < deadline:
+            with database_lock:
+                dispatch_due_tweets_task()
+            time.sleep(poll_interval)
+    pool.shutdown()
+
+    posts = [(posted_at, text) for posted_at, token, text in twitter.posts[posted_before:] if text in due_times]
+    result = dict(posted=len(posts), errors=len(errors), tweets=tweets, posts_per_second=0)
+    if not posts:
+        # no lag to report, and a throughput of 0 shows up as a regression against any baseline
+        return result
+    lags = [posted_at - due_times[text] for posted_at, text in posts]
+    elapsed = max(posted_at for posted_at, text in posts) - start.timestamp()
+    return dict(result, posts_per_second=round(len(posts) / elapsed, 3), **timing_metrics('lag', lags))
+
+
+def run_benchmarks(twitter, scales, users=10, requests=50, syncs=3, dispatch_tweets=100, dispatch_window=2.0,
+                   workers=4):
+    """Seeds each scale in turn and runs every benchmark against it. Returns a list of results."""
+    results = []
+    for scale in scales:
+        seeded_users = seed(scale, users)
+        results.append(dict(benchmark='index_view', scale=scale, **benchmark_index_view(seeded_users, requests)))
+        results.append(dict(benchmark='sync', scale=scale, **benchmark_sync(twitter, scale, syncs)))
+        results.append(dict(benchmark='dispatch', scale=scale,
+                            **benchmark_dispatch(twitter, seeded_users, dispatch_tweets, dispatch_window, workers)))
+    return results
+
+
+def compare_results(baseline, results, tolerance):
+    """Returns a message for every metric of results that is more than tolerance worse than in baseline."""
+    baseline = {(result['benchmark'], result['scale']): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result['benchmark'], result['scale']))
+        if previous is None:
+            continue
+        for metric, value in result.items():
+            if metric not in previous or not isinstance(value, (int, float)):
+                continue
+            if metric.endswith('_ms') or metric.endswith('queries'):
+                worse = value > previous[metric] * (1 + tolerance)
+            elif metric.endswith('_per_second'):
+                worse = value < previous[metric] * (1 - tolerance)
+            else:
+                worse = False
+            if worse:
+                regressions.append(f'{result["benchmark"]} at scale {result["scale"]}: '
+                                   f'{metric} {previous[metric]} -> {value}')
+    return regressions
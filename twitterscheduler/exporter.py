@@ -0,0 +1,57 @@
+"""
+Export of a users tweets, archived tweets and scheduled tweets as CSV or JSON lines.
+Rows are read with QuerySet.iterator(), a server-side cursor on postgres, and written out one at a time,
+so memory stays the same however many tweets the user has.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Tweet, ArchivedTweet, ScheduledTweet
+
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson; charset=utf-8'}
+FIELDS = ['type', 'id', 'tweet', 'tweet_id', 'text', 'sentiment', 'is_posted', 'time_posted_at', 'time_to_tweet',
+          'status']
+
+
+class Echo:
+    """A file-like object csv.writer can write to that hands back what was written instead of keeping it."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(user):
+    """Yields a dict for each of the users tweets, then their archived tweets, then their scheduled tweets."""
+    tweets = (Tweet.objects.filter(user=user).order_by('id')
+              .values('id', 'tweet_id', 'text', 'sentiment', 'is_posted', 'time_posted_at'))
+    for row in tweets.iterator():
+        yield dict(row, type='tweet')
+
+    archived_tweets = (ArchivedTweet.objects.filter(user=user).order_by('id')
+                       .values('id', 'tweet_id', 'text', 'sentiment', 'time_posted_at'))
+    for row in archived_tweets.iterator():
+        yield dict(row, type='archived_tweet', is_posted=True)
+
+    scheduled_tweets = (ScheduledTweet.objects.filter(tweet__user=user).order_by('id')
+                        .values('id', 'tweet', 'tweet__text', 'time_to_tweet', 'status'))
+    for row in scheduled_tweets.iterator():
+        row['text'] = row.pop('tweet__text')
+        yield dict(row, type='scheduled_tweet')
+
+
+def export_lines(user, file_format):
+    """Yields the lines of the users export in file_format, starting with a header row for csv."""
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(FIELDS)
+        for row in export_rows(user):
+            yield writer.writerow([
+                value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in (row.get(field, '') for field in FIELDS)
+            ])
+    else:
+        for row in export_rows(user):
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
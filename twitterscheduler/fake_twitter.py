@@ -0,0 +1,227 @@
+"""
+A local stand-in for the parts of the twitter api the scheduler uses, statuses/update and statuses/user_timeline.
+Used to measure posting throughput and sync cost without talking to twitter, see `manage.py run_fake_twitter`.
+
+tweepy always talks https, so every server makes itself a self signed localhost certificate with the openssl
+command, in a temporary directory that is removed when the server is closed.
+Point tweepy at it with the TWITTER_API_HOST setting and trust server.certificate with REQUESTS_CA_BUNDLE.
+"""
+import datetime
+import json
+import os
+import random
+import re
+import shutil
+import ssl
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TIMELINE_PATH = '/1.1/statuses/user_timeline.json'
+UPDATE_PATH = '/1.1/statuses/update.json'
+
+OAUTH_TOKEN_RE = re.compile(r'oauth_token="([^"]*)"')
+
+
+class RateLimit:
+    """Fixed window request limit per access token, reported the way twitter does in the x-rate-limit-* headers."""
+
+    def __init__(self, limit, window, clock=time.time):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self.windows = {}
+
+    def hit(self, token):
+        """Counts a request for token. Returns the (remaining, reset) pair, remaining is -1 when over the limit."""
+        now = self.clock()
+        reset, used = self.windows.get(token, (0, 0))
+        if now >= reset:
+            reset, used = int(now) + self.window, 0
+        used += 1
+        self.windows[token] = (reset, used)
+        return self.limit - used if used <= self.limit else -1, reset
+
+
+class FakeTwitter:
+    """
+    The state of the fake api: every users timeline and the tweets posted to it.
+    Each user starts with timeline_size tweets, one an hour going back from when they're first seen.
+    Every request waits latency seconds plus up to jitter more, and fails with a 503 with probability error_rate.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, timeline_size=0,
+                 timeline_rate_limit=900, update_rate_limit=300, rate_limit_window=15 * 60,
+                 clock=time.time, sleep=time.sleep, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeline_size = timeline_size
+        self.rate_limits = {
+            TIMELINE_PATH: RateLimit(timeline_rate_limit, rate_limit_window, clock),
+            UPDATE_PATH: RateLimit(update_rate_limit, rate_limit_window, clock),
+        }
+        self.clock = clock
+        self.sleep = sleep
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.timelines = {}
+        # (time received, access token, text) of every successful statuses/update, in order
+        self.posts = []
+
+    def new_status(self, token, text, created_at):
+        user_id = zlib.crc32(token.encode())
+        status = {
+            'id': self.next_id,
+            'id_str': str(self.next_id),
+            'text': text,
+            'created_at': created_at.strftime('%a %b %d %H:%M:%S +0000 %Y'),
+            'user': {'id': user_id, 'id_str': str(user_id), 'screen_name': f'user_{user_id}'},
+        }
+        self.next_id += 1
+        return status
+
+    def timeline(self, token):
+        """Returns the users statuses, oldest first. Must be called with the lock held."""
+        if token not in self.timelines:
+            now = datetime.datetime.utcfromtimestamp(self.clock())
+            self.timelines[token] = [
+                self.new_status(token, f'fake tweet {i}', now - datetime.timedelta(hours=self.timeline_size - i))
+                for i in range(self.timeline_size)
+            ]
+        return self.timelines[token]
+
+    def handle(self, method, path, params, token):
+        """Returns the (status code, headers, body) of the response to a request."""
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            self.sleep(delay)
+
+        with self.lock:
+            if self.random.random() < self.error_rate:
+                return 503, {}, errors(130, 'Over capacity')
+
+            route = (method, path)
+            if route not in [('GET', TIMELINE_PATH), ('POST', UPDATE_PATH)]:
+                return 404, {}, errors(34, 'Sorry, that page does not exist.')
+
+            remaining, reset = self.rate_limits[path].hit(token)
+            headers = {
+                'x-rate-limit-limit': str(self.rate_limits[path].limit),
+                'x-rate-limit-remaining': str(max(remaining, 0)),
+                'x-rate-limit-reset': str(reset),
+            }
+            if remaining < 0:
+                return 429, headers, errors(88, 'Rate limit exceeded')
+
+            if path == UPDATE_PATH:
+                return self.update(token, params.get('status', ''), headers)
+            return self.user_timeline(token, params, headers)
+
+    def update(self, token, text, headers):
+        timeline = self.timeline(token)
+        if any(status['text'] == text for status in timeline[-100:]):
+            return 403, headers, errors(187, 'Status is a duplicate.')
+        now = self.clock()
+        status = self.new_status(token, text, datetime.datetime.utcfromtimestamp(now))
+        timeline.append(status)
+        self.posts.append((now, token, text))
+        return 200, headers, status
+
+    def user_timeline(self, token, params, headers):
+        timeline = self.timeline(token)
+        since_id = int(params.get('since_id') or 0)
+        max_id = int(params.get('max_id') or self.next_id)
+        count = min(int(params.get('count') or 20), 200)
+        statuses = [status for status in reversed(timeline) if since_id < status['id'] <= max_id]
+        return 200, headers, statuses[:count]
+
+
+def errors(code, message):
+    return {'errors': [{'code': code, 'message': message}]}
+
+
+class FakeTwitterHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.respond()
+
+    def respond(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            params.update(parse_qs(self.rfile.read(length).decode()))
+        params = {name: values[-1] for name, values in params.items()}
+        match = OAUTH_TOKEN_RE.search(self.headers.get('Authorization', ''))
+        token = match.group(1) if match else ''
+
+        status, headers, body = self.server.twitter.handle(self.command, url.path, params, token)
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_certificate(directory):
+    """Writes a new self signed certificate for localhost and its key to directory, returns both their paths."""
+    certificate = os.path.join(directory, 'fake_twitter.crt')
+    key = os.path.join(directory, 'fake_twitter.key')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=localhost',
+        '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1', '-keyout', key, '-out', certificate,
+    ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return certificate, key
+
+
+class FakeTwitterServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, twitter, verbose=False):
+        super().__init__(address, FakeTwitterHandler)
+        self.twitter = twitter
+        self.verbose = verbose
+        self.certificate_directory = tempfile.mkdtemp(prefix='fake_twitter_')
+        self.certificate, key = make_certificate(self.certificate_directory)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.certificate, key)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    def server_close(self):
+        super().server_close()
+        shutil.rmtree(self.certificate_directory, ignore_errors=True)
+
+    def handle_error(self, request, client_address):
+        # tweepy opens a new session for every request and drops the connection without closing tls
+        if not isinstance(sys.exc_info()[1], (ssl.SSLError, ConnectionError)):
+            super().handle_error(request, client_address)
+
+    @property
+    def host(self):
+        """The value for the TWITTER_API_HOST setting."""
+        return f'localhost:{self.server_address[1]}'
+
+    def start(self):
+        """Serves from a background thread."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
@@ -1,13 +1,70 @@
 from django import forms
 
-from .models import ScheduledTweet, Tweet
+from .models import ScheduledTweet, Tweet, RecurringTweet
+from .sentiment import classify_texts, POSITIVE
+from .spelling import get_spell_checker
 
 
-class CreateScheduleTweetForm(forms.Form):
+class ScheduleTweetForm(forms.Form):
+    """
+    Tweet text and time, checked against the users profile settings when a profile is given.
+    """
     time_to_tweet = forms.DateTimeField()
     text = forms.CharField(max_length=140, widget=forms.Textarea)
 
+    def __init__(self, *args, profile=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profile = profile
 
-class ScheduledTweetUpdateForm(forms.Form):
-    time_to_tweet = forms.DateTimeField()
-    text = forms.CharField(max_length=140, widget=forms.Textarea)
+    def clean_text(self):
+        text = self.cleaned_data['text']
+        if self.profile and self.profile.require_positive_sentiment and classify_texts([text])[0] != POSITIVE:
+            raise forms.ValidationError('Your profile only allows tweets with a positive sentiment.')
+        if self.profile and self.profile.require_correctly_spelled:
+            misspelled = get_spell_checker().check(text)
+            if misspelled:
+                raise forms.ValidationError([
+                    f'"{word}" is misspelled' + (f', did you mean {", ".join(suggestions)}?' if suggestions else '.')
+                    for word, suggestions in misspelled.items()
+                ])
+        return text
+
+
+class CreateScheduleTweetForm(ScheduleTweetForm):
+    pass
+
+
+class ScheduledTweetUpdateForm(ScheduleTweetForm):
+    # the version of the scheduled tweet the form was rendered for, an edit only applies to that version
+    version = forms.IntegerField(min_value=0, widget=forms.HiddenInput)
+
+
+class ImportScheduledTweetsForm(forms.Form):
+    file = forms.FileField(help_text='CSV with a header row, or JSON lines, with time_to_tweet and text columns.')
+
+
+class RecurringTweetForm(ScheduleTweetForm):
+    WEEKDAY_CHOICES = [(str(day), name) for day, name in
+                       enumerate(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])]
+
+    time_to_tweet = None
+    frequency = forms.ChoiceField(choices=RecurringTweet.frequency_choices, initial=RecurringTweet.WEEKLY)
+    interval = forms.IntegerField(min_value=1, max_value=365, initial=1,
+                                  help_text='Posted every this many days or weeks.')
+    weekdays = forms.MultipleChoiceField(choices=WEEKDAY_CHOICES, required=False,
+                                         widget=forms.CheckboxSelectMultiple, help_text='For weekly tweets.')
+    time_of_day = forms.TimeField()
+    starts_on = forms.DateField()
+    ends_on = forms.DateField(required=False)
+
+    def clean_weekdays(self):
+        return ','.join(sorted(self.cleaned_data['weekdays']))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('frequency') == RecurringTweet.WEEKLY and not cleaned_data.get('weekdays'):
+            self.add_error('weekdays', 'Pick the days a weekly tweet is posted on.')
+        if cleaned_data.get('ends_on') and cleaned_data.get('starts_on') and \
+                cleaned_data['ends_on'] < cleaned_data['starts_on']:
+            self.add_error('ends_on', 'The last day has to be after the first one.')
+        return cleaned_data
@@ -0,0 +1,122 @@
+"""
+Bulk scheduling of tweets from CSV or JSON lines files with a time_to_tweet and a text column.
+Files are read a row at a time and saved chunk_size rows at a time,
+so memory depends on the chunk size, not on the size of the file.
+"""
+import csv
+import itertools
+import json
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from celery.utils import uuid
+
+from twitter_site.task_scheduler import app
+
+from .forms import CreateScheduleTweetForm
+from .models import Tweet, ScheduledTweet, Profile
+from .sentiment import classify_tweets
+from .tasks import tweet_task
+from .timeline_cache import invalidate_timelines
+
+FORMATS = ('csv', 'jsonl')
+# only the first errors are kept so a bad file can't use up memory
+MAX_ERRORS = 100
+
+
+class ImportResult:
+
+    def __init__(self):
+        self.imported = 0
+        self.invalid = 0
+        self.errors = []
+
+    def add_error(self, line_number, error):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line_number, error))
+
+
+def format_for_filename(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    return 'jsonl' if extension in ('jsonl', 'json', 'ndjson') else 'csv'
+
+
+def read_rows(lines, file_format):
+    """Yields (line_number, row dict) for each row of the file. Rows that can't be parsed are yielded as None."""
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+
+
+def import_scheduled_tweets(user, lines, file_format, chunk_size=500):
+    """Validates and schedules the tweets in lines for user. Returns an ImportResult."""
+    profile = Profile.objects.get(user=user)
+    result = ImportResult()
+    rows = read_rows(lines, file_format)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return result
+
+        valid = []
+        for line_number, row in chunk:
+            if row is None:
+                result.add_error(line_number, 'Could not parse this line.')
+                continue
+            form = CreateScheduleTweetForm(row, profile=profile)
+            if form.is_valid():
+                valid.append(form.cleaned_data)
+            else:
+                result.add_error(line_number, '; '.join(f'{field}: {" ".join(errors)}'
+                                                        for field, errors in form.errors.items()))
+        schedule_tweets(user, valid)
+        result.imported += len(valid)
+
+
+def schedule_tweets(user, tweets_data):
+    """
+    Saves a Tweet and ScheduledTweet for each dict of cleaned form data with two inserts.
+    In 'eta' mode the tweet tasks are sent once the rows are committed, all over one broker connection.
+    """
+    eta_mode = settings.TWEET_DISPATCH_MODE == 'eta'
+    with transaction.atomic():
+        tweets = classify_tweets([Tweet(user=user, text=data['text']) for data in tweets_data])
+        tweets = bulk_create(Tweet, tweets)
+        scheduled_tweets = bulk_create(ScheduledTweet, [
+            ScheduledTweet(tweet=tweet, time_to_tweet=data['time_to_tweet'], task_id=uuid() if eta_mode else None)
+            for tweet, data in zip(tweets, tweets_data)
+        ])
+        if eta_mode:
+            transaction.on_commit(lambda: send_tweet_tasks(user.username, scheduled_tweets))
+    # bulk inserts don't send the signals that invalidate the cache
+    invalidate_timelines([user.id])
+    return scheduled_tweets
+
+
+def send_tweet_tasks(username, scheduled_tweets):
+    with app.producer_or_acquire() as producer:
+        for scheduled_tweet in scheduled_tweets:
+            tweet_task.apply_async((username, scheduled_tweet.id, scheduled_tweet.version),
+                                   eta=scheduled_tweet.time_to_tweet,
+                                   task_id=scheduled_tweet.task_id, producer=producer)
+
+
+def bulk_create(model, objs):
+    """bulk_create that sets the primary keys of objs, which only some databases return from a bulk insert."""
+    if connection.features.can_return_ids_from_bulk_insert:
+        return model.objects.bulk_create(objs)
+    for obj in objs:
+        obj.save()
+    return objs
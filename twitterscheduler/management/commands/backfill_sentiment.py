@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from twitterscheduler.models import Tweet
+from twitterscheduler.sentiment import backfill_sentiment
+
+
+class Command(BaseCommand):
+    help = 'Scores the sentiment of tweets saved before sentiment scoring existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true',
+                            help='Rescore every tweet, not just the ones with an unknown sentiment.')
+
+    def handle(self, *args, **options):
+        tweets = Tweet.objects.all() if options['all'] else Tweet.objects.filter(sentiment='u')
+        scored = backfill_sentiment(tweets, chunk_size=options['chunk_size'])
+        self.stdout.write(f'Scored {scored} tweets')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from twitterscheduler.models import Profile
+from twitterscheduler.tasks import sync_tweets_task
+
+
+class Command(BaseCommand):
+    help = "Queues a sync of each user's whole twitter timeline, not just the tweets since their last sync."
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Users to backfill. Defaults to every user.')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.all()
+        if options['usernames']:
+            profiles = profiles.filter(user__username__in=options['usernames'])
+
+        for profile in profiles.select_related('user'):
+            # claimed like any other sync, so it can't run alongside one and the claim sync_tweets_task releases is ours
+            if profile.claim_sync():
+                sync_tweets_task.delay(profile.user.username, backfill=True)
+                self.stdout.write(f'Queued backfill for {profile.user.username}')
+            else:
+                self.stdout.write(f'Skipped {profile.user.username}, a sync is already queued')
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from twitterscheduler.importer import import_scheduled_tweets, format_for_filename, FORMATS
+
+
+class Command(BaseCommand):
+    help = 'Schedules the tweets in a CSV or JSON lines file with time_to_tweet and text columns for a user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to guessing from the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'No user named {options["username"]}')
+
+        file_format = options['format'] or format_for_filename(options['path'])
+        with open(options['path'], encoding='utf-8', newline='') as lines:
+            result = import_scheduled_tweets(user, lines, file_format, chunk_size=options['chunk_size'])
+
+        for line_number, error in result.errors:
+            self.stderr.write(f'line {line_number}: {error}')
+        self.stdout.write(f'Scheduled {result.imported} tweets, skipped {result.invalid} rows')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from twitterscheduler.metrics import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = ('Recounts the posting metric counters from the PostRecords, for records saved before the counters '
+            'existed. Attempts saved while it runs may be counted twice or not at all.')
+
+    def handle(self, *args, **options):
+        counted = rebuild_counters()
+        self.stdout.write(f'Counted {counted} post records')
@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from twitterscheduler.analytics import rebuild_posting_times
+
+
+class Command(BaseCommand):
+    help = ('Recounts the posting time buckets of the best time to tweet view from the posted tweets, '
+            'for tweets saved before the buckets existed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=100, help='Users recounted at a time.')
+        parser.add_argument('--user', action='append', help='Only recount this user, can be repeated.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username__in=options['user'])
+        user_ids = list(users.values_list('id', flat=True))
+        counted = 0
+        for start in range(0, len(user_ids), options['chunk_size']):
+            counted += rebuild_posting_times(user_ids[start:start + options['chunk_size']])
+        self.stdout.write(f'Counted {counted} tweets of {len(user_ids)} users')
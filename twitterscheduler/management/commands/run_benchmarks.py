@@ -0,0 +1,95 @@
+import json
+import os
+import platform
+import subprocess
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+from django.utils import timezone
+
+from twitterscheduler.benchmarks import run_benchmarks, compare_results
+from twitterscheduler.fake_twitter import FakeTwitter, FakeTwitterServer
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks the index view, tweet syncing and scheduled tweet dispatch against synthetic data '
+            'in a throwaway test database and the fake twitter api, and writes the results as json.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='100,1000,10000',
+                            help='Comma separated numbers of tweets per user to run the benchmarks at.')
+        parser.add_argument('--users', type=int, default=10, help='Users seeded at every scale.')
+        parser.add_argument('--requests', type=int, default=50, help='Index page views timed at every scale.')
+        parser.add_argument('--syncs', type=int, default=3, help='Syncs of a whole timeline timed at every scale.')
+        parser.add_argument('--dispatch-tweets', type=int, default=200,
+                            help='Tweets scheduled for the dispatch lag benchmark.')
+        parser.add_argument('--dispatch-window', type=float, default=2.0,
+                            help='Seconds the dispatched tweets are scheduled over, 0 schedules them all at once.')
+        parser.add_argument('--workers', type=int, default=4, help='Threads posting dispatched tweets.')
+        parser.add_argument('--api-latency', type=float, default=0.05, help='Seconds every fake api request takes.')
+        parser.add_argument('--output', help='File to write the results to, defaults to stdout.')
+        parser.add_argument('--baseline', help='Results of an earlier run to compare against.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Fraction a metric may be worse than the baseline before it counts as a regression.')
+
+    def handle(self, *args, **options):
+        scales = [int(scale) for scale in options['scales'].split(',')]
+        twitter = FakeTwitter(latency=options['api_latency'], timeline_rate_limit=10 ** 6,
+                              update_rate_limit=10 ** 6)
+        server = FakeTwitterServer(('localhost', 0), twitter)
+        server.start()
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # the fake api doesn't rate limit either, so the benchmarks measure the scheduler and not twitter's limits
+            unlimited = {'user': (10 ** 9, 1), 'app': (10 ** 9, 1)}
+            rate_limits = {endpoint: unlimited for endpoint in settings.TWITTER_RATE_LIMITS}
+            with override_settings(TWITTER_API_HOST=server.host, TWITTER_RATE_LIMITS=rate_limits), \
+                    mock.patch.dict(os.environ, {'REQUESTS_CA_BUNDLE': server.certificate}):
+                results = run_benchmarks(
+                    twitter, scales,
+                    users=options['users'],
+                    requests=options['requests'],
+                    syncs=options['syncs'],
+                    dispatch_tweets=options['dispatch_tweets'],
+                    dispatch_window=options['dispatch_window'],
+                    workers=options['workers'],
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            server.shutdown()
+            server.server_close()
+
+        report = json.dumps({
+            'created_at': timezone.now().isoformat(),
+            'commit': current_commit(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'options': {name: options[name] for name in ['scales', 'users', 'requests', 'syncs', 'dispatch_tweets',
+                                                         'dispatch_window', 'workers', 'api_latency']},
+            'results': results,
+        }, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(report)
+        else:
+            self.stdout.write(report)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                regressions = compare_results(json.load(f)['results'], results, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from twitterscheduler.fake_twitter import FakeTwitter, FakeTwitterServer
+
+
+class Command(BaseCommand):
+    help = 'Runs a local fake of the twitter api to post and sync tweets against without twitter.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8443)
+        parser.add_argument('--latency', type=float, default=0.0,
+                            help='Seconds every request takes.')
+        parser.add_argument('--jitter', type=float, default=0.0,
+                            help='Up to this many seconds are randomly added to the latency.')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Fraction of requests that fail with a 503.')
+        parser.add_argument('--timeline-size', type=int, default=0,
+                            help='Number of tweets every user already has on their timeline.')
+        parser.add_argument('--timeline-rate-limit', type=int, default=900,
+                            help='statuses/user_timeline requests allowed per user per window.')
+        parser.add_argument('--update-rate-limit', type=int, default=300,
+                            help='statuses/update requests allowed per user per window.')
+        parser.add_argument('--rate-limit-window', type=int, default=15 * 60,
+                            help='Length of the rate limit window in seconds.')
+        parser.add_argument('--verbose', action='store_true', help='Log every request.')
+
+    def handle(self, *args, **options):
+        twitter = FakeTwitter(
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            timeline_size=options['timeline_size'],
+            timeline_rate_limit=options['timeline_rate_limit'],
+            update_rate_limit=options['update_rate_limit'],
+            rate_limit_window=options['rate_limit_window'],
+        )
+        server = FakeTwitterServer(('localhost', options['port']), twitter, verbose=options['verbose'])
+        self.stdout.write(f'Fake twitter api listening on https://{server.host}, run the site and workers with\n'
+                          f'    TWITTER_API_HOST={server.host} REQUESTS_CA_BUNDLE={server.certificate}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'{len(twitter.posts)} tweets posted')
@@ -0,0 +1,30 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from twitterscheduler.scheduler import TweetScheduler
+
+
+class Command(BaseCommand):
+    help = 'Runs the in-memory scheduler that dispatches scheduled tweets the moment they are due.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=5,
+                            help='Minutes of upcoming scheduled tweets to hold in memory.')
+        parser.add_argument('--refill-interval', type=float, default=5,
+                            help='Seconds between loading newly scheduled tweets into the window.')
+
+    def handle(self, *args, **options):
+        if settings.TWEET_DISPATCH_MODE != 'poll':
+            raise CommandError("The tweet scheduler needs TWEET_DISPATCH_MODE = 'poll'.")
+
+        scheduler = TweetScheduler(
+            window=datetime.timedelta(minutes=options['window']),
+            refill_interval=datetime.timedelta(seconds=options['refill_interval']),
+        )
+        self.stdout.write(f'Scheduling tweets due in the next {options["window"]} minutes')
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            pass
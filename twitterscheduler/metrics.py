@@ -0,0 +1,161 @@
+"""
+Posting metrics in the prometheus text format.
+The counters are MetricCounter rows tweet_task adds each attempt to as it saves its PostRecord,
+so a scrape reads a few rows however many records there are. They are shared by every process,
+so every process reports the same numbers and nothing is lost when a worker restarts.
+`manage.py rebuild_metric_counters` recounts them from the PostRecords.
+"""
+import random
+from collections import Counter
+
+from django.db import transaction, IntegrityError
+from django.db.models import Count, Sum, Min, Case, When, Value, F, FloatField, IntegerField
+from django.utils import timezone
+
+from .models import PostRecord, ScheduledTweet, DeadLetter, MetricCounter
+
+LAG_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+API_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+HISTOGRAMS = [
+    ('twitterscheduler_post_lag_seconds', 'lag', LAG_BUCKETS),
+    ('twitterscheduler_twitter_api_latency_seconds', 'api_latency', API_LATENCY_BUCKETS),
+]
+# every counter is split over this many rows, and each attempt adds to a random one,
+# so workers rarely wait on each others row locks
+COUNTER_SHARDS = 8
+
+
+def record_counts(record):
+    """Returns what a PostRecord adds to each counter."""
+    counts = Counter()
+    for name, field, buckets in HISTOGRAMS:
+        value = getattr(record, field)
+        if value is None:
+            continue
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                counts[f'{name}_le_{i}'] += 1
+        counts[f'{name}_sum'] += value
+        counts[f'{name}_count'] += 1
+    counts['failed' if record.failed else 'posted'] += 1
+    # every attempt after a failed one saves a record with retries above 0
+    if record.retries:
+        counts['retries'] += 1
+    return counts
+
+
+def save_post_record(record):
+    """Saves a PostRecord and adds it to the counters."""
+    with transaction.atomic():
+        record.save()
+        add_to_counters(record_counts(record), random.randrange(COUNTER_SHARDS))
+
+
+def add_to_counters(counts, shard):
+    while add_to_shard(counts, shard) < len(counts):
+        existing = set(MetricCounter.objects.filter(name__in=counts, shard=shard).values_list('name', flat=True))
+        counts = {name: value for name, value in counts.items() if name not in existing}
+        if create_shard(counts, shard):
+            return
+
+
+def add_to_shard(counts, shard):
+    added = Case(*[When(name=name, then=Value(value)) for name, value in counts.items()],
+                 default=Value(0), output_field=FloatField())
+    return MetricCounter.objects.filter(name__in=counts, shard=shard).update(value=F('value') + added)
+
+
+def create_shard(counts, shard):
+    """Creates counters of a shard starting at counts, returns False if another worker created one first."""
+    try:
+        with transaction.atomic():
+            MetricCounter.objects.bulk_create([
+                MetricCounter(name=name, shard=shard, value=value) for name, value in counts.items()
+            ])
+    except IntegrityError:
+        return False
+    return True
+
+
+def bucket_counts(field, buckets):
+    """Aggregates counting the rows at or below each bucket's upper bound, plus the sum and count of field."""
+    aggregates = {
+        f'le_{i}': Sum(Case(When(**{f'{field}__lte': bound, 'then': 1}), default=0, output_field=IntegerField()))
+        for i, bound in enumerate(buckets)
+    }
+    aggregates['sum'] = Sum(field)
+    aggregates['count'] = Count(field)
+    return aggregates
+
+
+def rebuild_counters():
+    """
+    Recounts the counters from every PostRecord with a single aggregate query.
+    Returns the number of records counted.
+    """
+    aggregates = {}
+    for name, field, buckets in HISTOGRAMS:
+        for key, aggregate in bucket_counts(field, buckets).items():
+            aggregates[f'{name}_{key}'] = aggregate
+    aggregates['posted'] = Count(Case(When(failed=False, then=1)))
+    aggregates['failed'] = Count(Case(When(failed=True, then=1)))
+    aggregates['retries'] = Count(Case(When(retries__gt=0, then=1)))
+    with transaction.atomic():
+        counts = PostRecord.objects.aggregate(**aggregates)
+        MetricCounter.objects.all().delete()
+        MetricCounter.objects.bulk_create([
+            MetricCounter(name=name, shard=0, value=value) for name, value in counts.items() if value
+        ])
+    return counts['posted'] + counts['failed']
+
+
+def number(value):
+    return int(value) if float(value).is_integer() else value
+
+
+def histogram(name, help_text, buckets, values):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for i, bound in enumerate(buckets):
+        lines.append(f'{name}_bucket{{le="{bound}"}} {values[f"{name}_le_{i}"] or 0}')
+    lines.append(f'{name}_bucket{{le="+Inf"}} {values[f"{name}_count"] or 0}')
+    lines.append(f'{name}_sum {values[f"{name}_sum"] or 0}')
+    lines.append(f'{name}_count {values[f"{name}_count"] or 0}')
+    return lines
+
+
+def render_metrics():
+    """Returns every metric as prometheus text."""
+    totals = MetricCounter.objects.order_by().values('name').annotate(total=Sum('value')).values_list('name', 'total')
+    values = Counter({name: number(total) for name, total in totals})
+
+    now = timezone.now()
+    overdue = (ScheduledTweet.objects
+               .filter(time_to_tweet__lte=now,
+                       status__in=[ScheduledTweet.PENDING, ScheduledTweet.CLAIMED, ScheduledTweet.POSTING])
+               .aggregate(count=Count('id'), oldest=Min('time_to_tweet')))
+    oldest_overdue = (now - overdue['oldest']).total_seconds() if overdue['oldest'] else 0
+    dead_letters = DeadLetter.objects.filter(redriven_at__isnull=True).count()
+
+    lines = histogram('twitterscheduler_post_lag_seconds',
+                      'Seconds between a tweets time_to_tweet and twitter accepting it.', LAG_BUCKETS, values)
+    lines += histogram('twitterscheduler_twitter_api_latency_seconds',
+                       'Seconds statuses/update calls took, failed ones included.', API_LATENCY_BUCKETS, values)
+    lines += [
+        '# HELP twitterscheduler_posts_total Attempts to post a scheduled tweet.',
+        '# TYPE twitterscheduler_posts_total counter',
+        f'twitterscheduler_posts_total{{result="posted"}} {values["posted"]}',
+        f'twitterscheduler_posts_total{{result="failed"}} {values["failed"]}',
+        '# HELP twitterscheduler_post_retries_total Retries of tweet_task.',
+        '# TYPE twitterscheduler_post_retries_total counter',
+        f'twitterscheduler_post_retries_total {values["retries"]}',
+        '# HELP twitterscheduler_overdue_scheduled_tweets Scheduled tweets past their time_to_tweet.',
+        '# TYPE twitterscheduler_overdue_scheduled_tweets gauge',
+        f'twitterscheduler_overdue_scheduled_tweets {overdue["count"]}',
+        '# HELP twitterscheduler_oldest_overdue_seconds How long the most overdue scheduled tweet has been due.',
+        '# TYPE twitterscheduler_oldest_overdue_seconds gauge',
+        f'twitterscheduler_oldest_overdue_seconds {oldest_overdue}',
+        '# HELP twitterscheduler_dead_letters Scheduled tweets given up on and not re-driven yet.',
+        '# TYPE twitterscheduler_dead_letters gauge',
+        f'twitterscheduler_dead_letters {dead_letters}',
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 05:32
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def set_last_synced_tweet_id(apps, schema_editor):
+    """Starts existing profiles' sync cursor at the newest tweet they already have."""
+    Profile = apps.get_model('twitterscheduler', 'Profile')
+    Tweet = apps.get_model('twitterscheduler', 'Tweet')
+    for profile in Profile.objects.all():
+        tweet_ids = Tweet.objects.filter(user_id=profile.user_id, tweet_id__isnull=False).values_list('tweet_id', flat=True)
+        tweet_ids = [int(tweet_id) for tweet_id in tweet_ids if tweet_id.isdigit()]
+        if tweet_ids:
+            profile.last_synced_tweet_id = str(max(tweet_ids))
+            profile.save(update_fields=['last_synced_tweet_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitterscheduler', '0006_auto_20170905_1531'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='last_synced_tweet_id',
+            field=models.CharField(blank=True, help_text='Id of the newest tweet saved by a sync', max_length=64, null=True),
+        ),
+        migrations.RunPython(set_last_synced_tweet_id, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 05:48
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def delete_duplicate_tweets(apps, schema_editor):
+    """Keeps the oldest row of every (user, tweet_id) pair so the unique constraint can be added."""
+    Tweet = apps.get_model('twitterscheduler', 'Tweet')
+    duplicates = (Tweet.objects.filter(tweet_id__isnull=False)
+                  .values('user_id', 'tweet_id')
+                  .annotate(count=Count('id'), keep_id=Min('id'))
+                  .filter(count__gt=1))
+    for duplicate in duplicates:
+        (Tweet.objects.filter(user_id=duplicate['user_id'], tweet_id=duplicate['tweet_id'])
+         .exclude(id=duplicate['keep_id'])
+         .delete())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('twitterscheduler', '0007_profile_last_synced_tweet_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_tweets, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='tweet',
+            unique_together=set([('user', 'tweet_id')]),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 05:36
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitterscheduler', '0008_tweet_unique_user_tweet_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='suppressed_sync_count',
+            field=models.PositiveIntegerField(default=0, help_text='Sync triggers ignored because a sync was already queued or running'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='sync_queued_at',
+            field=models.DateTimeField(blank=True, help_text='When the sync that is queued or running was triggered', null=True),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 05:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+# Partial and NULLS LAST indexes can't be declared in Meta.indexes, so they are only created on postgres.
+# The timeline index matches the index view's ordering (see pagination.paginate) so pages are read straight
+# off the index, and the undispatched index only holds the scheduled tweets the due-tweet scan still has to claim.
+POSTGRES_INDEXES = [
+    ('tweet_posted_timeline_idx',
+     'CREATE INDEX CONCURRENTLY IF NOT EXISTS tweet_posted_timeline_idx ON twitterscheduler_tweet '
+     '(user_id, time_posted_at DESC NULLS LAST, id DESC) WHERE is_posted'),
+    ('scheduledtweet_undispatched_idx',
+     'CREATE INDEX CONCURRENTLY IF NOT EXISTS scheduledtweet_undispatched_idx ON twitterscheduler_scheduledtweet '
+     '(time_to_tweet, id) WHERE task_id IS NULL'),
+]
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, sql in POSTGRES_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, sql in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('twitterscheduler', '0009_profile_sync_lock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['last_sync_time'], name='profile_last_sync_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledtweet',
+            index=models.Index(fields=['time_to_tweet', 'id'], name='scheduledtweet_time_idx'),
+        ),
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
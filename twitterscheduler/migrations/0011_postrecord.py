@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 05:46
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitterscheduler', '0010_timeline_and_scheduler_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_to_tweet', models.DateTimeField()),
+                ('posted_at', models.DateTimeField(blank=True, help_text='When twitter accepted the tweet', null=True)),
+                ('lag', models.FloatField(blank=True, help_text='Seconds between time_to_tweet and posted_at', null=True)),
+                ('api_latency', models.FloatField(blank=True, help_text='Seconds the twitter api call took', null=True)),
+                ('retries', models.PositiveIntegerField(default=0, help_text='Times the task had been retried before this attempt')),
+                ('failed', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tweet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='twitterscheduler.Tweet')),
+            ],
+        ),
+    ]
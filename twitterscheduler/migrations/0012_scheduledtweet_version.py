@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 05:47
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitterscheduler', '0011_postrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledtweet',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every edit, tweet_tasks sent for an older version are dropped'),
+        ),
+    ]
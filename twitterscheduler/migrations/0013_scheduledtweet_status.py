@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 05:49
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitterscheduler', '0012_scheduledtweet_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledtweet',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, help_text='When a claimed or posting tweet is reclaimed from its task', null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledtweet',
+            name='status',
+            field=models.CharField(choices=[('pending', 'waiting for its time_to_tweet'), ('claimed', 'handed to a tweet_task by the dispatcher'), ('posting', 'being sent to twitter'), ('posted', 'posted'), ('failed', 'failed')], default='pending', max_length=7),
+        ),
+    ]
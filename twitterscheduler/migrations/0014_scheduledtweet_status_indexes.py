@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 05:50
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# The dispatcher now claims pending tweets instead of ones without a task_id,
+# and the reaper looks for claimed and posting tweets whose lease has run out.
+CREATE_INDEXES = [
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS scheduledtweet_pending_idx ON twitterscheduler_scheduledtweet '
+    "(time_to_tweet, id) WHERE status = 'pending'",
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS scheduledtweet_leased_idx ON twitterscheduler_scheduledtweet '
+    "(claimed_until) WHERE status IN ('claimed', 'posting')",
+    'DROP INDEX CONCURRENTLY IF EXISTS scheduledtweet_undispatched_idx',
+]
+DROP_INDEXES = [
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS scheduledtweet_undispatched_idx ON twitterscheduler_scheduledtweet '
+    '(time_to_tweet, id) WHERE task_id IS NULL',
+    'DROP INDEX CONCURRENTLY IF EXISTS scheduledtweet_pending_idx',
+    'DROP INDEX CONCURRENTLY IF EXISTS scheduledtweet_leased_idx',
+]
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP_INDEXES:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('twitterscheduler', '0013_scheduledtweet_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 05:56
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('twitterscheduler', '0014_scheduledtweet_status_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=191, unique=True)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When tokens was last refilled')),
+                ('blocked_until', models.DateTimeField(blank=True, help_text='When twitter said the limit resets, after running out', null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 05:59
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitterscheduler', '0015_ratelimitbucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeadLetter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('error', models.TextField()),
+                ('api_code', models.IntegerField(blank=True, help_text='Twitters error code', null=True)),
+                ('status_code', models.IntegerField(blank=True, help_text='Http status of twitters response', null=True)),
+                ('response', models.TextField(blank=True, help_text='Body of twitters response')),
+                ('permanent', models.BooleanField(default=False, help_text='Whether the error was one retrying could not fix')),
+                ('attempts', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('redriven_at', models.DateTimeField(blank=True, help_text='When the tweet was sent to be posted again', null=True)),
+                ('scheduled_tweet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='twitterscheduler.ScheduledTweet')),
+            ],
+        ),
+    ]
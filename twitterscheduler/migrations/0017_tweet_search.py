@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# Full text search over Tweet.text, see twitterscheduler.search.
+# On postgres a tsvector column, kept up to date by a trigger, with a GIN index.
+POSTGRES_CREATE = [
+    'ALTER TABLE twitterscheduler_tweet ADD COLUMN IF NOT EXISTS search_vector tsvector',
+    "UPDATE twitterscheduler_tweet SET search_vector = to_tsvector('pg_catalog.english', text)",
+    'DROP TRIGGER IF EXISTS tweet_search_vector_update ON twitterscheduler_tweet',
+    'CREATE TRIGGER tweet_search_vector_update BEFORE INSERT OR UPDATE OF text ON twitterscheduler_tweet '
+    "FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger(search_vector, 'pg_catalog.english', text)",
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS tweet_search_vector_idx ON twitterscheduler_tweet '
+    'USING GIN (search_vector)',
+]
+POSTGRES_DROP = [
+    'DROP INDEX CONCURRENTLY IF EXISTS tweet_search_vector_idx',
+    'DROP TRIGGER IF EXISTS tweet_search_vector_update ON twitterscheduler_tweet',
+    'ALTER TABLE twitterscheduler_tweet DROP COLUMN IF EXISTS search_vector',
+]
+# On sqlite an external content FTS5 table over the tweet table, kept up to date by triggers.
+# Django rebuilds a sqlite table to alter it, which drops its triggers,
+# so migrations altering twitterscheduler_tweet have to run these again.
+SQLITE_DELETE_OLD = ("INSERT INTO twitterscheduler_tweet_fts(twitterscheduler_tweet_fts, rowid, text) "
+                     "VALUES ('delete', old.id, old.text); ")
+SQLITE_CREATE = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS twitterscheduler_tweet_fts USING fts5('
+    "text, content='twitterscheduler_tweet', content_rowid='id', tokenize='porter unicode61')",
+    "INSERT INTO twitterscheduler_tweet_fts(twitterscheduler_tweet_fts) VALUES ('rebuild')",
+    'CREATE TRIGGER IF NOT EXISTS tweet_fts_insert AFTER INSERT ON twitterscheduler_tweet BEGIN '
+    'INSERT INTO twitterscheduler_tweet_fts(rowid, text) VALUES (new.id, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS tweet_fts_delete AFTER DELETE ON twitterscheduler_tweet BEGIN '
+    + SQLITE_DELETE_OLD + 'END',
+    'CREATE TRIGGER IF NOT EXISTS tweet_fts_update AFTER UPDATE OF text ON twitterscheduler_tweet BEGIN '
+    + SQLITE_DELETE_OLD + 'INSERT INTO twitterscheduler_tweet_fts(rowid, text) VALUES (new.id, new.text); END',
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS tweet_fts_insert',
+    'DROP TRIGGER IF EXISTS tweet_fts_delete',
+    'DROP TRIGGER IF EXISTS tweet_fts_update',
+    'DROP TABLE IF EXISTS twitterscheduler_tweet_fts',
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {'postgresql': POSTGRES_CREATE, 'sqlite': SQLITE_CREATE}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('twitterscheduler', '0016_deadletter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
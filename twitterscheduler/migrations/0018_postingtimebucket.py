@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:05
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('twitterscheduler', '0017_tweet_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostingTimeBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour_of_week', models.PositiveSmallIntegerField(help_text='Hours since the start of monday, 0 to 167')),
+                ('tweets', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='postingtimebucket',
+            unique_together=set([('user', 'hour_of_week')]),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:07
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+# Full text search over ArchivedTweet.text, the same way 0017_tweet_search does for Tweet.text.
+# The table starts empty, so its index is built inside the migration's transaction.
+POSTGRES_CREATE = [
+    'ALTER TABLE twitterscheduler_archivedtweet ADD COLUMN search_vector tsvector',
+    'CREATE TRIGGER archivedtweet_search_vector_update BEFORE INSERT OR UPDATE OF text '
+    'ON twitterscheduler_archivedtweet '
+    "FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger(search_vector, 'pg_catalog.english', text)",
+    'CREATE INDEX archivedtweet_search_vector_idx ON twitterscheduler_archivedtweet USING GIN (search_vector)',
+]
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS archivedtweet_search_vector_idx',
+    'DROP TRIGGER IF EXISTS archivedtweet_search_vector_update ON twitterscheduler_archivedtweet',
+    'ALTER TABLE twitterscheduler_archivedtweet DROP COLUMN IF EXISTS search_vector',
+]
+SQLITE_DELETE_OLD = ("INSERT INTO twitterscheduler_archivedtweet_fts(twitterscheduler_archivedtweet_fts, rowid, text) "
+                     "VALUES ('delete', old.id, old.text); ")
+SQLITE_CREATE = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS twitterscheduler_archivedtweet_fts USING fts5('
+    "text, content='twitterscheduler_archivedtweet', content_rowid='id', tokenize='porter unicode61')",
+    'CREATE TRIGGER IF NOT EXISTS archivedtweet_fts_insert AFTER INSERT ON twitterscheduler_archivedtweet BEGIN '
+    'INSERT INTO twitterscheduler_archivedtweet_fts(rowid, text) VALUES (new.id, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS archivedtweet_fts_delete AFTER DELETE ON twitterscheduler_archivedtweet BEGIN '
+    + SQLITE_DELETE_OLD + 'END',
+    'CREATE TRIGGER IF NOT EXISTS archivedtweet_fts_update AFTER UPDATE OF text ON twitterscheduler_archivedtweet '
+    'BEGIN ' + SQLITE_DELETE_OLD
+    + 'INSERT INTO twitterscheduler_archivedtweet_fts(rowid, text) VALUES (new.id, new.text); END',
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS archivedtweet_fts_insert',
+    'DROP TRIGGER IF EXISTS archivedtweet_fts_delete',
+    'DROP TRIGGER IF EXISTS archivedtweet_fts_update',
+    'DROP TABLE IF EXISTS twitterscheduler_archivedtweet_fts',
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {'postgresql': POSTGRES_CREATE, 'sqlite': SQLITE_CREATE}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('twitterscheduler', '0018_postingtimebucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTweet',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('tweet_id', models.CharField(max_length=64)),
+                ('text', models.CharField(max_length=140)),
+                ('sentiment', models.CharField(blank=True, choices=[('p', 'positive'), ('n', 'negative'), ('u', 'unknown')], default='u', max_length=1)),
+                ('time_posted_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-time_posted_at'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='archivedtweet',
+            unique_together=set([('user', 'tweet_id')]),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:11
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('twitterscheduler', '0019_archivedtweet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringTweet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=140)),
+                ('frequency', models.CharField(choices=[('daily', 'daily'), ('weekly', 'weekly')], default='weekly', max_length=6)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Posted every this many days or weeks')),
+                ('weekdays', models.CharField(blank=True, help_text='Comma separated days of the week a weekly tweet is posted on, 0 is monday', max_length=13)),
+                ('time_of_day', models.TimeField(help_text='When it is posted on those days, in TIME_ZONE')),
+                ('starts_on', models.DateField()),
+                ('ends_on', models.DateField(blank=True, help_text='Last day it may be posted on', null=True)),
+                ('next_occurrence', models.DateTimeField(blank=True, help_text="First occurrence that isn't scheduled yet, null once it ended", null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recurringtweet',
+            index=models.Index(fields=['next_occurrence'], name='recurringtweet_next_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:31
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitterscheduler', '0020_recurringtweet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('value', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='metriccounter',
+            unique_together=set([('name', 'shard')]),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 07:03
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitterscheduler', '0021_metriccounter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='postrecord',
+            name='retries',
+            field=models.PositiveIntegerField(default=0, help_text='Failed attempts before this one, waits on rate limits not included'),
+        ),
+    ]
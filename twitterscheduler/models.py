@@ -1,22 +1,52 @@
 import datetime
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.shortcuts import reverse
 
+from .timeline_cache import invalidate_timelines
+
 
 class Profile(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     require_correctly_spelled = models.BooleanField(default=False)
     require_positive_sentiment = models.BooleanField(default=False)
     last_sync_time = models.DateTimeField(default=timezone.now()-datetime.timedelta(minutes=30))
+    last_synced_tweet_id = models.CharField(max_length=64, null=True, blank=True,
+                                            help_text='Id of the newest tweet saved by a sync')
+    sync_queued_at = models.DateTimeField(null=True, blank=True,
+                                          help_text='When the sync that is queued or running was triggered')
+    suppressed_sync_count = models.PositiveIntegerField(
+        default=0, help_text='Sync triggers ignored because a sync was already queued or running'
+    )
 
     SYNC_THRESHOLD = datetime.timedelta(minutes=15)
+    # a sync that hasn't finished after this long is assumed lost
+    SYNC_LOCK_TIMEOUT = datetime.timedelta(minutes=10)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_sync_time'], name='profile_last_sync_time_idx'),
+        ]
 
     def synced_tweets_recently(self):
         return timezone.now() - self.last_sync_time < self.SYNC_THRESHOLD
 
+    def claim_sync(self):
+        """
+        Marks a sync of the users tweets as queued, unless one already is.
+        Returns False, and counts the trigger as suppressed, when another sync is queued or running.
+        """
+        now = timezone.now()
+        claimed = Profile.objects.filter(
+            Q(sync_queued_at__isnull=True) | Q(sync_queued_at__lt=now - self.SYNC_LOCK_TIMEOUT), pk=self.pk
+        ).update(sync_queued_at=now)
+        if not claimed:
+            Profile.objects.filter(pk=self.pk).update(suppressed_sync_count=F('suppressed_sync_count') + 1)
+        return bool(claimed)
+
     def __str__(self):
         return f'{self.user} ({self.last_sync_time})'
 
@@ -38,22 +68,206 @@ class Tweet(models.Model):
 
     class Meta:
         ordering = ['-time_posted_at']
+        unique_together = ('user', 'tweet_id')
+
+    def __str__(self):
+        return f'{self.user} - {self.text}'
+
+
+class ArchivedTweet(models.Model):
+    """
+    A posted tweet moved out of the tweet table once it got old, see twitterscheduler.archive.
+    It keeps the id it had there, so ids stay unique across both tables.
+    """
+    id = models.IntegerField(primary_key=True)
+    tweet_id = models.CharField(max_length=64)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    text = models.CharField(max_length=140)
+    sentiment = models.CharField(max_length=1, choices=Tweet.sentiment_choices, blank=True, default='u')
+    time_posted_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-time_posted_at']
+        unique_together = ('user', 'tweet_id')
 
     def __str__(self):
         return f'{self.user} - {self.text}'
 
 
 class ScheduledTweet(models.Model):
+    # pending -> claimed (poll mode only) -> posting -> posted or failed
+    PENDING = 'pending'
+    CLAIMED = 'claimed'
+    POSTING = 'posting'
+    POSTED = 'posted'
+    FAILED = 'failed'
+    status_choices = (
+        (PENDING, 'waiting for its time_to_tweet'),
+        (CLAIMED, 'handed to a tweet_task by the dispatcher'),
+        (POSTING, 'being sent to twitter'),
+        (POSTED, 'posted'),
+        (FAILED, 'failed'),
+    )
+    # states that still have to be posted, editable ones can't have reached twitter yet
+    UNPOSTED = (PENDING, CLAIMED, POSTING, FAILED)
+    EDITABLE = (PENDING, CLAIMED, FAILED)
+    # how long a claimed tweet may wait for its task, and a posting one for twitter, before it is reclaimed
+    CLAIM_LEASE = datetime.timedelta(minutes=5)
+    POSTING_LEASE = datetime.timedelta(minutes=2)
+
     tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE)
     created_at = models.DateTimeField(default=timezone.now)
     time_to_tweet = models.DateTimeField()
     task_id = models.CharField(max_length=36, null=True, blank=True)
+    version = models.PositiveIntegerField(default=0, help_text='Bumped on every edit, tweet_tasks sent for an '
+                                                               'older version are dropped')
+    status = models.CharField(max_length=7, choices=status_choices, default=PENDING)
+    claimed_until = models.DateTimeField(null=True, blank=True,
+                                         help_text='When a claimed or posting tweet is reclaimed from its task')
 
     class Meta:
         ordering = ['time_to_tweet']
+        indexes = [
+            models.Index(fields=['time_to_tweet', 'id'], name='scheduledtweet_time_idx'),
+        ]
+
+    def start_posting(self, version=None):
+        """
+        Moves a pending or claimed tweet to posting, leased for POSTING_LEASE.
+        Only one caller can win, so a tweet is only ever sent to twitter by one task.
+        With a version the tweet must also not have been edited since. Returns whether this caller won.
+        """
+        scheduled_tweets = ScheduledTweet.objects.filter(pk=self.pk, status__in=[self.PENDING, self.CLAIMED])
+        if version is not None:
+            scheduled_tweets = scheduled_tweets.filter(version=version)
+        claimed_until = timezone.now() + self.POSTING_LEASE
+        if not scheduled_tweets.update(status=self.POSTING, claimed_until=claimed_until):
+            return False
+        self.status = self.POSTING
+        self.claimed_until = claimed_until
+        # not before the callers transaction commits, or a timeline read in between would cache the old status
+        user_id = self.tweet.user_id
+        transaction.on_commit(lambda: invalidate_timelines([user_id]))
+        return True
 
     def get_absolute_url(self):
         return reverse('twitterscheduler:edit-scheduled-tweet', args=[str(self.id)])
 
     def __str__(self):
         return f'{self.tweet} ({self.time_to_tweet})'
+
+
+class RecurringTweet(models.Model):
+    """
+    A tweet posted again and again on a cadence, like every monday at 9am.
+    Only its occurrences within RECURRING_TWEET_HORIZON are ever scheduled, see twitterscheduler.recurrence.
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    frequency_choices = (
+        (DAILY, 'daily'),
+        (WEEKLY, 'weekly'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    text = models.CharField(max_length=140)
+    frequency = models.CharField(max_length=6, choices=frequency_choices, default=WEEKLY)
+    interval = models.PositiveSmallIntegerField(default=1, help_text='Posted every this many days or weeks')
+    weekdays = models.CharField(max_length=13, blank=True,
+                                help_text='Comma separated days of the week a weekly tweet is posted on, 0 is monday')
+    time_of_day = models.TimeField(help_text='When it is posted on those days, in TIME_ZONE')
+    starts_on = models.DateField()
+    ends_on = models.DateField(null=True, blank=True, help_text='Last day it may be posted on')
+    next_occurrence = models.DateTimeField(null=True, blank=True,
+                                           help_text="First occurrence that isn't scheduled yet, null once it ended")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_occurrence'], name='recurringtweet_next_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.text} ({self.frequency})'
+
+
+class PostRecord(models.Model):
+    """One attempt by tweet_task to post a scheduled tweet, kept for the posting metrics."""
+    tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE)
+    time_to_tweet = models.DateTimeField()
+    posted_at = models.DateTimeField(null=True, blank=True, help_text='When twitter accepted the tweet')
+    lag = models.FloatField(null=True, blank=True, help_text='Seconds between time_to_tweet and posted_at')
+    api_latency = models.FloatField(null=True, blank=True, help_text='Seconds the twitter api call took')
+    retries = models.PositiveIntegerField(default=0, help_text='Failed attempts before this one, waits on rate limits not included')
+    failed = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.tweet} ({"failed" if self.failed else self.lag})'
+
+
+class MetricCounter(models.Model):
+    """One shard of a posting metric, the metric is the sum of its shards. See twitterscheduler.metrics."""
+    name = models.CharField(max_length=100)
+    shard = models.PositiveSmallIntegerField()
+    value = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('name', 'shard')
+
+    def __str__(self):
+        return f'{self.name} {self.shard} ({self.value})'
+
+
+class DeadLetter(models.Model):
+    """
+    A scheduled tweet tweet_task gave up on, because twitter refused it for good, it kept failing
+    or the user has no twitter token.
+    The scheduled tweet is left failed until it is re-driven from the admin.
+    """
+    scheduled_tweet = models.ForeignKey(ScheduledTweet, on_delete=models.CASCADE)
+    error = models.TextField()
+    api_code = models.IntegerField(null=True, blank=True, help_text='Twitters error code')
+    status_code = models.IntegerField(null=True, blank=True, help_text='Http status of twitters response')
+    response = models.TextField(blank=True, help_text='Body of twitters response')
+    permanent = models.BooleanField(default=False, help_text='Whether the error was one retrying could not fix')
+    attempts = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(default=timezone.now)
+    redriven_at = models.DateTimeField(null=True, blank=True, help_text='When the tweet was sent to be posted again')
+
+    def __str__(self):
+        return f'{self.scheduled_tweet} ({self.error})'
+
+
+class PostingTimeBucket(models.Model):
+    """
+    How many of a users posted tweets went out in one hour of the week, in TIME_ZONE.
+    Kept up to date as tweets are synced and posted, see twitterscheduler.analytics.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    hour_of_week = models.PositiveSmallIntegerField(help_text='Hours since the start of monday, 0 to 167')
+    tweets = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'hour_of_week')
+
+    def __str__(self):
+        return f'{self.user} - {self.hour_of_week} ({self.tweets})'
+
+
+class RateLimitBucket(models.Model):
+    """
+    Tokens left for calls to one twitter endpoint, by one user or, when user is null, by the whole twitter app.
+    Shared by every worker, see twitterscheduler.ratelimit.
+    """
+    key = models.CharField(max_length=191, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    tokens = models.FloatField()
+    updated_at = models.DateTimeField(default=timezone.now, help_text='When tokens was last refilled')
+    blocked_until = models.DateTimeField(null=True, blank=True,
+                                         help_text='When twitter said the limit resets, after running out')
+
+    def __str__(self):
+        return f'{self.key} ({self.tokens:.1f})'
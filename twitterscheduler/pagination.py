@@ -0,0 +1,57 @@
+"""
+Keyset (cursor) pagination over a datetime column, using the primary key to break ties.
+Rows with no value in the column come last.
+"""
+import datetime
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(value, pk):
+    micros = '' if value is None else (value - EPOCH) // datetime.timedelta(microseconds=1)
+    return f'{micros}_{pk}'
+
+
+def decode_cursor(cursor):
+    """
+    Returns the (value, pk) pair a cursor was made from.
+    Raises ValueError for malformed cursors and OverflowError for ones with a value out of range.
+    """
+    micros, pk = cursor.split('_')
+    value = None if micros == '' else EPOCH + datetime.timedelta(microseconds=int(micros))
+    return value, int(pk)
+
+
+def after_cursor(queryset, field, cursor=None, descending=False):
+    """Returns queryset ordered by field and pk, limited to the rows that come after cursor."""
+    ordering = F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+    queryset = queryset.order_by(ordering, '-pk' if descending else 'pk')
+
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        after = 'lt' if descending else 'gt'
+        if value is None:
+            queryset = queryset.filter(**{f'{field}__isnull': True, f'pk__{after}': pk})
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{field}__{after}': value}) |
+                Q(**{field: value, f'pk__{after}': pk}) |
+                Q(**{f'{field}__isnull': True})
+            )
+    return queryset
+
+
+def paginate(queryset, field, cursor=None, page_size=50, descending=False):
+    """
+    Returns the page of queryset that comes after cursor, ordered by field and pk,
+    and the cursor for the next page, which is None on the last page.
+    """
+    queryset = after_cursor(queryset, field, cursor, descending)
+    items = list(queryset[:page_size + 1])
+    if len(items) <= page_size:
+        return items, None
+    last = items[page_size - 1]
+    return items[:page_size], encode_cursor(getattr(last, field), last.pk)
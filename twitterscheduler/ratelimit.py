@@ -0,0 +1,136 @@
+"""
+Token buckets keeping the tasks within twitter's rate limits, shared by every worker through the database.
+Every endpoint in TWITTER_RATE_LIMITS has a bucket per user and one per twitter app, and a call takes a token
+from both. Buckets refill steadily over the limit's window, and are corrected from the x-rate-limit headers
+twitter sends back, so a limit used up elsewhere, by the user's other apps say, is respected too.
+The apps bucket is split over APP_BUCKET_SHARDS rows, so workers posting for different users don't all wait
+on one row lock.
+"""
+import datetime
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RateLimitBucket
+
+UPDATE = 'statuses/update'
+TIMELINE = 'statuses/user_timeline'
+# how long to back off after a 429 that didn't say when the limit resets
+DEFAULT_BACKOFF = 60
+# how many rows an apps bucket is split over, each refilling at its share of the limit
+APP_BUCKET_SHARDS = 8
+# how long to back off when other workers hold every shard of the apps bucket that was left
+LOCKED_BACKOFF = 1
+
+
+def user_key(endpoint, user_id):
+    return f'{endpoint}:user:{user_id}'
+
+
+def app_key(endpoint, twitter_api):
+    consumer_key = twitter_api.auth.consumer_key
+    if isinstance(consumer_key, bytes):
+        consumer_key = consumer_key.decode()
+    return f'{endpoint}:app:{consumer_key}'
+
+
+def acquire(endpoint, user, twitter_api):
+    """
+    Takes a token for a call to endpoint from the users bucket and the apps bucket.
+    Returns 0 when it got them, otherwise the seconds until both buckets will have one, and takes nothing.
+    """
+    now = timezone.now()
+    limits = settings.TWITTER_RATE_LIMITS[endpoint]
+    with transaction.atomic():
+        # the users bucket is locked first and the app shards are never waited on, so workers can't deadlock
+        bucket = locked_bucket(user_key(endpoint, user.pk), limits['user'], now, user=user)
+        wait = refill(bucket, limits['user'], now)
+        if not wait:
+            wait = take_app_token(app_key(endpoint, twitter_api), limits['app'], now)
+        if not wait:
+            bucket.tokens -= 1
+        bucket.save(update_fields=['tokens', 'updated_at', 'blocked_until'])
+    return wait
+
+
+def take_app_token(key, limit, now):
+    """
+    Takes a token from one of the shards of an apps bucket, trying them in random order and skipping the ones
+    other workers have locked. Returns 0 when it got one, otherwise the seconds until one will have a token.
+    """
+    requests, window = limit
+    shards = max(1, min(APP_BUCKET_SHARDS, int(requests)))
+    shard_limit = (requests / shards, window)
+    waits = []
+    for shard in random.sample(range(shards), shards):
+        bucket = locked_bucket(f'{key}:{shard}', shard_limit, now, skip_locked=True)
+        if bucket is None:
+            continue
+        wait = refill(bucket, shard_limit, now)
+        if not wait:
+            bucket.tokens -= 1
+        bucket.save(update_fields=['tokens', 'updated_at', 'blocked_until'])
+        if not wait:
+            return 0
+        waits.append(wait)
+    if len(waits) < shards:
+        return LOCKED_BACKOFF
+    return min(waits)
+
+
+def locked_bucket(key, limit, now, user=None, skip_locked=False):
+    """
+    Returns the bucket for key locked for update, created full if there isn't one.
+    With skip_locked returns None instead of waiting when another worker has it locked.
+    """
+    buckets = RateLimitBucket.objects.select_for_update(skip_locked=skip_locked).filter(key=key)
+    bucket = buckets.first()
+    if bucket is None:
+        RateLimitBucket.objects.get_or_create(key=key, defaults={'user': user, 'tokens': limit[0], 'updated_at': now})
+        bucket = buckets.first()
+    return bucket
+
+
+def refill(bucket, limit, now):
+    """Refills a bucket for the time since it was last updated, returns the seconds until it has a token."""
+    requests, window = limit
+    if bucket.blocked_until is not None and bucket.blocked_until <= now:
+        # the window twitter told us about has reset
+        bucket.tokens = requests
+        bucket.blocked_until = None
+    bucket.tokens = min(requests, bucket.tokens + (now - bucket.updated_at).total_seconds() * requests / window)
+    bucket.updated_at = now
+    if bucket.blocked_until is not None:
+        return (bucket.blocked_until - now).total_seconds()
+    if bucket.tokens < 1:
+        return (1 - bucket.tokens) * window / requests
+    return 0
+
+
+def record_response(endpoint, user, response):
+    """
+    Corrects the users bucket with the x-rate-limit headers of a twitter response.
+    When the limit is used up the bucket is blocked until it resets.
+    Returns the seconds until then, or 0 when the limit isn't used up or the response didn't say.
+    """
+    headers = getattr(response, 'headers', None) or {}
+    remaining, reset = headers.get('x-rate-limit-remaining'), headers.get('x-rate-limit-reset')
+    if not isinstance(remaining, str) or not isinstance(reset, str):
+        return 0
+    now = timezone.now()
+    remaining = int(remaining)
+    reset = datetime.datetime.fromtimestamp(int(reset), timezone.utc)
+    buckets = RateLimitBucket.objects.filter(key=user_key(endpoint, user.pk))
+    if remaining:
+        buckets.filter(tokens__gt=remaining).update(tokens=remaining, updated_at=now)
+        return 0
+    buckets.update(tokens=0, updated_at=now, blocked_until=reset)
+    return max(0, (reset - now).total_seconds())
+
+
+def blocked_users(endpoint):
+    """Returns a queryset of the ids of the users twitter has cut off from endpoint until their limit resets."""
+    return (RateLimitBucket.objects.filter(key__startswith=f'{endpoint}:user:', blocked_until__gt=timezone.now())
+            .values_list('user_id', flat=True))
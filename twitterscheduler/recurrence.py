@@ -0,0 +1,48 @@
+"""
+When recurring tweets are posted. Occurrences are worked out a day at a time in TIME_ZONE
+and yielded lazily, so a rule that never ends costs nothing until its next occurrences are asked for.
+"""
+import datetime
+import itertools
+
+from django.utils import timezone
+
+from .models import RecurringTweet
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def weekdays(rule):
+    return {int(day) for day in rule.weekdays.split(',') if day}
+
+
+def occurs_on(rule, day, days=None):
+    """Whether the rule is posted on day, a date. days are the rules weekdays, when they are parsed already."""
+    if day < rule.starts_on or (rule.ends_on is not None and day > rule.ends_on):
+        return False
+    if rule.frequency == RecurringTweet.DAILY:
+        return (day - rule.starts_on).days % rule.interval == 0
+    # weeks are counted from the monday of the week the rule starts in
+    first_monday = rule.starts_on - datetime.timedelta(days=rule.starts_on.weekday())
+    return (day.weekday() in (weekdays(rule) if days is None else days)
+            and (day - first_monday).days // 7 % rule.interval == 0)
+
+
+def occurrences(rule, after):
+    """Yields the times the rule is posted at after the time after, soonest first."""
+    days = weekdays(rule)
+    if rule.frequency == RecurringTweet.WEEKLY and not days:
+        return
+    day = max(rule.starts_on, timezone.localtime(after).date())
+    while rule.ends_on is None or day <= rule.ends_on:
+        if occurs_on(rule, day, days):
+            # is_dst picks a side for times a daylight saving change skips or repeats
+            time = timezone.make_aware(datetime.datetime.combine(day, rule.time_of_day), is_dst=False)
+            if time > after:
+                yield time
+        day += ONE_DAY
+
+
+def next_occurrences(rule, count, after=None):
+    """Returns the next count times the rule is posted at, fewer when it ends before then."""
+    return list(itertools.islice(occurrences(rule, after or timezone.now()), count))
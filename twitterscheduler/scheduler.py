@@ -0,0 +1,84 @@
+import datetime
+import heapq
+import logging
+import time
+
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .models import ScheduledTweet
+from .tasks import dispatch_scheduled_tweets
+
+logger = logging.getLogger(__name__)
+
+
+class TweetScheduler:
+    """
+    Holds the scheduled tweets that are due within the next `window` in a min-heap
+    and dispatches each one as soon as it comes due.
+    Memory is bounded by how many tweets fall in the window, not by how many are scheduled.
+    """
+
+    def __init__(self, window=datetime.timedelta(minutes=5), refill_interval=datetime.timedelta(seconds=5),
+                 clock=timezone.now, sleep=time.sleep):
+        self.window = window
+        self.refill_interval = refill_interval
+        self.clock = clock
+        self.sleep = sleep
+        self.heap = []
+        self.loaded = {}
+
+    def refill(self):
+        """
+        Loads the pending tweets due before the end of the window that aren't loaded yet.
+        Tweets whose time_to_tweet was edited since they were loaded are pushed again at their new time.
+        """
+        horizon = self.clock() + self.window
+        upcoming = ScheduledTweet.objects.filter(status=ScheduledTweet.PENDING, time_to_tweet__lte=horizon)
+        for scheduled_tweet_id, time_to_tweet in upcoming.values_list('id', 'time_to_tweet'):
+            if self.loaded.get(scheduled_tweet_id) != time_to_tweet:
+                self.loaded[scheduled_tweet_id] = time_to_tweet
+                heapq.heappush(self.heap, (time_to_tweet, scheduled_tweet_id))
+
+    def fire_due(self):
+        """Dispatches every loaded tweet that is due. Returns the number of tweets dispatched."""
+        now = self.clock()
+        due_ids = []
+        while self.heap and self.heap[0][0] <= now:
+            time_to_tweet, scheduled_tweet_id = heapq.heappop(self.heap)
+            # entries left behind by an edit are skipped
+            if self.loaded.get(scheduled_tweet_id) == time_to_tweet:
+                del self.loaded[scheduled_tweet_id]
+                due_ids.append(scheduled_tweet_id)
+        if not due_ids:
+            return 0
+        # the time is checked again in case the tweet was rescheduled after it was loaded
+        return dispatch_scheduled_tweets(ScheduledTweet.objects.filter(id__in=due_ids, time_to_tweet__lte=now))
+
+    def seconds_until(self, moment):
+        return max((moment - self.clock()).total_seconds(), 0)
+
+    def run_cycle(self, step):
+        """
+        Runs a refill or fire step, logging database errors instead of raising them so the scheduler outlives
+        a database restart. Tweets popped by a failed fire step are pending still and come back with the next refill.
+        """
+        try:
+            step()
+        except DatabaseError:
+            logger.exception('tweet scheduler %s failed', step.__name__)
+
+    def run(self):
+        next_refill = self.clock()
+        while True:
+            # the connection may have been dropped while sleeping, this replaces it like a request would
+            close_old_connections()
+            if self.clock() >= next_refill:
+                self.run_cycle(self.refill)
+                next_refill = self.clock() + self.refill_interval
+            self.run_cycle(self.fire_due)
+
+            wake_at = next_refill
+            if self.heap:
+                wake_at = min(wake_at, self.heap[0][0])
+            self.sleep(self.seconds_until(wake_at))
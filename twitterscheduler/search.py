@@ -0,0 +1,98 @@
+"""
+Full text search over a users posted tweets, archived ones included, best matches first.
+On postgres tweets are matched and ranked with the search_vector tsvector columns and their GIN indexes,
+on sqlite with the twitterscheduler_tweet_fts and twitterscheduler_archivedtweet_fts FTS5 tables.
+Both are kept up to date by triggers, see migrations 0017_tweet_search and 0019_archivedtweet.
+Results are paged with a cursor of the last results rank and id, like twitterscheduler.pagination.
+"""
+import re
+
+from django.db import connection
+
+from .models import Tweet, ArchivedTweet
+
+WORD = re.compile(r'\w+')
+
+POSTGRES_SEARCH = """
+    SELECT id, rank FROM (
+        SELECT tweet.id, ts_rank(tweet.search_vector, query)::float8 AS rank
+        FROM twitterscheduler_tweet tweet, plainto_tsquery('pg_catalog.english', %s) query
+        WHERE tweet.user_id = %s AND tweet.is_posted AND tweet.search_vector @@ query
+        UNION ALL
+        SELECT tweet.id, ts_rank(tweet.search_vector, query)::float8 AS rank
+        FROM twitterscheduler_archivedtweet tweet, plainto_tsquery('pg_catalog.english', %s) query
+        WHERE tweet.user_id = %s AND tweet.search_vector @@ query
+    ) matches {after}
+    ORDER BY rank DESC, id DESC
+    LIMIT %s
+"""
+# bm25 is lower for better matches, so it is negated to rank like ts_rank
+SQLITE_SEARCH = """
+    SELECT id, rank FROM (
+        SELECT tweet.id, -bm25(twitterscheduler_tweet_fts) AS rank
+        FROM twitterscheduler_tweet_fts JOIN twitterscheduler_tweet tweet ON tweet.id = twitterscheduler_tweet_fts.rowid
+        WHERE twitterscheduler_tweet_fts MATCH %s AND tweet.user_id = %s AND tweet.is_posted
+        UNION ALL
+        SELECT tweet.id, -bm25(twitterscheduler_archivedtweet_fts) AS rank
+        FROM twitterscheduler_archivedtweet_fts
+        JOIN twitterscheduler_archivedtweet tweet ON tweet.id = twitterscheduler_archivedtweet_fts.rowid
+        WHERE twitterscheduler_archivedtweet_fts MATCH %s AND tweet.user_id = %s
+    ) matches {after}
+    ORDER BY rank DESC, id DESC
+    LIMIT %s
+"""
+AFTER = 'WHERE rank < %s OR (rank = %s AND id < %s)'
+
+
+def encode_cursor(rank, pk):
+    return f'{rank!r}_{pk}'
+
+
+def decode_cursor(cursor):
+    """Returns the (rank, pk) pair a cursor was made from. Raises ValueError for malformed cursors."""
+    rank, pk = cursor.split('_')
+    return float(rank), int(pk)
+
+
+def search_sql(user, query, cursor=None, limit=50):
+    """
+    Returns the sql and params selecting the ids and ranks of the users posted tweets matching query,
+    archived ones included.
+    """
+    words = WORD.findall(query)
+    if connection.vendor == 'postgresql':
+        search, match = POSTGRES_SEARCH, ' '.join(words)
+    elif connection.vendor == 'sqlite':
+        # quoted so the words are matched as they are and not read as fts5 query syntax
+        search, match = SQLITE_SEARCH, ' '.join(f'"{word}"' for word in words)
+    else:
+        raise NotImplementedError(f'tweet search is not supported on {connection.vendor}')
+
+    params = [match, user.pk, match, user.pk]
+    if not cursor:
+        return search.format(after=''), params + [limit]
+    rank, pk = decode_cursor(cursor)
+    return search.format(after=AFTER), params + [rank, rank, pk, limit]
+
+
+def search_tweets(user, query, cursor=None, page_size=50):
+    """
+    Returns the page of the users posted tweets matching query that comes after cursor, best matches first,
+    and the cursor for the next page, which is None on the last page.
+    """
+    if not WORD.search(query):
+        return [], None
+    sql, params = search_sql(user, query, cursor, page_size + 1)
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        ranks = db_cursor.fetchall()
+
+    pks = [pk for pk, rank in ranks[:page_size]]
+    # archived tweets keep their id, so the ids of both tables never clash
+    tweets = ArchivedTweet.objects.in_bulk(pks)
+    tweets.update(Tweet.objects.in_bulk(pks))
+    page = [tweets[pk] for pk, rank in ranks[:page_size] if pk in tweets]
+    if len(ranks) <= page_size:
+        return page, None
+    pk, rank = ranks[page_size - 1]
+    return page, encode_cursor(rank, pk)
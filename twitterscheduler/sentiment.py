@@ -0,0 +1,84 @@
+"""
+Lexicon based sentiment scoring for tweets.
+The lexicon maps words to a score from -3 to 3, a tweet's sentiment is the sign of the sum of its word scores.
+"""
+import os
+import re
+
+LEXICON_PATH = os.path.join(os.path.dirname(__file__), 'data', 'sentiment_lexicon.txt')
+
+POSITIVE = 'p'
+NEGATIVE = 'n'
+UNKNOWN = 'u'
+
+TOKEN_RE = re.compile(r"[a-z']+|[:;]-?[()dp]", re.IGNORECASE)
+NEGATIONS = frozenset(["not", "no", "never", "don't", "dont", "isn't", "isnt", "wasn't", "can't", "cant", "won't", "nothing"])
+# how many words after a negation have their score flipped
+NEGATION_SCOPE = 3
+EMOTICONS = {':)': 2, ':-)': 2, ':d': 2, ':-d': 2, ';)': 1, ';-)': 1, ':p': 1, ':(': -2, ':-(': -2}
+
+_lexicon = None
+
+
+def get_lexicon():
+    """Returns the word -> score dict, loaded from LEXICON_PATH the first time it's needed."""
+    global _lexicon
+    if _lexicon is None:
+        lexicon = dict(EMOTICONS)
+        with open(LEXICON_PATH) as lexicon_file:
+            for line in lexicon_file:
+                word, score = line.split('\t')
+                lexicon[word] = int(score)
+        _lexicon = lexicon
+    return _lexicon
+
+
+def score_text(text, lexicon=None):
+    lexicon = lexicon or get_lexicon()
+    score = 0
+    negated_for = 0
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in NEGATIONS:
+            negated_for = NEGATION_SCOPE
+            continue
+        word_score = lexicon.get(token, 0)
+        score += -word_score if negated_for else word_score
+        negated_for = max(negated_for - 1, 0)
+    return score
+
+
+def classify_texts(texts):
+    """Returns the sentiment choice ('p', 'n' or 'u') for each of texts."""
+    lexicon = get_lexicon()
+    sentiments = []
+    for text in texts:
+        score = score_text(text, lexicon)
+        sentiments.append(POSITIVE if score > 0 else NEGATIVE if score < 0 else UNKNOWN)
+    return sentiments
+
+
+def classify_tweets(tweets):
+    """Sets the sentiment of each of the (unsaved) tweets."""
+    for tweet, sentiment in zip(tweets, classify_texts([tweet.text for tweet in tweets])):
+        tweet.sentiment = sentiment
+    return tweets
+
+
+def backfill_sentiment(queryset, chunk_size=1000):
+    """
+    Scores the sentiment of every tweet in queryset, chunk_size tweets at a time.
+    Each chunk is written back with one update per sentiment. Returns the number of tweets scored.
+    """
+    scored = 0
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'text')[:chunk_size])
+        if not chunk:
+            return scored
+        pks_by_sentiment = {}
+        for (pk, _), sentiment in zip(chunk, classify_texts([text for _, text in chunk])):
+            pks_by_sentiment.setdefault(sentiment, []).append(pk)
+        for sentiment, pks in pks_by_sentiment.items():
+            queryset.model.objects.filter(pk__in=pks).update(sentiment=sentiment)
+        scored += len(chunk)
+        last_pk = chunk[-1][0]
@@ -1,12 +1,44 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.core.signals import request_finished
 from django.contrib.auth.models import User
 
-from .models import Profile
+from allauth.socialaccount.models import SocialApp, SocialToken
+
+from .models import Profile, Tweet, ScheduledTweet
+from .tasks import clear_twitter_client_cache
+from .timeline_cache import invalidate_timelines
 
 
 @receiver(post_save, sender=User)
 def create_profile_receiver(sender, **kwargs):
     if kwargs['created']:
         Profile.objects.create(user=kwargs['instance'])
+        # a new user can get the id of a deleted one, whose timelines may still be cached
+        invalidate_timelines([kwargs['instance'].id])
+
+
+@receiver(post_save, sender=SocialApp)
+@receiver(post_delete, sender=SocialApp)
+@receiver(post_save, sender=SocialToken)
+@receiver(post_delete, sender=SocialToken)
+def clear_twitter_client_cache_receiver(sender, **kwargs):
+    clear_twitter_client_cache()
+
+
+# the timelines are invalidated once the change is committed, a page view before then would cache them unchanged
+
+@receiver(post_save, sender=Tweet)
+@receiver(post_delete, sender=Tweet)
+def invalidate_tweet_timelines_receiver(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_timelines([user_id]))
+
+
+@receiver(post_save, sender=ScheduledTweet)
+@receiver(post_delete, sender=ScheduledTweet)
+def invalidate_scheduled_tweet_timelines_receiver(sender, instance, **kwargs):
+    # the tweet is gone already when it was the tweet being deleted, its own receiver takes care of that
+    user_ids = list(Tweet.objects.filter(pk=instance.tweet_id).values_list('user_id', flat=True))
+    transaction.on_commit(lambda: invalidate_timelines(user_ids))
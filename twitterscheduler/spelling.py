@@ -0,0 +1,89 @@
+"""
+Spell checking for tweet text against a plain word list, one word per line.
+The words are held in a frozenset so checking a word is a single lookup. Suggestions are only
+worked out for misspelled words, by looking up every string one edit away from them.
+"""
+import os
+import re
+import string
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+
+WORD_RE = re.compile(r"(?<![@#\w])[a-z]+(?:'[a-z]+)?(?![\w@])", re.IGNORECASE)
+URL_RE = re.compile(r'https?://\S+|www\.\S+', re.IGNORECASE)
+LETTERS = string.ascii_lowercase
+
+_spell_checker = None
+
+
+class SpellChecker:
+
+    def __init__(self, words):
+        self.words = frozenset(word.strip().lower() for word in words if word.strip())
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path, encoding='utf-8', errors='ignore') as word_file:
+                return cls(word_file)
+        except OSError as e:
+            raise ImproperlyConfigured(f'Could not load the SPELLCHECK_WORDLIST {path}: {e}')
+
+    def is_known(self, word):
+        word = word.lower()
+        if word in self.words:
+            return True
+        # possessives and contractions aren't in most word lists
+        stem, _, suffix = word.partition("'")
+        return bool(suffix) and stem in self.words
+
+    def misspelled(self, text):
+        """Returns the words of text that aren't in the word list. Mentions, hashtags and links are skipped."""
+        return [word for word in WORD_RE.findall(URL_RE.sub(' ', text)) if not self.is_known(word)]
+
+    def suggestions(self, word, limit=5):
+        """Returns up to limit known words that are one deletion, transposition, replacement or insertion away."""
+        word = word.lower()
+        splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+        edits = set()
+        for left, right in splits:
+            if right:
+                edits.add(left + right[1:])
+                for letter in LETTERS:
+                    edits.add(left + letter + right[1:])
+            if len(right) > 1:
+                edits.add(left + right[1] + right[0] + right[2:])
+            for letter in LETTERS:
+                edits.add(left + letter + right)
+        edits.discard(word)
+        return sorted(edits & self.words)[:limit]
+
+    def check(self, text):
+        """Returns a dict of each misspelled word in text to its suggestions."""
+        return {word: self.suggestions(word) for word in self.misspelled(text)}
+
+
+def get_spell_checker():
+    """Returns the SpellChecker for SPELLCHECK_WORDLIST, loaded the first time it's needed in the process."""
+    global _spell_checker
+    if _spell_checker is None:
+        _spell_checker = SpellChecker.from_file(settings.SPELLCHECK_WORDLIST)
+    return _spell_checker
+
+
+@checks.register()
+def check_word_list(app_configs, **kwargs):
+    """
+    The word list is only read when a user who requires correct spelling saves a tweet,
+    so a missing one is reported when the site starts instead of failing their requests.
+    """
+    path = settings.SPELLCHECK_WORDLIST
+    if os.path.isfile(path) and os.access(path, os.R_OK):
+        return []
+    return [checks.Error(
+        f'The SPELLCHECK_WORDLIST {path} can not be read.',
+        hint='Install a word list, like the wamerican package, or point SPELLCHECK_WORDLIST at one.',
+        id='twitterscheduler.E001',
+    )]
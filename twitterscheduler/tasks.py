@@ -1,66 +1,544 @@
 import datetime
+import html
+import logging
+import random
+import re
+import time
+from collections import OrderedDict
 
-from django.contrib.auth.models import User
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import Q, Exists, OuterRef
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 
-from .models import ScheduledTweet, Tweet, Profile
+from .analytics import record_posting_times
+from .archive import archive_tweets
+from .metrics import save_post_record
+from .models import ScheduledTweet, Tweet, ArchivedTweet, Profile, PostRecord, DeadLetter, RecurringTweet
+from .pagination import paginate
+from . import ratelimit
+from .recurrence import occurrences
+from .sentiment import classify_tweets
+from .timeline_cache import invalidate_timelines
 
 import tweepy
 from allauth.socialaccount.models import SocialToken, SocialApp
 from celery import shared_task
+from celery.utils import uuid
 
+logger = logging.getLogger(__name__)
 
-@shared_task
-def tweet_task(username, scheduled_tweet_id):
-    user = User.objects.get(username=username)
-    access_token = SocialToken.objects.get(account__user=user, app__provider='twitter')
-    twitter = get_authed_tweepy(access_token.token, access_token.token_secret)
-    scheduled_tweet = ScheduledTweet.objects.get(id=scheduled_tweet_id)
-
-    tweet_twitter = twitter.update_status(status=scheduled_tweet.tweet.text)
-    tweet_db = Tweet.objects.get(pk=scheduled_tweet.tweet.id)
-    tweet_db.tweet_id = tweet_twitter.id_str
-    tweet_db.time_posted_at = scheduled_tweet.time_to_tweet
-    tweet_db.is_posted = True
-    tweet_db.save()
-    scheduled_tweet.delete()
+# twitter error codes that trying again won't fix: bad or revoked token, suspended or locked account,
+# tweet too long, duplicate tweet and tweet flagged as spam
+PERMANENT_ERROR_CODES = {32, 64, 89, 186, 187, 226, 326}
+# over the daily tweet limit, refused with a 403 like the permanent errors but it passes
+DAILY_LIMIT_ERROR_CODE = 185
+# links, with or without a scheme, which twitter rewrites to t.co links
+URL_PATTERN = re.compile(r'https?://\S+|\b[\w-]+(?:\.[\w-]+)*\.[a-zA-Z]{2,}\b(?:/\S*)?')
+
+
+@shared_task(bind=True, acks_late=True)
+def tweet_task(self, username, scheduled_tweet_id, version=None, attempt=0):
+    """
+    Posts a scheduled tweet and records when it went out, how late it was and how long twitter took
+    in a PostRecord, failed attempts included.
+    The tweet is moved to posting before twitter is called, so a duplicate or redelivered task finds it taken
+    and does nothing, as does a task for a tweet that was deleted or edited since the task was sent.
+    That makes it safe to ack late, a tweet left posting by a worker that died is settled by
+    reclaim_scheduled_tweets_task.
+    When the user or the app is out of rate limit, or twitter says so, the task retries itself once it isn't.
+    Other errors that may pass are retried with backoff up to TWEET_MAX_RETRIES times, after that,
+    or straight away for errors that won't pass or a user without a twitter token, the tweet is failed
+    and a DeadLetter saved.
+    """
+    scheduled_tweet = ScheduledTweet.objects.select_related('tweet').filter(id=scheduled_tweet_id).first()
+    if scheduled_tweet is None:
+        return f'dropped task for deleted scheduled tweet {scheduled_tweet_id}'
+    if not scheduled_tweet.start_posting(version):
+        return f'dropped task for scheduled tweet {scheduled_tweet_id} version {version}, it is taken or stale'
+    try:
+        user, twitter = get_user_twitter_api(username)
+    except SocialToken.DoesNotExist as e:
+        # the user disconnected twitter, posting again won't work until they connect it again
+        dead_letter(scheduled_tweet, e, True, attempt + 1)
+        return f'gave up on scheduled tweet {scheduled_tweet_id}, {username} has no twitter token'
+    # taken only once the tweet is ours, so duplicate and stale tasks don't use up the limit
+    wait = ratelimit.acquire(ratelimit.UPDATE, user, twitter)
+    if wait:
+        defer_tweet_task(self, scheduled_tweet, wait, attempt)
+    record = PostRecord(tweet=scheduled_tweet.tweet, time_to_tweet=scheduled_tweet.time_to_tweet,
+                        retries=attempt)
+
+    start = time.monotonic()
+    try:
+        tweet_twitter = twitter.update_status(status=scheduled_tweet.tweet.text)
+    except tweepy.TweepError as e:
+        record.api_latency = time.monotonic() - start
+        record.failed = True
+        record.error = str(e)
+        save_post_record(record)
+        # twitter didn't take the tweet, so it can safely be sent again
+        if isinstance(e, tweepy.RateLimitError):
+            wait = ratelimit.record_response(ratelimit.UPDATE, user, e.response) or ratelimit.DEFAULT_BACKOFF
+            defer_tweet_task(self, scheduled_tweet, wait, attempt)
+        permanent = is_permanent_error(e)
+        if not permanent and attempt < settings.TWEET_MAX_RETRIES:
+            defer_tweet_task(self, scheduled_tweet, retry_backoff(attempt), attempt + 1)
+        dead_letter(scheduled_tweet, e, permanent, attempt + 1)
+        return f'gave up on scheduled tweet {scheduled_tweet_id} after {attempt + 1} attempts - {e}'
+    record.api_latency = time.monotonic() - start
+    record.posted_at = timezone.now()
+    record.lag = (record.posted_at - scheduled_tweet.time_to_tweet).total_seconds()
+    save_post_record(record)
+    mark_posted(scheduled_tweet, tweet_twitter.id_str, record.posted_at)
 
     return f'sent tweet for user {user} - {scheduled_tweet.tweet.text}'
 
 
+def is_permanent_error(error):
+    """Whether posting again can't fix a TweepError, twitter refusing the request is permanent."""
+    if error.api_code == DAILY_LIMIT_ERROR_CODE:
+        return False
+    status_code = getattr(error.response, 'status_code', None)
+    return error.api_code in PERMANENT_ERROR_CODES or status_code in (400, 401, 403, 404)
+
+
+def retry_backoff(attempt):
+    """Seconds to wait before retrying attempt, doubled every attempt and jittered so retries don't bunch up."""
+    backoff = min(settings.TWEET_RETRY_BACKOFF * 2 ** attempt, settings.TWEET_RETRY_BACKOFF_MAX)
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+def defer_tweet_task(task, scheduled_tweet, countdown, attempt):
+    """
+    Retries tweet_task in countdown seconds as attempt. A claimed or posting tweet is held claimed until then,
+    so it isn't reclaimed and dispatched again while it waits.
+    """
+    ScheduledTweet.objects.filter(
+        pk=scheduled_tweet.pk, status__in=[ScheduledTweet.CLAIMED, ScheduledTweet.POSTING]
+    ).update(status=ScheduledTweet.CLAIMED,
+             claimed_until=timezone.now() + datetime.timedelta(seconds=countdown) + ScheduledTweet.CLAIM_LEASE)
+    invalidate_timelines([scheduled_tweet.tweet.user_id])
+    kwargs = dict(task.request.kwargs or {}, attempt=attempt)
+    raise task.retry(kwargs=kwargs, countdown=countdown, max_retries=None)
+
+
+def dead_letter(scheduled_tweet, error, permanent, attempts):
+    """Fails a posting tweet and saves a DeadLetter with the error for it, twitters response included."""
+    response = getattr(error, 'response', None)
+    with transaction.atomic():
+        ScheduledTweet.objects.filter(pk=scheduled_tweet.pk, status=ScheduledTweet.POSTING).update(
+            status=ScheduledTweet.FAILED, claimed_until=None
+        )
+        dead_letter = DeadLetter.objects.create(
+            scheduled_tweet=scheduled_tweet, error=str(error), api_code=getattr(error, 'api_code', None),
+            status_code=getattr(response, 'status_code', None), response=getattr(response, 'text', None) or '',
+            permanent=permanent, attempts=attempts,
+        )
+    invalidate_timelines([scheduled_tweet.tweet.user_id])
+    return dead_letter
+
+
+def redrive_dead_letters(dead_letters):
+    """
+    Sends the failed tweets of dead_letters that haven't been re-driven yet to be posted again, as soon as possible.
+    The version of each tweet is bumped so a task still around for it is dropped.
+    Returns the number of tweets re-driven.
+    """
+    redriven = 0
+    for dead_letter in dead_letters.filter(redriven_at__isnull=True).select_related('scheduled_tweet__tweet__user'):
+        scheduled_tweet = dead_letter.scheduled_tweet
+        version = scheduled_tweet.version + 1
+        task_id = uuid() if settings.TWEET_DISPATCH_MODE == 'eta' else None
+        with transaction.atomic():
+            updated = ScheduledTweet.objects.filter(
+                pk=scheduled_tweet.pk, version=scheduled_tweet.version, status=ScheduledTweet.FAILED
+            ).update(version=version, task_id=task_id, status=ScheduledTweet.PENDING, claimed_until=None)
+            DeadLetter.objects.filter(pk=dead_letter.pk).update(redriven_at=timezone.now())
+        if not updated:
+            # edited or re-driven by someone else since it failed
+            continue
+        invalidate_timelines([scheduled_tweet.tweet.user_id])
+        if task_id:
+            tweet_task.apply_async((scheduled_tweet.tweet.user.username, scheduled_tweet.id, version),
+                                   task_id=task_id)
+        redriven += 1
+    return redriven
+
+
+def mark_posted(scheduled_tweet, tweet_id, posted_at):
+    """
+    Saves that the tweet went out, and counts it in the users posting times unless it was already posted.
+    A sync may have saved the status as a tweet of its own before this ran, that copy is dropped for this one.
+    """
+    with transaction.atomic():
+        tweet = scheduled_tweet.tweet
+        synced, _ = Tweet.objects.filter(user_id=tweet.user_id, tweet_id=tweet_id).exclude(pk=tweet.pk).delete()
+        tweet.tweet_id = tweet_id
+        tweet.time_posted_at = posted_at
+        tweet.is_posted = True
+        tweet.save(update_fields=['tweet_id', 'time_posted_at', 'is_posted'])
+        posted = ScheduledTweet.objects.filter(pk=scheduled_tweet.pk).exclude(status=ScheduledTweet.POSTED).update(
+            status=ScheduledTweet.POSTED, claimed_until=None
+        )
+        if posted and not synced:
+            # a synced copy was counted when it was saved
+            record_posting_times(tweet.user_id, [posted_at])
+    invalidate_timelines([tweet.user_id])
+
+
 @shared_task
-def sync_tweets_task(username):
+def reclaim_scheduled_tweets_task():
+    """
+    Takes back the scheduled tweets whose lease ran out and dispatches the ones that are due again.
+    Claimed tweets never reached a worker and go straight back to pending. Posting tweets were being sent
+    by a worker that died or hung, so they are only sent again when twitter doesn't have them.
+    Returns the number of tweets dispatched again.
+    """
+    now = timezone.now()
+    expired_claims = ScheduledTweet.objects.filter(status=ScheduledTweet.CLAIMED, claimed_until__lt=now)
+    reclaimed = list(expired_claims.values_list('id', flat=True))
+    # the status is checked again so tweets a task started posting in the meantime are left alone
+    expired_claims.filter(id__in=reclaimed).update(status=ScheduledTweet.PENDING, task_id=None, claimed_until=None)
+
+    expired_posts = (ScheduledTweet.objects.filter(status=ScheduledTweet.POSTING, claimed_until__lt=now)
+                     .select_related('tweet__user'))
+    for scheduled_tweet in expired_posts:
+        # one tweet that can't be settled mustn't keep the others, or the reclaimed claims, from being dispatched
+        try:
+            if reconcile_post(scheduled_tweet):
+                reclaimed.append(scheduled_tweet.id)
+        except Exception:
+            logger.exception(f'could not reconcile scheduled tweet {scheduled_tweet.id}')
+
+    return dispatch_scheduled_tweets(ScheduledTweet.objects.filter(id__in=reclaimed, time_to_tweet__lte=now))
+
+
+def reconcile_post(scheduled_tweet):
+    """
+    Settles a tweet left posting: marks it posted when it is on the users recent timeline,
+    otherwise makes it pending again. Returns whether it was made pending.
+    When twitter can't be reached, or the user is out of rate limit, the tweet is left for the next run.
+    When the user has no twitter token it can't be settled or posted, so it is failed and a DeadLetter saved.
+    """
+    try:
+        user, twitter_api = get_user_twitter_api(scheduled_tweet.tweet.user.username)
+    except SocialToken.DoesNotExist as e:
+        dead_letter(scheduled_tweet, e, True, PostRecord.objects.filter(tweet=scheduled_tweet.tweet).count() + 1)
+        return False
+    if ratelimit.acquire(ratelimit.TIMELINE, user, twitter_api):
+        return False
+    try:
+        statuses = twitter_api.user_timeline(count=200)
+    except tweepy.TweepError:
+        return False
+    finally:
+        ratelimit.record_response(ratelimit.TIMELINE, user, getattr(twitter_api, 'last_response', None))
+
+    text = comparable_text(scheduled_tweet.tweet.text)
+    # twitter's created_at only has second precision
+    posting_since = (scheduled_tweet.claimed_until - ScheduledTweet.POSTING_LEASE).replace(microsecond=0)
+    for status in statuses:
+        created_at = status.created_at.replace(tzinfo=timezone.utc)
+        if comparable_text(status.text) == text and created_at >= posting_since:
+            mark_posted(scheduled_tweet, status.id_str, created_at)
+            return False
+    reclaimed = ScheduledTweet.objects.filter(
+        pk=scheduled_tweet.pk, status=ScheduledTweet.POSTING, claimed_until=scheduled_tweet.claimed_until
+    ).update(status=ScheduledTweet.PENDING, task_id=None, claimed_until=None)
+    invalidate_timelines([user.id])
+    return bool(reclaimed)
+
+
+def comparable_text(text):
+    """
+    Tweet text reduced so a tweet as it was sent and as twitter returns it compare equal.
+    Twitter html escapes &, < and >, rewrites links to t.co and may change whitespace.
+    """
+    return ' '.join(URL_PATTERN.sub('<url>', html.unescape(text)).split())
+
+
+@shared_task(bind=True)
+def sync_tweets_task(self, username, backfill=False):
     """
     Gets the users tweets from twitter and saves them to db.
     Does the syncing in background.
+    Only fetches tweets newer than the newest one saved by the last sync, paging through all of them.
+    With backfill the users whole timeline is paged through instead, to pick up older tweets.
     Will only save tweets 5 minutes or older to prevent race conditions with the tweet scheduler.
+    Every page takes a rate limit token, when they run out the sync retries itself once they're back
+    and starts over, the tweets it already saved are skipped.
     """
-    user = User.objects.get(username=username)
-    access_token = SocialToken.objects.get(account__user=user, app__provider='twitter')
-    twitter_api = get_authed_tweepy(access_token.token, access_token.token_secret)
+    try:
+        user, twitter_api = get_user_twitter_api(username)
+    except SocialToken.DoesNotExist:
+        return back_off_sync(username, 'no twitter token')
+    profile = Profile.objects.get(user=user)
 
-    tweets_twitter = twitter_api.user_timeline()
-    tweets_db_map = {twt.tweet_id: twt for twt in Tweet.objects.filter(user=user)}
+    since_id = None if backfill else profile.last_synced_tweet_id
+    pages = iter(tweepy.Cursor(twitter_api.user_timeline, since_id=since_id, count=200).pages())
 
-    for tweet_twit in tweets_twitter:
-        tweet_twit.created_at = tweet_twit.created_at.replace(tzinfo=timezone.utc)
-        if tweet_twit.id_str not in tweets_db_map:
-            if timezone.now() - tweet_twit.created_at >= datetime.timedelta(minutes=5):
-                new_tweet = Tweet(tweet_id=tweet_twit.id_str, user=user, text=tweet_twit.text,
-                                  time_posted_at=tweet_twit.created_at, is_posted=True)
-                new_tweet.save()
+    newest_id = int(profile.last_synced_tweet_id or 0)
+    while True:
+        wait = ratelimit.acquire(ratelimit.TIMELINE, user, twitter_api)
+        if wait:
+            raise self.retry(countdown=wait, max_retries=None)
+        try:
+            page = next(pages)
+        except StopIteration:
+            break
+        except tweepy.RateLimitError as e:
+            wait = ratelimit.record_response(ratelimit.TIMELINE, user, e.response) or ratelimit.DEFAULT_BACKOFF
+            raise self.retry(countdown=wait, max_retries=None)
+        except tweepy.TweepError as e:
+            if getattr(e.response, 'status_code', None) == 401:
+                return back_off_sync(username, e)
+            raise
+        ratelimit.record_response(ratelimit.TIMELINE, user, twitter_api.last_response)
+        synced_tweets = []
+        for tweet_twit in page:
+            created_at = tweet_twit.created_at.replace(tzinfo=timezone.utc)
+            if timezone.now() - created_at < datetime.timedelta(minutes=5):
+                continue
+            synced_tweets.append(Tweet(tweet_id=tweet_twit.id_str, user=user, text=tweet_twit.text,
+                                       time_posted_at=created_at, is_posted=True))
+            newest_id = max(newest_id, int(tweet_twit.id_str))
+        save_new_tweets(user, classify_tweets(synced_tweets))
 
-    profile = Profile.objects.get(user=user)
+    if newest_id:
+        profile.last_synced_tweet_id = str(newest_id)
     profile.last_sync_time = timezone.now()
-    profile.save()
+    profile.sync_queued_at = None
+    profile.save(update_fields=['last_synced_tweet_id', 'last_sync_time', 'sync_queued_at'])
+
+
+def back_off_sync(username, reason):
+    """
+    Releases the sync claim of a user twitter won't let us sync for, and counts it as a sync,
+    so the planner only tries them again after Profile.SYNC_THRESHOLD instead of on every run.
+    """
+    Profile.objects.filter(user__username=username).update(sync_queued_at=None, last_sync_time=timezone.now())
+    logger.warning('backing off syncing tweets for %s - %s', username, reason)
+    return f'backed off syncing tweets for {username} - {reason}'
+
+
+def stale_profiles(now):
+    """
+    Returns the profiles that haven't synced within Profile.SYNC_THRESHOLD and aren't queued for a sync.
+    Profiles without a twitter token are left out, they can't be synced.
+    """
+    return Profile.objects.filter(
+        Q(sync_queued_at__isnull=True) | Q(sync_queued_at__lt=now - Profile.SYNC_LOCK_TIMEOUT),
+        last_sync_time__lt=now - Profile.SYNC_THRESHOLD,
+    ).annotate(
+        has_token=Exists(SocialToken.objects.filter(account__user=OuterRef('user'), app__provider='twitter'))
+    ).filter(has_token=True).select_related('user')
+
+
+@shared_task
+def plan_tweet_syncs_task():
+    """
+    Queues a sync for the stale profiles, stalest first. At most TWEET_SYNC_BUDGET syncs are queued per run and
+    their start is spread evenly over TWEET_SYNC_PLAN_INTERVAL so the twitter api sees a steady load.
+    """
+    profiles_to_sync = stale_profiles(timezone.now())
+    spacing = settings.TWEET_SYNC_PLAN_INTERVAL / settings.TWEET_SYNC_BUDGET
+
+    queued = 0
+    cursor = None
+    while queued < settings.TWEET_SYNC_BUDGET:
+        profiles, cursor = paginate(profiles_to_sync, 'last_sync_time', cursor, page_size=100)
+        for profile in profiles:
+            if queued < settings.TWEET_SYNC_BUDGET and profile.claim_sync():
+                sync_tweets_task.apply_async((profile.user.username,), countdown=queued * spacing)
+                queued += 1
+        if cursor is None:
+            break
+    return queued
+
+
+@shared_task
+def expand_recurring_tweets_task():
+    """
+    Schedules the occurrences of recurring tweets that are due within RECURRING_TWEET_HORIZON seconds.
+    Returns the number of tweets scheduled.
+    """
+    horizon = timezone.now() + datetime.timedelta(seconds=settings.RECURRING_TWEET_HORIZON)
+    rules = (RecurringTweet.objects.filter(next_occurrence__lte=horizon).select_related('user')
+             .order_by('next_occurrence'))
+    return sum(schedule_occurrences(rule, horizon) for rule in rules.iterator())
+
+
+def schedule_occurrences(rule, horizon):
+    """
+    Schedules a tweet for each occurrence of the recurring tweet until horizon, and moves its next_occurrence past
+    them. Occurrences that went by before they were scheduled are skipped. Returns the number of tweets scheduled.
+    """
+    eta_mode = settings.TWEET_DISPATCH_MODE == 'eta'
+    now = timezone.now()
+    scheduled = 0
+    while rule.next_occurrence is not None and rule.next_occurrence <= horizon:
+        occurrence = rule.next_occurrence
+        following = next(occurrences(rule, occurrence), None)
+        with transaction.atomic():
+            # only one caller can move the rule past an occurrence, so it is scheduled once
+            if not RecurringTweet.objects.filter(pk=rule.pk, next_occurrence=occurrence).update(
+                    next_occurrence=following):
+                return scheduled
+            rule.next_occurrence = following
+            if occurrence < now:
+                continue
+            tweet = Tweet(user=rule.user, text=rule.text)
+            classify_tweets([tweet])
+            tweet.save()
+            scheduled_tweet = ScheduledTweet.objects.create(tweet=tweet, time_to_tweet=occurrence,
+                                                            task_id=uuid() if eta_mode else None)
+            if eta_mode:
+                transaction.on_commit(lambda scheduled_tweet=scheduled_tweet: tweet_task.apply_async(
+                    (rule.user.username, scheduled_tweet.id, scheduled_tweet.version),
+                    eta=scheduled_tweet.time_to_tweet, task_id=scheduled_tweet.task_id
+                ))
+            scheduled += 1
+    return scheduled
+
+
+@shared_task
+def archive_tweets_task():
+    """Archives the posted tweets older than TWEET_ARCHIVE_AFTER_DAYS. Returns the number archived."""
+    before = timezone.now() - datetime.timedelta(days=settings.TWEET_ARCHIVE_AFTER_DAYS)
+    return archive_tweets(before, batch_size=settings.TWEET_ARCHIVE_BATCH_SIZE)
+
+
+def save_new_tweets(user, tweets, retry_conflicts=True):
+    """
+    Saves the tweets whose tweet_id the user doesn't have yet, in the tweet table or the archive,
+    with a single insert. Only the ids of the given tweets are looked up, never the users whole history.
+    The posted ones are counted in the users posting times.
+    Returns the tweets that were saved.
+    """
+    tweet_ids = [tweet.tweet_id for tweet in tweets]
+    existing_ids = set(Tweet.objects.filter(user=user, tweet_id__in=tweet_ids)
+                       .order_by().values_list('tweet_id', flat=True))
+    existing_ids.update(ArchivedTweet.objects.filter(user=user, tweet_id__in=tweet_ids)
+                        .order_by().values_list('tweet_id', flat=True))
+    new_tweets = [tweet for tweet in tweets if tweet.tweet_id not in existing_ids]
+    if not new_tweets:
+        return []
+    try:
+        with transaction.atomic():
+            saved = Tweet.objects.bulk_create(new_tweets)
+            record_posting_times(user.id, [tweet.time_posted_at for tweet in saved if tweet.is_posted])
+    except IntegrityError:
+        if not retry_conflicts:
+            raise
+        # another sync saved some of the same tweets in the meantime
+        return save_new_tweets(user, tweets, retry_conflicts=False)
+    # bulk inserts don't send the signals that invalidate the cache
+    invalidate_timelines([user.id])
+    return saved
+
+
+@shared_task
+def dispatch_due_tweets_task():
+    """
+    Sends a tweet_task for every scheduled tweet that is due and hasn't been dispatched yet.
+    Only does anything when TWEET_DISPATCH_MODE is 'poll', otherwise the tasks are already waiting in the broker.
+    """
+    if settings.TWEET_DISPATCH_MODE != 'poll':
+        return 0
+
+    due_tweets = ScheduledTweet.objects.filter(time_to_tweet__lte=timezone.now())
+    dispatched = 0
+    while True:
+        count = dispatch_scheduled_tweets(due_tweets, settings.TWEET_DISPATCH_BATCH_SIZE)
+        dispatched += count
+        if count < settings.TWEET_DISPATCH_BATCH_SIZE:
+            return dispatched
+
+
+def dispatch_scheduled_tweets(scheduled_tweets, limit=None):
+    """
+    Claims up to limit pending rows of scheduled_tweets and sends a tweet_task for each of them.
+    Rows are locked with SELECT ... FOR UPDATE SKIP LOCKED so concurrent dispatchers never claim the same row.
+    A claimed row is reclaimed if its task hasn't started within ScheduledTweet.CLAIM_LEASE.
+    Tweets of users twitter has rate limited are left pending until their limit resets.
+    The tasks are sent once the claims are committed, so a task can't start before its tweet is claimed.
+    Returns the number of tweets dispatched.
+    """
+    tasks = []
+    with transaction.atomic():
+        claimed = list(scheduled_tweets.select_for_update(skip_locked=True)
+                       .filter(status=ScheduledTweet.PENDING)
+                       .exclude(tweet__user_id__in=ratelimit.blocked_users(ratelimit.UPDATE))
+                       .order_by('time_to_tweet')
+                       .values_list('id', 'version')[:limit])
+        ids = [scheduled_tweet_id for scheduled_tweet_id, version in claimed]
+        usernames = dict(ScheduledTweet.objects.filter(id__in=ids).values_list('id', 'tweet__user__username'))
+        claimed_until = timezone.now() + ScheduledTweet.CLAIM_LEASE
+        for scheduled_tweet_id, version in claimed:
+            task_id = uuid()
+            ScheduledTweet.objects.filter(id=scheduled_tweet_id).update(
+                status=ScheduledTweet.CLAIMED, claimed_until=claimed_until, task_id=task_id
+            )
+            tasks.append(((usernames[scheduled_tweet_id], scheduled_tweet_id, version), task_id))
+        transaction.on_commit(lambda: send_claimed_tweet_tasks(tasks))
+    return len(claimed)
+
+
+def send_claimed_tweet_tasks(tasks):
+    for args, task_id in tasks:
+        tweet_task.apply_async(args, task_id=task_id)
+
+
+# Per process caches, cleared by signals when a SocialApp or SocialToken changes.
+# The app credentials also expire so other processes pick up changes to the SocialApp.
+_twitter_app_credentials = {}
+_tweepy_clients = OrderedDict()
+
+
+def get_user_twitter_api(username):
+    """Returns the user and an authed tweepy instance for them, looked up with a single query."""
+    access_token = SocialToken.objects.select_related('account__user').get(
+        account__user__username=username, app__provider='twitter'
+    )
+    return access_token.account.user, get_authed_tweepy(access_token.token, access_token.token_secret)
 
 
 def get_authed_tweepy(access_token, token_secret):
-    """Returns an authed instance of the twitter api wrapper tweepy for a given user."""
-    social_app_twitter = get_object_or_404(SocialApp, provider='twitter')
+    """
+    Returns an authed instance of the twitter api wrapper tweepy for a given user.
+    Instances are reused from a least recently used cache of TWEEPY_CLIENT_CACHE_SIZE clients.
+    They are keyed on the app credentials too, so once those are refetched a changed app gets new clients
+    in every process, not just the one it was changed in.
+    """
+    client_id, secret = get_twitter_app_credentials()
+    key = (client_id, secret, access_token, token_secret)
+    try:
+        _tweepy_clients.move_to_end(key)
+        return _tweepy_clients[key]
+    except KeyError:
+        pass
 
-    auth = tweepy.OAuthHandler(social_app_twitter.client_id, social_app_twitter.secret)
+    auth = tweepy.OAuthHandler(client_id, secret)
     auth.set_access_token(access_token, token_secret)
-    return tweepy.API(auth)
+    twitter_api = tweepy.API(auth, host=settings.TWITTER_API_HOST)
+
+    _tweepy_clients[key] = twitter_api
+    while len(_tweepy_clients) > settings.TWEEPY_CLIENT_CACHE_SIZE:
+        _tweepy_clients.popitem(last=False)
+    return twitter_api
+
+
+def get_twitter_app_credentials():
+    """Returns the (client_id, secret) of the twitter SocialApp, cached for TWITTER_APP_CACHE_TIMEOUT seconds."""
+    if _twitter_app_credentials.get('expires', 0) < time.monotonic():
+        social_app_twitter = get_object_or_404(SocialApp, provider='twitter')
+        _twitter_app_credentials['credentials'] = (social_app_twitter.client_id, social_app_twitter.secret)
+        _twitter_app_credentials['expires'] = time.monotonic() + settings.TWITTER_APP_CACHE_TIMEOUT
+    return _twitter_app_credentials['credentials']
+
 
+def clear_twitter_client_cache():
+    _twitter_app_credentials.clear()
+    _tweepy_clients.clear()
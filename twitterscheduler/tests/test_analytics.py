@@ -0,0 +1,74 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+import datetime
+
+from twitterscheduler.analytics import record_posting_times, rebuild_posting_times, best_times, hour_of_week
+from twitterscheduler.models import Tweet, ScheduledTweet, PostingTimeBucket
+from twitterscheduler.tasks import save_new_tweets, mark_posted
+
+
+def local_time(day, hour, minute=0):
+    """A time on the day of the week, 0 being monday, of the first week of 2018 in the current time zone."""
+    return timezone.make_aware(datetime.datetime(2018, 1, 1 + day, hour, minute))
+
+
+class TestPostingTimes(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+
+    def buckets(self):
+        return dict(PostingTimeBucket.objects.filter(user=self.user, tweets__gt=0).values_list('hour_of_week', 'tweets'))
+
+    def test_hour_of_week_counts_from_monday_in_local_time(self):
+        self.assertEqual(hour_of_week(local_time(0, 0)), 0)
+        self.assertEqual(hour_of_week(local_time(2, 13, 59)), 61)
+        self.assertEqual(hour_of_week(local_time(6, 23)), 167)
+
+    def test_records_times_in_their_hour(self):
+        record_posting_times(self.user.id, [local_time(0, 9), local_time(0, 9, 30), local_time(4, 17), None])
+        self.assertEqual(self.buckets(), {9: 2, 113: 1})
+        self.assertEqual(PostingTimeBucket.objects.filter(user=self.user).count(), 168)
+
+    def test_records_with_a_single_update_once_buckets_exist(self):
+        record_posting_times(self.user.id, [local_time(0, 9)])
+        with CaptureQueriesContext(connection) as queries:
+            record_posting_times(self.user.id, [local_time(0, 9), local_time(1, 10)])
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertEqual(self.buckets(), {9: 2, 34: 1})
+
+    def test_sync_counts_saved_posted_tweets(self):
+        tweets = [Tweet(tweet_id=str(i), user=self.user, text=f'text {i}', is_posted=True,
+                        time_posted_at=local_time(i % 2, 8)) for i in range(3)]
+        save_new_tweets(self.user, tweets)
+        # tweets already saved aren't counted again
+        save_new_tweets(self.user, [Tweet(tweet_id='0', user=self.user, text='text 0', is_posted=True,
+                                          time_posted_at=local_time(0, 8))])
+        self.assertEqual(self.buckets(), {8: 2, 32: 1})
+
+    def test_posted_tweet_is_counted_once(self):
+        tweet = Tweet.objects.create(user=self.user, text='nice tweet')
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=tweet, time_to_tweet=timezone.now(),
+                                                        status=ScheduledTweet.POSTING)
+        mark_posted(scheduled_tweet, '1234', local_time(3, 20))
+        mark_posted(scheduled_tweet, '1234', local_time(3, 20))
+        self.assertEqual(self.buckets(), {92: 1})
+
+    def test_rebuild_recounts_from_posted_tweets(self):
+        record_posting_times(self.user.id, [local_time(5, 5)])
+        for i, time in enumerate([local_time(0, 23, 59), local_time(6, 0), local_time(6, 0, 30)]):
+            Tweet.objects.create(tweet_id=str(i), user=self.user, text='text', is_posted=True, time_posted_at=time)
+        Tweet.objects.create(user=self.user, text='not posted yet')
+
+        self.assertEqual(rebuild_posting_times([self.user.id]), 3)
+        self.assertEqual(self.buckets(), {23: 1, 144: 2})
+
+    def test_best_times(self):
+        record_posting_times(self.user.id, [local_time(1, 12), local_time(1, 12), local_time(0, 7), local_time(4, 9)])
+        week, busiest = best_times(self.user, count=2)
+        self.assertEqual([day for day, tweets in week][:2], ['Monday', 'Tuesday'])
+        self.assertEqual(week[1][1][12], 2)
+        self.assertEqual(busiest, [('Tuesday', 12, 2), ('Monday', 7, 1)])
@@ -0,0 +1,82 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+import datetime
+
+from twitterscheduler.analytics import rebuild_posting_times
+from twitterscheduler.archive import archive_tweets
+from twitterscheduler.models import Tweet, ArchivedTweet, ScheduledTweet, PostRecord, PostingTimeBucket
+from twitterscheduler.search import search_tweets
+from twitterscheduler.tasks import archive_tweets_task, save_new_tweets
+
+
+class TestArchiveTweets(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.now = timezone.now()
+
+    def create_tweet(self, tweet_id, days_ago, text='text', is_posted=True):
+        return Tweet.objects.create(user=self.user, tweet_id=tweet_id, text=text, is_posted=is_posted,
+                                    time_posted_at=self.now - datetime.timedelta(days=days_ago))
+
+    def test_moves_old_posted_tweets_to_archive(self):
+        old = self.create_tweet('1', 400, text='an old tweet')
+        self.create_tweet('2', 10)
+        self.assertEqual(archive_tweets(self.now - datetime.timedelta(days=365)), 1)
+        self.assertEqual(list(Tweet.objects.values_list('tweet_id', flat=True)), ['2'])
+        archived = ArchivedTweet.objects.get()
+        self.assertEqual((archived.id, archived.tweet_id, archived.text, archived.time_posted_at),
+                         (old.id, '1', 'an old tweet', old.time_posted_at))
+
+    def test_archives_in_batches(self):
+        for i in range(5):
+            self.create_tweet(str(i), 400 + i)
+        self.assertEqual(archive_tweets(self.now, batch_size=2), 5)
+        self.assertEqual(Tweet.objects.count(), 0)
+        self.assertEqual(ArchivedTweet.objects.count(), 5)
+
+    def test_keeps_tweets_posted_through_the_scheduler(self):
+        scheduled = self.create_tweet('1', 400)
+        ScheduledTweet.objects.create(tweet=scheduled, time_to_tweet=scheduled.time_posted_at,
+                                      status=ScheduledTweet.POSTED)
+        recorded = self.create_tweet('2', 400)
+        PostRecord.objects.create(tweet=recorded, time_to_tweet=recorded.time_posted_at)
+        self.assertEqual(archive_tweets(self.now), 0)
+        self.assertEqual(Tweet.objects.count(), 2)
+
+    @override_settings(TWEET_ARCHIVE_AFTER_DAYS=30)
+    def test_task_archives_tweets_older_than_setting(self):
+        self.create_tweet('1', 31)
+        self.create_tweet('2', 29)
+        self.assertEqual(archive_tweets_task(), 1)
+        self.assertEqual(list(ArchivedTweet.objects.values_list('tweet_id', flat=True)), ['1'])
+
+    def test_sync_does_not_save_archived_tweets_again(self):
+        self.create_tweet('1', 400)
+        archive_tweets(self.now)
+        saved = save_new_tweets(self.user, [Tweet(user=self.user, tweet_id=str(i), text='text', is_posted=True)
+                                            for i in range(1, 3)])
+        self.assertEqual([tweet.tweet_id for tweet in saved], ['2'])
+
+    def test_search_finds_archived_tweets(self):
+        archived = self.create_tweet('1', 400, text='dog dog dog')
+        recent = self.create_tweet('2', 1, text='a dog and a cat')
+        self.create_tweet('3', 400, text='only a cat')
+        archive_tweets(self.now - datetime.timedelta(days=365))
+        page, cursor = search_tweets(self.user, 'dog')
+        self.assertEqual([(type(tweet), tweet.id) for tweet in page],
+                         [(ArchivedTweet, archived.id), (Tweet, recent.id)])
+
+        page, cursor = search_tweets(self.user, 'dog', page_size=1)
+        self.assertEqual([tweet.id for tweet in page], [archived.id])
+        page, cursor = search_tweets(self.user, 'dog', cursor, page_size=1)
+        self.assertEqual([tweet.id for tweet in page], [recent.id])
+        self.assertIsNone(cursor)
+
+    def test_rebuilt_posting_times_count_archived_tweets(self):
+        self.create_tweet('1', 400)
+        self.create_tweet('2', 1)
+        archive_tweets(self.now - datetime.timedelta(days=365))
+        self.assertEqual(rebuild_posting_times([self.user.id]), 2)
+        self.assertEqual(sum(PostingTimeBucket.objects.values_list('tweets', flat=True)), 2)
@@ -0,0 +1,39 @@
+from django.test import TestCase
+
+from unittest import mock
+
+from twitterscheduler.benchmarks import seed, benchmark_index_view, benchmark_dispatch, compare_results
+from twitterscheduler.fake_twitter import FakeTwitter
+from twitterscheduler.models import Tweet, ScheduledTweet
+
+
+class TestBenchmarks(TestCase):
+    def test_seed(self):
+        users = seed(20, 2)
+        self.assertEqual(len(users), 2)
+        self.assertEqual(Tweet.objects.filter(user=users[0], is_posted=True).count(), 20)
+        self.assertEqual(ScheduledTweet.objects.filter(tweet__user=users[1]).count(), 2)
+
+    def test_benchmark_index_view(self):
+        result = benchmark_index_view(seed(5, 2), requests=3)
+        self.assertEqual(result['requests'], 3)
+        self.assertGreater(result['cold_queries'], result['warm_queries'])
+        self.assertLessEqual(result['cold_latency_p50_ms'], result['cold_latency_max_ms'])
+        self.assertLessEqual(result['warm_latency_p50_ms'], result['warm_latency_max_ms'])
+
+    def test_benchmark_dispatch_without_posts(self):
+        with mock.patch('twitterscheduler.benchmarks.time.time', side_effect=[0, 10 ** 6]):
+            result = benchmark_dispatch(FakeTwitter(), seed(5, 1), tweets=2, window=0, workers=1)
+        self.assertEqual(result, {'posted': 0, 'errors': 0, 'tweets': 2, 'posts_per_second': 0})
+
+    def test_compare_results(self):
+        baseline = [{'benchmark': 'sync', 'scale': 10, 'sync_p50_ms': 100, 'tweets_per_second': 50, 'syncs': 3}]
+        results = [
+            {'benchmark': 'sync', 'scale': 10, 'sync_p50_ms': 130, 'tweets_per_second': 45, 'syncs': 1},
+            {'benchmark': 'sync', 'scale': 100, 'sync_p50_ms': 1000},
+        ]
+        self.assertEqual(compare_results(baseline, results, 0.2), ['sync at scale 10: sync_p50_ms 100 -> 130'])
+        self.assertEqual(compare_results(baseline, results, 0.05), [
+            'sync at scale 10: sync_p50_ms 100 -> 130',
+            'sync at scale 10: tweets_per_second 50 -> 45',
+        ])
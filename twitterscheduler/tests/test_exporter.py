@@ -0,0 +1,81 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.shortcuts import reverse
+from django.utils import timezone
+
+import csv
+import datetime
+import io
+import json
+from unittest import mock
+
+from twitterscheduler.exporter import export_lines
+from twitterscheduler.models import Tweet, ArchivedTweet, ScheduledTweet
+
+
+class TestExportTweets(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.posted_at = timezone.now() - datetime.timedelta(days=1)
+        self.posted = Tweet.objects.create(user=self.user, tweet_id='1', text='posted, with a comma', is_posted=True,
+                                           time_posted_at=self.posted_at)
+        self.archived = ArchivedTweet.objects.create(id=self.posted.id + 100, user=self.user, tweet_id='2',
+                                                     text='archived', time_posted_at=self.posted_at)
+        self.unposted = Tweet.objects.create(user=self.user, text='scheduled')
+        self.scheduled = ScheduledTweet.objects.create(tweet=self.unposted, time_to_tweet=timezone.now())
+        Tweet.objects.create(user=User.objects.create_user('alice'), text='not bobs', is_posted=True)
+
+    def test_csv_has_every_row_of_the_user(self):
+        rows = list(csv.DictReader(io.StringIO(''.join(export_lines(self.user, 'csv')))))
+        self.assertEqual([(row['type'], row['id'], row['text']) for row in rows], [
+            ('tweet', str(self.posted.id), 'posted, with a comma'),
+            ('tweet', str(self.unposted.id), 'scheduled'),
+            ('archived_tweet', str(self.archived.id), 'archived'),
+            ('scheduled_tweet', str(self.scheduled.id), 'scheduled'),
+        ])
+        self.assertEqual(rows[0]['time_posted_at'], self.posted_at.isoformat())
+        self.assertEqual(rows[3]['tweet'], str(self.unposted.id))
+        self.assertEqual(rows[3]['status'], ScheduledTweet.PENDING)
+
+    def test_jsonl_has_a_line_per_row(self):
+        rows = [json.loads(line) for line in export_lines(self.user, 'jsonl')]
+        self.assertEqual([row['type'] for row in rows], ['tweet', 'tweet', 'archived_tweet', 'scheduled_tweet'])
+        self.assertEqual(rows[2], {'type': 'archived_tweet', 'id': self.archived.id, 'tweet_id': '2',
+                                   'text': 'archived', 'sentiment': 'u', 'is_posted': True,
+                                   'time_posted_at': rows[2]['time_posted_at']})
+
+    def test_rows_are_read_with_iterators(self):
+        with mock.patch('django.db.models.query.QuerySet.iterator', autospec=True,
+                        side_effect=lambda queryset: iter(queryset._clone())) as iterator:
+            lines = list(export_lines(self.user, 'jsonl'))
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(iterator.call_count, 3)
+
+
+class TestExportTweetsView(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.client.login(username='bob', password='nice_pass')
+        Tweet.objects.create(user=self.user, tweet_id='1', text='posted', is_posted=True)
+
+    def test_redirected_to_login_if_not_authed(self):
+        self.client.logout()
+        response = self.client.get(reverse('twitterscheduler:export-tweets'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_streams_csv_by_default(self):
+        response = self.client.get(reverse('twitterscheduler:export-tweets'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tweets.csv"')
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(content)))), 1)
+
+    def test_streams_jsonl(self):
+        response = self.client.get(reverse('twitterscheduler:export-tweets'), {'format': 'jsonl'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['text'], 'posted')
+
+    def test_invalid_format(self):
+        response = self.client.get(reverse('twitterscheduler:export-tweets'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
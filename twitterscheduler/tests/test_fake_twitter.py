@@ -0,0 +1,124 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.utils import timezone
+
+import os
+from unittest import mock
+
+import tweepy
+from celery.exceptions import Retry
+from allauth.socialaccount.models import SocialApp, SocialAccount, SocialToken
+
+from twitterscheduler.fake_twitter import TIMELINE_PATH, UPDATE_PATH, FakeTwitter, FakeTwitterServer
+from twitterscheduler.models import Tweet, ScheduledTweet
+from twitterscheduler.tasks import get_authed_tweepy, sync_tweets_task, tweet_task
+
+
+class TestFakeTwitter(TestCase):
+    def setUp(self):
+        self.now = 1500000000
+        self.twitter = FakeTwitter(timeline_size=3, clock=lambda: self.now)
+
+    def test_update_posts_to_users_timeline(self):
+        status, headers, body = self.twitter.handle('POST', UPDATE_PATH, {'status': 'hello'}, 'token')
+        self.assertEqual(status, 200)
+        self.assertEqual(body['text'], 'hello')
+        self.assertEqual(self.twitter.posts, [(self.now, 'token', 'hello')])
+        status, headers, body = self.twitter.handle('GET', TIMELINE_PATH, {}, 'token')
+        self.assertEqual([status['text'] for status in body], ['hello', 'fake tweet 2', 'fake tweet 1', 'fake tweet 0'])
+
+    def test_update_rejects_duplicates(self):
+        self.twitter.handle('POST', UPDATE_PATH, {'status': 'hello'}, 'token')
+        status, headers, body = self.twitter.handle('POST', UPDATE_PATH, {'status': 'hello'}, 'token')
+        self.assertEqual(status, 403)
+        self.assertEqual(body['errors'][0]['code'], 187)
+
+    def test_timeline_since_id_max_id_and_count(self):
+        status, headers, body = self.twitter.handle('GET', TIMELINE_PATH, {'since_id': '1', 'count': '1'}, 'token')
+        self.assertEqual([status['id'] for status in body], [3])
+        status, headers, body = self.twitter.handle('GET', TIMELINE_PATH, {'max_id': '2'}, 'token')
+        self.assertEqual([status['id'] for status in body], [2, 1])
+
+    def test_rate_limit_headers_and_429(self):
+        twitter = FakeTwitter(timeline_rate_limit=2, rate_limit_window=60, clock=lambda: self.now)
+        status, headers, body = twitter.handle('GET', TIMELINE_PATH, {}, 'token')
+        self.assertEqual(headers, {'x-rate-limit-limit': '2', 'x-rate-limit-remaining': '1',
+                                   'x-rate-limit-reset': str(self.now + 60)})
+        twitter.handle('GET', TIMELINE_PATH, {}, 'token')
+        status, headers, body = twitter.handle('GET', TIMELINE_PATH, {}, 'token')
+        self.assertEqual(status, 429)
+        self.assertEqual(headers['x-rate-limit-remaining'], '0')
+        # other users and a new window aren't limited
+        self.assertEqual(twitter.handle('GET', TIMELINE_PATH, {}, 'other')[0], 200)
+        self.now += 60
+        self.assertEqual(twitter.handle('GET', TIMELINE_PATH, {}, 'token')[0], 200)
+
+    def test_error_rate_and_latency(self):
+        sleep = mock.Mock()
+        twitter = FakeTwitter(latency=0.5, error_rate=1, sleep=sleep)
+        status, headers, body = twitter.handle('GET', TIMELINE_PATH, {}, 'token')
+        self.assertEqual(status, 503)
+        sleep.assert_called_once_with(0.5)
+
+
+class TestTasksAgainstFakeTwitter(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.twitter = FakeTwitter(timeline_size=5, timeline_rate_limit=3)
+        cls.server = FakeTwitterServer(('localhost', 0), cls.twitter)
+        cls.server.start()
+        cls.environ = mock.patch.dict(os.environ, {'REQUESTS_CA_BUNDLE': cls.server.certificate})
+        cls.environ.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.environ.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        site = Site.objects.create(domain='http://127.0.0.1:8000', name='localhost')
+        app = SocialApp.objects.create(provider='twitter', name='twitter', client_id='id_1234', secret='secret_1234')
+        app.sites.add(site)
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        account = SocialAccount.objects.create(user=self.user, provider='twitter')
+        SocialToken.objects.create(account=account, app=app, token=self.id(), token_secret='2')
+        self.settings = override_settings(TWITTER_API_HOST=self.server.host)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+
+    def test_tweet_task_posts_tweet(self):
+        tweet = Tweet.objects.create(user=self.user, text='to the fake api')
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=tweet, time_to_tweet=timezone.now())
+        tweet_task('bob', scheduled_tweet.id)
+        tweet.refresh_from_db()
+        self.assertTrue(tweet.is_posted)
+        self.assertEqual(self.twitter.posts[-1][1:], (self.id(), 'to the fake api'))
+
+    def test_sync_tweets_task_saves_timeline(self):
+        sync_tweets_task('bob')
+        self.assertEqual(sorted(Tweet.objects.filter(user=self.user).values_list('text', flat=True)),
+                         [f'fake tweet {i}' for i in range(5)])
+
+    def test_rate_limit_error(self):
+        twitter_api = get_authed_tweepy(self.id(), '2')
+        for i in range(3):
+            twitter_api.user_timeline()
+        self.assertEqual(twitter_api.last_response.headers['x-rate-limit-remaining'], '0')
+        with self.assertRaises(tweepy.RateLimitError):
+            twitter_api.user_timeline()
+
+    def test_sync_paces_itself_by_rate_limit_headers(self):
+        twitter_api = get_authed_tweepy(self.id(), '2')
+        for i in range(2):
+            twitter_api.user_timeline()
+        # the first page uses up the limit, so the sync retries instead of getting a 429
+        with self.assertRaises(Retry):
+            sync_tweets_task('bob')
+        self.assertEqual(Tweet.objects.filter(user=self.user).count(), 5)
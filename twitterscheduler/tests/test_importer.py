@@ -0,0 +1,86 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.shortcuts import reverse
+
+import io
+import json
+from unittest import mock
+
+from twitterscheduler.importer import import_scheduled_tweets, send_tweet_tasks, format_for_filename
+from twitterscheduler.models import Tweet, ScheduledTweet
+
+
+class TestImportScheduledTweets(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+
+    def csv_lines(self, rows):
+        return io.StringIO('time_to_tweet,text\n' + ''.join(f'{time},{text}\n' for time, text in rows))
+
+    def test_imports_csv_rows_in_chunks(self):
+        rows = [(f'2030-01-01 10:{i:02}', f'tweet {i}') for i in range(7)]
+        result = import_scheduled_tweets(self.user, self.csv_lines(rows), 'csv', chunk_size=3)
+        self.assertEqual(result.imported, 7)
+        scheduled = ScheduledTweet.objects.filter(tweet__user=self.user)
+        self.assertEqual([s.tweet.text for s in scheduled], [f'tweet {i}' for i in range(7)])
+
+    def test_imports_jsonl_rows(self):
+        lines = io.StringIO('\n'.join(json.dumps({'time_to_tweet': '2030-01-01 10:00', 'text': f'tweet {i}'})
+                                      for i in range(3)))
+        result = import_scheduled_tweets(self.user, lines, 'jsonl')
+        self.assertEqual(result.imported, 3)
+        self.assertEqual(len(Tweet.objects.filter(user=self.user)), 3)
+
+    def test_invalid_rows_are_skipped_and_reported(self):
+        lines = io.StringIO('{"time_to_tweet": "2030-01-01 10:00", "text": "fine"}\n'
+                            'not json\n'
+                            '{"time_to_tweet": "tomorrow", "text": "bad time"}\n')
+        result = import_scheduled_tweets(self.user, lines, 'jsonl')
+        self.assertEqual(result.imported, 1)
+        self.assertEqual(result.invalid, 2)
+        self.assertEqual([line_number for line_number, error in result.errors], [2, 3])
+
+    @override_settings(TWEET_DISPATCH_MODE='poll')
+    def test_no_tasks_in_poll_mode(self):
+        import_scheduled_tweets(self.user, self.csv_lines([('2030-01-01 10:00', 'tweet')]), 'csv')
+        self.assertIsNone(ScheduledTweet.objects.get(tweet__text='tweet').task_id)
+
+    @override_settings(TWEET_DISPATCH_MODE='eta')
+    def test_task_ids_assigned_in_eta_mode(self):
+        import_scheduled_tweets(self.user, self.csv_lines([('2030-01-01 10:00', 'tweet')]), 'csv')
+        self.assertIsNotNone(ScheduledTweet.objects.get(tweet__text='tweet').task_id)
+
+    @mock.patch('twitterscheduler.importer.tweet_task')
+    def test_send_tweet_tasks_uses_assigned_task_ids(self, task_mock):
+        import_scheduled_tweets(self.user, self.csv_lines([('2030-01-01 10:00', 'tweet')]), 'csv')
+        scheduled = ScheduledTweet.objects.get(tweet__text='tweet')
+        with mock.patch('twitterscheduler.importer.app'):
+            send_tweet_tasks('bob', [scheduled])
+        args, kwargs = task_mock.apply_async.call_args
+        self.assertEqual(args, (('bob', scheduled.id, 0),))
+        self.assertEqual(kwargs['task_id'], scheduled.task_id)
+        self.assertEqual(kwargs['eta'], scheduled.time_to_tweet)
+
+    def test_format_for_filename(self):
+        self.assertEqual(format_for_filename('tweets.CSV'), 'csv')
+        self.assertEqual(format_for_filename('tweets.jsonl'), 'jsonl')
+
+
+@override_settings(TWEET_DISPATCH_MODE='poll')
+class TestImportScheduledTweetsView(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.view_reverse = reverse('twitterscheduler:import-scheduled-tweets')
+
+    def test_redirected_to_login_if_not_authed(self):
+        resp = self.client.get(self.view_reverse)
+        self.assertRedirects(resp, f'/accounts/login/?next={self.view_reverse}')
+
+    def test_upload_schedules_tweets(self):
+        login = self.client.login(username='bob', password='nice_pass')
+        upload = SimpleUploadedFile('tweets.csv', b'time_to_tweet,text\n2030-01-01 10:00,hello there\n')
+        resp = self.client.post(self.view_reverse, {'file': upload})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['result'].imported, 1)
+        self.assertEqual(len(ScheduledTweet.objects.filter(tweet__user=self.user)), 1)
@@ -1,6 +1,6 @@
 from django.test import TestCase
 from django.contrib.auth.models import User
-from django.db.utils import DataError
+from django.db.utils import DataError, IntegrityError
 from django.utils import timezone
 
 from twitterscheduler.models import Profile, Tweet, ScheduledTweet
@@ -40,6 +40,22 @@ class TestProfile(TestCase):
     def test_new_profile_not_recently_synced(self):
         self.assertIs(self.profile.synced_tweets_recently(), False)
 
+    def test_claim_sync_when_no_sync_queued(self):
+        self.assertIs(self.profile.claim_sync(), True)
+        self.assertIsNotNone(Profile.objects.get(pk=self.profile.id).sync_queued_at)
+
+    def test_claim_sync_suppressed_while_sync_queued(self):
+        self.profile.claim_sync()
+        self.assertIs(self.profile.claim_sync(), False)
+        self.assertIs(self.profile.claim_sync(), False)
+        self.assertEqual(Profile.objects.get(pk=self.profile.id).suppressed_sync_count, 2)
+
+    def test_claim_sync_after_lock_timeout(self):
+        Profile.objects.filter(pk=self.profile.id).update(
+            sync_queued_at=timezone.now() - Profile.SYNC_LOCK_TIMEOUT - timedelta(seconds=1)
+        )
+        self.assertIs(self.profile.claim_sync(), True)
+
     def test_profile_created_when_user_is_created(self):
         user = User.objects.create_user('roe', password='nice')
         self.assertEqual(len(Profile.objects.filter(user=user)), 1)
@@ -58,6 +74,14 @@ class TestTweetModel(TestCase):
     def test_tweet_id_exceed_max_value(self):
         self.assertRaises(DataError, Tweet.objects.create, tweet_id='1'*65, user=self.user, text='rando text')
 
+    def test_tweet_id_unique_per_user(self):
+        self.assertRaises(IntegrityError, Tweet.objects.create, tweet_id='1', user=self.user, text='rando text')
+
+    def test_same_tweet_id_allowed_for_different_users(self):
+        user = User.objects.create_user('roe', 'nice_pass')
+        tweet = Tweet.objects.create(tweet_id='1', user=user, text='rando text')
+        self.assertEqual(tweet.tweet_id, '1')
+
     def test_tweet_deleted_when_user_is_deleted(self):
         self.user.delete()
         self.assertEqual(len(Tweet.objects.filter(tweet_id='1')), 0)
@@ -70,16 +94,16 @@ class TestTweetModel(TestCase):
         self.assertEqual(self.tweet.sentiment, 'u')
 
     def test_valid_sentiment_value(self):
-        tweet = Tweet.objects.create(tweet_id='1', user=self.user, text='rando text', sentiment='p')
+        tweet = Tweet.objects.create(tweet_id='2', user=self.user, text='rando text', sentiment='p')
         self.assertTrue(('p', 'positive') in tweet._meta.get_field('sentiment').choices)
         self.assertTrue(('n', 'negative') in tweet._meta.get_field('sentiment').choices)
 
     def test_invalid_sentiment_value(self):
-        tweet = Tweet.objects.create(tweet_id='1', user=self.user, text='rando text', sentiment='g')
+        tweet = Tweet.objects.create(tweet_id='2', user=self.user, text='rando text', sentiment='g')
         self.assertTrue(('g', 'grandiose') not in tweet._meta.get_field('sentiment').choices)
 
     def test_time_posted_at_can_be_blank(self):
-        tweet = Tweet.objects.create(tweet_id='1', user=self.user, text='rando text')
+        tweet = Tweet.objects.create(tweet_id='2', user=self.user, text='rando text')
         self.assertEqual(tweet.time_posted_at, None)
 
     def test_is_posted_default_False(self):
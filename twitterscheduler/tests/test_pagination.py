@@ -0,0 +1,55 @@
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth.models import User
+
+import datetime
+
+from twitterscheduler.models import Tweet
+from twitterscheduler.pagination import paginate, encode_cursor, decode_cursor
+
+
+class TestPaginate(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        now = timezone.now()
+        self.tweets = [Tweet.objects.create(user=self.user, text=f'text {i}', time_posted_at=now - datetime.timedelta(minutes=i))
+                       for i in range(3)]
+        # same time as the previous tweet and one with no time at all
+        self.tweets.append(Tweet.objects.create(user=self.user, text='tie', time_posted_at=self.tweets[2].time_posted_at))
+        self.tweets.append(Tweet.objects.create(user=self.user, text='no time'))
+
+    def collect_pages(self, page_size, descending):
+        pages = []
+        items, cursor = paginate(Tweet.objects.all(), 'time_posted_at', page_size=page_size, descending=descending)
+        pages.append(items)
+        while cursor:
+            items, cursor = paginate(Tweet.objects.all(), 'time_posted_at', cursor, page_size=page_size, descending=descending)
+            pages.append(items)
+        return pages
+
+    def test_pages_cover_every_row_once_descending(self):
+        pages = self.collect_pages(2, descending=True)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual([tweet for page in pages for tweet in page],
+                         [self.tweets[0], self.tweets[1], self.tweets[3], self.tweets[2], self.tweets[4]])
+
+    def test_pages_cover_every_row_once_ascending(self):
+        pages = self.collect_pages(2, descending=False)
+        self.assertEqual([tweet for page in pages for tweet in page],
+                         [self.tweets[2], self.tweets[3], self.tweets[1], self.tweets[0], self.tweets[4]])
+
+    def test_last_page_has_no_cursor(self):
+        items, cursor = paginate(Tweet.objects.all(), 'time_posted_at', page_size=5)
+        self.assertEqual(len(items), 5)
+        self.assertIsNone(cursor)
+
+    def test_cursor_round_trip(self):
+        value = self.tweets[0].time_posted_at
+        self.assertEqual(decode_cursor(encode_cursor(value, 7)), (value, 7))
+        self.assertEqual(decode_cursor(encode_cursor(None, 7)), (None, 7))
+
+    def test_malformed_cursor_raises_value_error(self):
+        self.assertRaises(ValueError, decode_cursor, 'nope')
+
+    def test_out_of_range_cursor_raises_overflow_error(self):
+        self.assertRaises(OverflowError, decode_cursor, f'{10 ** 20}_1')
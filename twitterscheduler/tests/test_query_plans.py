@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+import json
+import os
+import unittest
+
+from allauth.socialaccount.models import SocialApp
+
+from twitterscheduler.models import Tweet, ScheduledTweet
+from twitterscheduler.pagination import after_cursor
+from twitterscheduler.search import search_sql
+from twitterscheduler.tasks import stale_profiles
+
+# Seeding the dataset takes minutes, so the query plans are only checked when QUERY_PLAN_TESTS is set.
+RUN_QUERY_PLAN_TESTS = bool(os.environ.get('QUERY_PLAN_TESTS'))
+# Size of the dataset seeded for the planner. Half of the tweets belong to the first user, the rest are spread
+# over the other users. Every 10th tweet is unposted and scheduled and every 10th user has no twitter token.
+SEEDED_TWEETS = int(os.environ.get('QUERY_PLAN_TWEETS', 2000000))
+SEEDED_USERS = int(os.environ.get('QUERY_PLAN_USERS', 100000))
+
+
+def used_indexes(queryset):
+    """Returns the names of the indexes postgres plans to use for the queryset."""
+    return used_indexes_sql(*queryset.query.sql_with_params())
+
+
+def used_indexes_sql(sql, params):
+    """Returns the names of the indexes postgres plans to use for the sql."""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    names = set()
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if 'Index Name' in node:
+            names.add(node['Index Name'])
+        nodes.extend(node.get('Plans', []))
+    return names
+
+
+@unittest.skipUnless(RUN_QUERY_PLAN_TESTS, 'set QUERY_PLAN_TESTS to check the query plans')
+@unittest.skipUnless(connection.vendor == 'postgresql', 'query plans are only checked on postgres')
+class TestQueryPlans(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        app = SocialApp.objects.create(provider='twitter', name='twitter', client_id='id', secret='secret')
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO auth_user (password, is_superuser, username, first_name, last_name, email,
+                                       is_staff, is_active, date_joined)
+                SELECT '', false, 'plan_user_' || i, '', '', '', false, true, now()
+                FROM generate_series(1, %s) AS i
+            """, [SEEDED_USERS])
+            cursor.execute("""
+                INSERT INTO twitterscheduler_profile (user_id, require_correctly_spelled, require_positive_sentiment,
+                                                      last_sync_time, suppressed_sync_count)
+                SELECT id, false, false, now() - (id % 1440) * interval '1 minute', 0
+                FROM auth_user WHERE username LIKE 'plan_user_%'
+            """)
+            cursor.execute("""
+                INSERT INTO socialaccount_socialaccount (user_id, provider, uid, last_login, date_joined, extra_data)
+                SELECT id, 'twitter', id::text, now(), now(), '{}'
+                FROM auth_user WHERE username LIKE 'plan_user_%' AND id % 10 != 0
+            """)
+            cursor.execute("""
+                INSERT INTO socialaccount_socialtoken (app_id, account_id, token, token_secret)
+                SELECT %s, id, 'token', 'secret' FROM socialaccount_socialaccount
+            """, [app.id])
+            cursor.execute("""
+                INSERT INTO twitterscheduler_tweet (tweet_id, user_id, text, sentiment, time_posted_at, is_posted)
+                SELECT i::text, u.first_id + CASE WHEN i %% 2 = 0 THEN 0 ELSE i %% %s END, 'tweet ' || i, 'u',
+                       now() - i * interval '1 minute', i %% 10 != 0
+                FROM generate_series(1, %s) AS i,
+                     (SELECT min(id) AS first_id FROM auth_user WHERE username LIKE 'plan_user_%%') AS u
+            """, [SEEDED_USERS, SEEDED_TWEETS])
+            # almost every scheduled tweet has already been posted
+            cursor.execute("""
+                INSERT INTO twitterscheduler_scheduledtweet (tweet_id, created_at, time_to_tweet, task_id, version,
+                                                             status)
+                SELECT id, now(), now() + (id % 100000 - 100) * interval '1 minute', md5(id::text)::uuid::text, 0,
+                       CASE WHEN id % 1000 = 0 THEN 'pending' ELSE 'posted' END
+                FROM twitterscheduler_tweet WHERE NOT is_posted
+            """)
+            for table in ['auth_user', 'twitterscheduler_profile', 'twitterscheduler_tweet',
+                          'twitterscheduler_scheduledtweet', 'socialaccount_socialaccount',
+                          'socialaccount_socialtoken']:
+                cursor.execute(f'ANALYZE {table}')
+        cls.user = User.objects.get(username='plan_user_1')
+
+    def test_index_view_tweets_use_timeline_index(self):
+        tweets = Tweet.objects.filter(user=self.user, is_posted=True)
+        queryset = after_cursor(tweets, 'time_posted_at', descending=True)[:settings.TIMELINE_PAGE_SIZE + 1]
+        self.assertIn('tweet_posted_timeline_idx', used_indexes(queryset))
+
+    def test_sync_lookup_uses_unique_user_tweet_id_index(self):
+        queryset = (Tweet.objects.filter(user=self.user, tweet_id__in=[str(i) for i in range(1, 200)])
+                    .order_by().values_list('tweet_id', flat=True))
+        self.assertTrue(any(name.startswith('twitterscheduler_tweet_user_id_tweet_id')
+                            for name in used_indexes(queryset)))
+
+    def test_due_tweet_scan_uses_pending_index(self):
+        queryset = (ScheduledTweet.objects.filter(time_to_tweet__lte=timezone.now(), status=ScheduledTweet.PENDING)
+                    .order_by('time_to_tweet').values_list('id', flat=True)[:settings.TWEET_DISPATCH_BATCH_SIZE])
+        self.assertIn('scheduledtweet_pending_idx', used_indexes(queryset))
+
+    def test_reclaim_scan_uses_leased_index(self):
+        queryset = ScheduledTweet.objects.filter(status=ScheduledTweet.POSTING, claimed_until__lt=timezone.now())
+        self.assertIn('scheduledtweet_leased_idx', used_indexes(queryset))
+
+    def test_search_uses_search_vector_index(self):
+        self.assertIn('tweet_search_vector_idx', used_indexes_sql(*search_sql(self.user, '12346')))
+        self.assertIn('tweet_search_vector_idx', used_indexes_sql(*search_sql(self.user, '12346', '0.06_12346')))
+
+    def test_sync_planner_uses_last_sync_time_index(self):
+        queryset = after_cursor(stale_profiles(timezone.now()), 'last_sync_time')[:101]
+        self.assertIn('profile_last_sync_time_idx', used_indexes(queryset))
@@ -0,0 +1,79 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+import datetime
+from unittest import mock
+
+from twitterscheduler import ratelimit
+from twitterscheduler.models import RateLimitBucket
+
+
+@override_settings(TWITTER_RATE_LIMITS={'statuses/update': {'user': (2, 60), 'app': (3, 60)}})
+class TestRateLimit(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.other_user = User.objects.create_user('alice', password='nice_pass')
+        self.twitter_api = mock.Mock()
+        self.twitter_api.auth.consumer_key = b'id_1234'
+
+    def headers(self, remaining, reset):
+        return mock.Mock(headers={'x-rate-limit-remaining': str(remaining),
+                                  'x-rate-limit-reset': str(int(reset.timestamp()))})
+
+    def test_takes_tokens_until_users_bucket_is_empty(self):
+        self.assertEqual(ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api), 0)
+        self.assertEqual(ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api), 0)
+        # a token comes back every 30 seconds
+        self.assertAlmostEqual(ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api), 30, delta=1)
+        # the apps 3 requests are split over 3 shards, two of them are used up
+        app_shards = RateLimitBucket.objects.filter(key__startswith='statuses/update:app:id_1234:')
+        self.assertEqual(sorted(round(tokens, 2) for tokens in app_shards.values_list('tokens', flat=True)), [0, 0])
+
+    def test_apps_bucket_is_shared_by_users(self):
+        for user in [self.user, self.user, self.other_user]:
+            self.assertEqual(ratelimit.acquire(ratelimit.UPDATE, user, self.twitter_api), 0)
+        self.assertGreater(ratelimit.acquire(ratelimit.UPDATE, self.other_user, self.twitter_api), 0)
+        # nothing is taken from the users bucket when the apps is empty
+        self.assertAlmostEqual(RateLimitBucket.objects.get(key=f'statuses/update:user:{self.other_user.id}').tokens,
+                               1, places=2)
+
+    @override_settings(TWITTER_RATE_LIMITS={'statuses/update': {'user': (100, 60), 'app': (80, 60)}})
+    def test_apps_bucket_is_split_over_shards(self):
+        self.assertEqual(ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api), 0)
+        shards = RateLimitBucket.objects.filter(key__startswith='statuses/update:app:id_1234:')
+        self.assertEqual(shards.count(), 1)
+        self.assertAlmostEqual(shards.get().tokens, 80 / ratelimit.APP_BUCKET_SHARDS - 1, places=2)
+        for i in range(79):
+            self.assertEqual(ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api), 0)
+        self.assertEqual(shards.count(), ratelimit.APP_BUCKET_SHARDS)
+        self.assertGreater(ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api), 0)
+
+    def test_buckets_refill_over_the_window(self):
+        ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api)
+        ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api)
+        RateLimitBucket.objects.update(updated_at=timezone.now() - datetime.timedelta(seconds=30))
+        self.assertEqual(ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api), 0)
+
+    def test_used_up_limit_blocks_user_until_reset(self):
+        ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api)
+        reset = timezone.now() + datetime.timedelta(minutes=10)
+        wait = ratelimit.record_response(ratelimit.UPDATE, self.user, self.headers(0, reset))
+        self.assertAlmostEqual(wait, 600, delta=2)
+        self.assertAlmostEqual(ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api), 600, delta=2)
+        self.assertEqual(list(ratelimit.blocked_users(ratelimit.UPDATE)), [self.user.id])
+
+        RateLimitBucket.objects.update(blocked_until=timezone.now())
+        self.assertEqual(ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api), 0)
+        self.assertEqual(list(ratelimit.blocked_users(ratelimit.UPDATE)), [])
+
+    def test_headers_lower_tokens_left(self):
+        ratelimit.acquire(ratelimit.UPDATE, self.user, self.twitter_api)
+        reset = timezone.now() + datetime.timedelta(minutes=10)
+        self.assertEqual(ratelimit.record_response(ratelimit.UPDATE, self.user, self.headers(5, reset)), 0)
+        self.assertAlmostEqual(RateLimitBucket.objects.get(key=f'statuses/update:user:{self.user.id}').tokens, 1,
+                               places=2)
+
+    def test_response_without_headers_is_ignored(self):
+        self.assertEqual(ratelimit.record_response(ratelimit.UPDATE, self.user, None), 0)
+        self.assertEqual(ratelimit.record_response(ratelimit.UPDATE, self.user, mock.Mock(headers={})), 0)
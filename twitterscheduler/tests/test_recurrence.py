@@ -0,0 +1,105 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+import datetime
+from unittest import mock
+
+from twitterscheduler.models import RecurringTweet, ScheduledTweet
+from twitterscheduler.recurrence import next_occurrences, occurs_on
+from twitterscheduler.tasks import expand_recurring_tweets_task, schedule_occurrences
+
+
+def local_time(*args):
+    return timezone.make_aware(datetime.datetime(*args))
+
+
+class TestOccurrences(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+
+    def rule(self, **kwargs):
+        # 2018-01-01 is a monday
+        fields = dict(user=self.user, text='evergreen', frequency=RecurringTweet.WEEKLY, weekdays='0',
+                      time_of_day=datetime.time(9), starts_on=datetime.date(2018, 1, 1))
+        fields.update(kwargs)
+        return RecurringTweet(**fields)
+
+    def test_every_monday_at_9(self):
+        self.assertEqual(next_occurrences(self.rule(), 3, after=local_time(2018, 1, 1, 9)), [
+            local_time(2018, 1, 8, 9), local_time(2018, 1, 15, 9), local_time(2018, 1, 22, 9)
+        ])
+
+    def test_several_days_every_other_week(self):
+        rule = self.rule(weekdays='2,4', interval=2)
+        self.assertEqual(next_occurrences(rule, 4, after=local_time(2017, 12, 1)), [
+            local_time(2018, 1, 3, 9), local_time(2018, 1, 5, 9), local_time(2018, 1, 17, 9), local_time(2018, 1, 19, 9)
+        ])
+
+    def test_every_third_day(self):
+        rule = self.rule(frequency=RecurringTweet.DAILY, interval=3, time_of_day=datetime.time(18, 30))
+        self.assertEqual(next_occurrences(rule, 2, after=local_time(2018, 1, 3)),
+                         [local_time(2018, 1, 4, 18, 30), local_time(2018, 1, 7, 18, 30)])
+        self.assertFalse(occurs_on(rule, datetime.date(2018, 1, 5)))
+
+    def test_stops_on_last_day(self):
+        rule = self.rule(ends_on=datetime.date(2018, 1, 8))
+        self.assertEqual(next_occurrences(rule, 5, after=local_time(2017, 12, 1)),
+                         [local_time(2018, 1, 1, 9), local_time(2018, 1, 8, 9)])
+
+    def test_weekly_rule_without_days_never_occurs(self):
+        self.assertEqual(next_occurrences(self.rule(weekdays=''), 5), [])
+
+
+class TestExpandRecurringTweets(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.now = timezone.now()
+        self.rule = RecurringTweet.objects.create(
+            user=self.user, text='evergreen', frequency=RecurringTweet.DAILY, time_of_day=datetime.time(9),
+            starts_on=timezone.localtime(self.now).date() - datetime.timedelta(days=7),
+            next_occurrence=self.now + datetime.timedelta(minutes=30)
+        )
+
+    def test_schedules_occurrence_within_horizon(self):
+        self.assertEqual(expand_recurring_tweets_task(), 1)
+        scheduled = ScheduledTweet.objects.get()
+        self.assertEqual((scheduled.tweet.text, scheduled.tweet.user), ('evergreen', self.user))
+        self.assertEqual(scheduled.time_to_tweet, self.now + datetime.timedelta(minutes=30))
+        self.assertIsNotNone(scheduled.task_id)
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.next_occurrence, next_occurrences(self.rule, 1, after=scheduled.time_to_tweet)[0])
+
+        # the next occurrence is a day away
+        self.assertEqual(expand_recurring_tweets_task(), 0)
+        self.assertEqual(ScheduledTweet.objects.count(), 1)
+
+    def test_leaves_occurrences_beyond_horizon(self):
+        RecurringTweet.objects.update(next_occurrence=self.now + datetime.timedelta(hours=2))
+        self.assertEqual(expand_recurring_tweets_task(), 0)
+        self.assertEqual(ScheduledTweet.objects.count(), 0)
+
+    @override_settings(TWEET_DISPATCH_MODE='poll')
+    def test_no_task_ids_in_poll_mode(self):
+        expand_recurring_tweets_task()
+        self.assertIsNone(ScheduledTweet.objects.get().task_id)
+
+    def test_skips_occurrences_that_went_by(self):
+        RecurringTweet.objects.update(next_occurrence=self.now - datetime.timedelta(days=3))
+        self.assertEqual(expand_recurring_tweets_task(), 0)
+        self.rule.refresh_from_db()
+        self.assertGreater(self.rule.next_occurrence, self.now)
+
+    def test_occurrence_is_scheduled_once(self):
+        stale_rule = RecurringTweet.objects.get()
+        self.assertEqual(schedule_occurrences(self.rule, self.now + datetime.timedelta(hours=1)), 1)
+        self.assertEqual(schedule_occurrences(stale_rule, self.now + datetime.timedelta(hours=1)), 0)
+        self.assertEqual(ScheduledTweet.objects.count(), 1)
+
+    def test_ended_rule_has_no_next_occurrence(self):
+        # posted at the time of the last occurrence, so the one after it is the day after ends_on
+        last_occurrence = timezone.localtime(self.rule.next_occurrence)
+        RecurringTweet.objects.update(ends_on=last_occurrence.date(), time_of_day=last_occurrence.time())
+        self.rule.refresh_from_db()
+        self.assertEqual(schedule_occurrences(self.rule, self.now + datetime.timedelta(hours=1)), 1)
+        self.assertIsNone(RecurringTweet.objects.get().next_occurrence)
@@ -0,0 +1,85 @@
+from django.db import OperationalError
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth.models import User
+
+import datetime
+from unittest import mock
+
+from twitterscheduler.models import Tweet, ScheduledTweet
+from twitterscheduler.scheduler import TweetScheduler
+
+
+# a TestCase never commits, so the tasks fire_due sends on commit are sent straight away
+@mock.patch('django.db.transaction.on_commit', lambda func: func())
+class TestTweetScheduler(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.now = timezone.now()
+        self.scheduler = TweetScheduler(window=datetime.timedelta(minutes=5), clock=lambda: self.now)
+
+    def schedule(self, text, minutes):
+        tweet = Tweet.objects.create(user=self.user, text=text)
+        return ScheduledTweet.objects.create(tweet=tweet, time_to_tweet=self.now + datetime.timedelta(minutes=minutes))
+
+    def test_refill_only_loads_tweets_within_window(self):
+        soon = self.schedule('soon', 1)
+        self.schedule('later', 10)
+        self.scheduler.refill()
+        self.assertEqual(list(self.scheduler.loaded), [soon.id])
+
+    def test_refill_does_not_load_a_tweet_twice(self):
+        self.schedule('soon', 1)
+        self.scheduler.refill()
+        self.scheduler.refill()
+        self.assertEqual(len(self.scheduler.heap), 1)
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_fire_due_dispatches_only_due_tweets(self, task_mock):
+        soon = self.schedule('soon', 1)
+        self.schedule('a bit later', 3)
+        self.scheduler.refill()
+
+        self.now += datetime.timedelta(minutes=1)
+        self.assertEqual(self.scheduler.fire_due(), 1)
+        task_mock.apply_async.assert_called_once_with(('bob', soon.id, 0), task_id=mock.ANY)
+        self.assertEqual(ScheduledTweet.objects.get(pk=soon.id).task_id, task_mock.apply_async.call_args[1]['task_id'])
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_rescheduled_tweet_is_not_fired_at_old_time(self, task_mock):
+        scheduled = self.schedule('soon', 1)
+        self.scheduler.refill()
+        scheduled.time_to_tweet = self.now + datetime.timedelta(minutes=4)
+        scheduled.save()
+        self.scheduler.refill()
+
+        self.now += datetime.timedelta(minutes=1)
+        self.assertEqual(self.scheduler.fire_due(), 0)
+        self.now += datetime.timedelta(minutes=3)
+        self.assertEqual(self.scheduler.fire_due(), 1)
+        task_mock.apply_async.assert_called_once_with(('bob', scheduled.id, 0), task_id=mock.ANY)
+
+    @mock.patch('twitterscheduler.scheduler.close_old_connections')
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_run_survives_database_errors(self, task_mock, close_old_connections_mock):
+        soon = self.schedule('soon', 0)
+        refill = self.scheduler.refill
+        refill_errors = [OperationalError('server closed the connection')]
+
+        def failing_refill():
+            if refill_errors:
+                raise refill_errors.pop()
+            refill()
+        failing_refill.__name__ = 'refill'
+
+        def sleep(seconds):
+            if self.now > soon.time_to_tweet:
+                raise KeyboardInterrupt
+            self.now += datetime.timedelta(seconds=seconds)
+
+        self.scheduler.refill = failing_refill
+        self.scheduler.sleep = sleep
+        with self.assertLogs('twitterscheduler.scheduler', 'ERROR'):
+            self.assertRaises(KeyboardInterrupt, self.scheduler.run)
+        self.assertEqual(close_old_connections_mock.call_count, 2)
+        task_mock.apply_async.assert_called_once_with(('bob', soon.id, 0), task_id=mock.ANY)
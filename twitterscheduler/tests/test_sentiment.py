@@ -0,0 +1,42 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from twitterscheduler.models import Tweet
+from twitterscheduler.sentiment import classify_texts, score_text, backfill_sentiment
+
+
+class TestClassifyTexts(TestCase):
+
+    def test_positive_text(self):
+        self.assertEqual(classify_texts(['I love this, what a great day']), ['p'])
+
+    def test_negative_text(self):
+        self.assertEqual(classify_texts(['this is terrible and I hate it']), ['n'])
+
+    def test_text_without_sentiment_is_unknown(self):
+        self.assertEqual(classify_texts(['going to the store at 5']), ['u'])
+
+    def test_negation_flips_sentiment(self):
+        self.assertLess(score_text('not good'), 0)
+        self.assertGreater(score_text("it wasn't bad"), 0)
+
+    def test_emoticons_are_scored(self):
+        self.assertEqual(classify_texts(['lunch :)', 'lunch :(']), ['p', 'n'])
+
+    def test_classifies_each_text_in_order(self):
+        self.assertEqual(classify_texts(['great', 'awful', 'table']), ['p', 'n', 'u'])
+
+
+class TestBackfillSentiment(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+
+    def test_scores_every_tweet_in_chunks(self):
+        for i in range(5):
+            Tweet.objects.create(user=self.user, text='what a great day')
+        Tweet.objects.create(user=self.user, text='what an awful day')
+
+        scored = backfill_sentiment(Tweet.objects.filter(sentiment='u'), chunk_size=2)
+        self.assertEqual(scored, 6)
+        self.assertEqual(len(Tweet.objects.filter(sentiment='p')), 5)
+        self.assertEqual(len(Tweet.objects.filter(sentiment='n')), 1)
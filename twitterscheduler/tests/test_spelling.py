@@ -0,0 +1,86 @@
+from django.test import TestCase, override_settings
+from django.core.exceptions import ImproperlyConfigured
+
+import os
+import tempfile
+from unittest import mock
+
+import twitterscheduler.spelling
+from twitterscheduler.forms import CreateScheduleTweetForm
+from twitterscheduler.spelling import SpellChecker, get_spell_checker, check_word_list
+
+WORDS = ['hello', 'world', 'the', 'cat', 'cart', 'act', 'sat', 'on', 'mat', 'dog', 'Monday']
+
+
+class TestSpellChecker(TestCase):
+    def setUp(self):
+        self.checker = SpellChecker(WORDS)
+
+    def test_correctly_spelled_text(self):
+        self.assertEqual(self.checker.misspelled('Hello world, the cat sat on the mat'), [])
+
+    def test_misspelled_words(self):
+        self.assertEqual(self.checker.misspelled('the cta sat on the mta'), ['cta', 'mta'])
+
+    def test_mentions_hashtags_links_and_numbers_are_skipped(self):
+        self.assertEqual(self.checker.misspelled('@jonny the #caturday cat https://t.co/xyz 42 abc123'), [])
+
+    def test_possessives_of_known_words(self):
+        self.assertEqual(self.checker.misspelled("the dog's mat"), [])
+
+    def test_word_list_is_case_insensitive(self):
+        self.assertEqual(self.checker.misspelled('monday MONDAY'), [])
+
+    def test_suggestions_one_edit_away(self):
+        self.assertEqual(self.checker.suggestions('cta'), ['cat'])
+        self.assertEqual(self.checker.suggestions('cat'), ['act', 'cart', 'mat', 'sat'])
+        self.assertEqual(self.checker.suggestions('helo'), ['hello'])
+
+    def test_check_returns_suggestions_for_misspelled_words(self):
+        self.assertEqual(self.checker.check('helo wrld'), {'helo': ['hello'], 'wrld': ['world']})
+
+
+class TestGetSpellChecker(TestCase):
+    def setUp(self):
+        twitterscheduler.spelling._spell_checker = None
+        self.addCleanup(setattr, twitterscheduler.spelling, '_spell_checker', None)
+
+    def test_loads_word_list_once(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as word_file:
+            word_file.write('\n'.join(WORDS))
+        self.addCleanup(os.remove, word_file.name)
+        with override_settings(SPELLCHECK_WORDLIST=word_file.name):
+            checker = get_spell_checker()
+            self.assertIs(get_spell_checker(), checker)
+            self.assertTrue(checker.is_known('hello'))
+
+    @override_settings(SPELLCHECK_WORDLIST='/does/not/exist')
+    def test_missing_word_list(self):
+        self.assertRaises(ImproperlyConfigured, get_spell_checker)
+
+    @override_settings(SPELLCHECK_WORDLIST='/does/not/exist')
+    def test_missing_word_list_fails_system_check(self):
+        self.assertEqual([error.id for error in check_word_list(None)], ['twitterscheduler.E001'])
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as word_file:
+            with override_settings(SPELLCHECK_WORDLIST=word_file.name):
+                self.assertEqual(check_word_list(None), [])
+
+
+@mock.patch('twitterscheduler.forms.get_spell_checker', return_value=SpellChecker(WORDS))
+class TestSpellingValidation(TestCase):
+
+    def make_form(self, text, require_correctly_spelled=True):
+        profile = mock.Mock(require_positive_sentiment=False, require_correctly_spelled=require_correctly_spelled)
+        return CreateScheduleTweetForm({'time_to_tweet': '2030-01-01 10:00', 'text': text}, profile=profile)
+
+    def test_correctly_spelled_text_is_valid(self, checker_mock):
+        self.assertTrue(self.make_form('hello world').is_valid())
+
+    def test_misspelled_text_is_invalid_with_suggestions(self, checker_mock):
+        form = self.make_form('helo world')
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['text'], ['"helo" is misspelled, did you mean hello?'])
+
+    def test_spelling_not_checked_unless_profile_requires_it(self, checker_mock):
+        self.assertTrue(self.make_form('helo world', require_correctly_spelled=False).is_valid())
+        checker_mock.assert_not_called()
@@ -1,17 +1,31 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.shortcuts import reverse
 from django.http import Http404
 from django.contrib.sites.models import Site
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
 
 import datetime
+import io
 from unittest import mock
 
 from allauth.socialaccount.models import SocialApp, SocialAccount, SocialToken
+from celery.exceptions import Retry
+from tweepy import TweepError, RateLimitError
 
-from twitterscheduler.models import Tweet, ScheduledTweet, Profile
-from twitterscheduler.tasks import get_authed_tweepy, sync_tweets_task, tweet_task
+from twitterscheduler.models import (Tweet, ScheduledTweet, Profile, PostRecord, RateLimitBucket, DeadLetter,
+                                     PostingTimeBucket)
+from twitterscheduler.tasks import (get_authed_tweepy, sync_tweets_task, tweet_task, dispatch_due_tweets_task,
+                                    save_new_tweets, get_user_twitter_api, plan_tweet_syncs_task,
+                                    reclaim_scheduled_tweets_task, is_permanent_error, retry_backoff,
+                                    redrive_dead_letters)
+
+
+# a TestCase never commits, so the tasks dispatch_scheduled_tweets sends on commit are sent straight away
+run_on_commit = mock.patch('django.db.transaction.on_commit', lambda func: func())
 
 
 class DictToObj:
@@ -49,6 +63,43 @@ class TestTwitterIntegrations(TestCase):
         self.assertEqual(authed.auth.access_token, '123')
         self.assertEqual(authed.auth.access_token_secret, '456')
 
+    def test_get_authed_tweepy_reuses_instance_without_queries(self):
+        authed = get_authed_tweepy('123', '456')
+        with self.assertNumQueries(0):
+            self.assertIs(get_authed_tweepy('123', '456'), authed)
+
+    def test_get_authed_tweepy_new_instance_for_other_token(self):
+        self.assertIsNot(get_authed_tweepy('123', '456'), get_authed_tweepy('789', '456'))
+
+    @override_settings(TWEEPY_CLIENT_CACHE_SIZE=1)
+    def test_get_authed_tweepy_evicts_least_recently_used(self):
+        authed = get_authed_tweepy('123', '456')
+        get_authed_tweepy('789', '456')
+        self.assertIsNot(get_authed_tweepy('123', '456'), authed)
+
+    def test_changing_social_app_clears_cached_instances(self):
+        get_authed_tweepy('123', '456')
+        self.app.secret = 'new_secret'
+        self.app.save()
+        self.assertEqual(get_authed_tweepy('123', '456').auth.consumer_secret, b'new_secret')
+
+    @override_settings(TWITTER_APP_CACHE_TIMEOUT=0)
+    def test_social_app_changed_in_another_process_gets_new_instances(self):
+        get_authed_tweepy('123', '456')
+        # an update doesn't send the signals that clear this process' cache
+        SocialApp.objects.filter(pk=self.app.pk).update(client_id='new_id')
+        self.assertEqual(get_authed_tweepy('123', '456').auth.consumer_key, b'new_id')
+
+    def test_get_user_twitter_api_single_query(self):
+        social_acc = SocialAccount.objects.create(user=self.user, provider='twitter')
+        SocialToken.objects.create(account=social_acc, app=self.app, token='1', token_secret='2')
+        with self.assertNumQueries(2):
+            user, twitter_api = get_user_twitter_api('bob')
+        self.assertEqual(user, self.user)
+        self.assertEqual(twitter_api.auth.access_token, '1')
+        with self.assertNumQueries(1):
+            get_user_twitter_api('bob')
+
 
 class TestSyncTweetsTask(TestCase):
 
@@ -70,9 +121,10 @@ class TestSyncTweetsTask(TestCase):
             for i in range(10)
         ]
 
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
     @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
-    def test_sync_tweets_task_no_tweets_created_when_no_tweets_on_twitter(self, mock_tweepy):
-        mock_tweepy.return_value.user_timeline = lambda: []
+    def test_sync_tweets_task_no_tweets_created_when_no_tweets_on_twitter(self, mock_tweepy, mock_cursor):
+        mock_cursor.return_value.pages.return_value = [[]]
 
         sync_tweets_task(self.user.username)
         tweets = Tweet.objects.filter(user=self.user)
@@ -80,17 +132,19 @@ class TestSyncTweetsTask(TestCase):
         tweets = Tweet.objects.all()
         self.assertEqual(len(tweets), 0)
 
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
     @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
-    def test_sync_tweets_task_tweets_added_when_db_is_empty(self, mock_tweepy):
-        mock_tweepy.return_value.user_timeline = lambda: self.mock_tweets[:5]
+    def test_sync_tweets_task_tweets_added_when_db_is_empty(self, mock_tweepy, mock_cursor):
+        mock_cursor.return_value.pages.return_value = [self.mock_tweets[:5]]
 
         sync_tweets_task(self.user.username)
         tweets = Tweet.objects.filter(user=self.user)
         self.assertEqual(len(tweets), 5)
 
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
     @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
-    def test_sync_tweets_task_tweets_not_added_when_existing_in_db(self, mock_tweepy):
-        mock_tweepy.return_value.user_timeline = lambda: self.mock_tweets[:5]
+    def test_sync_tweets_task_tweets_not_added_when_existing_in_db(self, mock_tweepy, mock_cursor):
+        mock_cursor.return_value.pages.return_value = [self.mock_tweets[:5]]
 
         for mock_tweet in self.mock_tweets[:5]:
             Tweet.objects.create(tweet_id=mock_tweet.id_str, user=self.user, text='boogala')
@@ -101,10 +155,11 @@ class TestSyncTweetsTask(TestCase):
         for tweet in tweets:
             self.assertEqual(tweet.text, 'boogala')
 
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
     @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
-    def test_sync_tweets_task_only_new_tweets_added(self, mock_tweepy):
+    def test_sync_tweets_task_only_new_tweets_added(self, mock_tweepy, mock_cursor):
         # new as in not already in db. doesn't have to do with time.
-        mock_tweepy.return_value.user_timeline = lambda: self.mock_tweets[:3]
+        mock_cursor.return_value.pages.return_value = [self.mock_tweets[:3]]
 
         for mock_tweet in self.mock_tweets[:1]:
             Tweet.objects.create(tweet_id=mock_tweet.id_str, user=self.user, text='boogala')
@@ -117,24 +172,196 @@ class TestSyncTweetsTask(TestCase):
         self.assertEqual(len(tweets), 3)
         self.assertEqual(tweets[0].text, 'boogala')
 
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
     @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
-    def test_sync_tweets_task_dont_add_tweets_within_last_5_minutes(self, mock_tweepy):
+    def test_sync_tweets_task_dont_add_tweets_within_last_5_minutes(self, mock_tweepy, mock_cursor):
         new_tweet = DictToObj(id_str='20', text=f'text 20', created_at=timezone.now() + datetime.timedelta(minutes=-1))
         new_tweet2 = DictToObj(id_str='21', text=f'text 21', created_at=timezone.now() + datetime.timedelta(minutes=-4, seconds=59))
-        mock_tweepy.return_value.user_timeline = lambda: [new_tweet, new_tweet2]
+        mock_cursor.return_value.pages.return_value = [[new_tweet, new_tweet2]]
 
         sync_tweets_task(self.user.username)
         tweets = Tweet.objects.filter(user=self.user)
         self.assertEqual(len(tweets), 0)
 
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
     @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
-    def test_profile_recently_synced_after_syncing(self, mock_tweepy):
-        mock_tweepy.return_value.user_timeline = lambda: self.mock_tweets
+    def test_profile_recently_synced_after_syncing(self, mock_tweepy, mock_cursor):
+        mock_cursor.return_value.pages.return_value = [self.mock_tweets]
 
         sync_tweets_task(self.user.username)
         profile = Profile.objects.get(user=self.user)
         self.assertIs(profile.synced_tweets_recently(), True)
 
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_sync_scores_sentiment_of_new_tweets(self, mock_tweepy, mock_cursor):
+        created_at = timezone.now() - datetime.timedelta(minutes=15)
+        mock_cursor.return_value.pages.return_value = [[
+            DictToObj(id_str='1', text='I love it', created_at=created_at),
+            DictToObj(id_str='2', text='I hate it', created_at=created_at),
+        ]]
+
+        sync_tweets_task(self.user.username)
+        self.assertEqual(Tweet.objects.get(tweet_id='1').sentiment, 'p')
+        self.assertEqual(Tweet.objects.get(tweet_id='2').sentiment, 'n')
+
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_sync_releases_sync_lock(self, mock_tweepy, mock_cursor):
+        mock_cursor.return_value.pages.return_value = [self.mock_tweets]
+        profile = Profile.objects.get(user=self.user)
+        profile.claim_sync()
+
+        sync_tweets_task(self.user.username)
+        self.assertIsNone(Profile.objects.get(user=self.user).sync_queued_at)
+        self.assertIs(profile.claim_sync(), True)
+
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_first_sync_pages_through_whole_timeline(self, mock_tweepy, mock_cursor):
+        mock_cursor.return_value.pages.return_value = [self.mock_tweets]
+
+        sync_tweets_task(self.user.username)
+        mock_cursor.assert_called_with(mock_tweepy.return_value.user_timeline, since_id=None, count=200)
+
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_sync_saves_newest_synced_tweet_id(self, mock_tweepy, mock_cursor):
+        mock_cursor.return_value.pages.return_value = [self.mock_tweets]
+
+        sync_tweets_task(self.user.username)
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual(profile.last_synced_tweet_id, '9')
+
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_sync_only_fetches_tweets_since_last_sync(self, mock_tweepy, mock_cursor):
+        Profile.objects.filter(user=self.user).update(last_synced_tweet_id='4')
+        mock_cursor.return_value.pages.return_value = [self.mock_tweets[5:]]
+
+        sync_tweets_task(self.user.username)
+        mock_cursor.assert_called_with(mock_tweepy.return_value.user_timeline, since_id='4', count=200)
+        self.assertEqual(Profile.objects.get(user=self.user).last_synced_tweet_id, '9')
+
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_backfill_ignores_last_synced_tweet_id(self, mock_tweepy, mock_cursor):
+        Profile.objects.filter(user=self.user).update(last_synced_tweet_id='9')
+        mock_cursor.return_value.pages.return_value = [self.mock_tweets]
+
+        sync_tweets_task(self.user.username, backfill=True)
+        mock_cursor.assert_called_with(mock_tweepy.return_value.user_timeline, since_id=None, count=200)
+        self.assertEqual(len(Tweet.objects.filter(user=self.user)), 10)
+        self.assertEqual(Profile.objects.get(user=self.user).last_synced_tweet_id, '9')
+
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_sync_does_not_move_past_tweets_within_last_5_minutes(self, mock_tweepy, mock_cursor):
+        new_tweet = DictToObj(id_str='20', text='text 20', created_at=timezone.now() + datetime.timedelta(minutes=-1))
+        mock_cursor.return_value.pages.return_value = [[new_tweet] + self.mock_tweets[:2]]
+
+        sync_tweets_task(self.user.username)
+        self.assertEqual(Profile.objects.get(user=self.user).last_synced_tweet_id, '1')
+
+
+    @override_settings(TWITTER_RATE_LIMITS={'statuses/user_timeline': {'user': (1, 900), 'app': (10, 900)}})
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_sync_retries_when_out_of_rate_limit(self, mock_tweepy, mock_cursor):
+        mock_cursor.return_value.pages.return_value = [self.mock_tweets[:5], self.mock_tweets[5:]]
+
+        with self.assertRaises(Retry):
+            sync_tweets_task(self.user.username)
+        self.assertEqual(len(Tweet.objects.filter(user=self.user)), 5)
+        profile = Profile.objects.get(user=self.user)
+        self.assertIsNone(profile.last_synced_tweet_id)
+
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_sync_stops_when_twitter_says_limit_is_used_up(self, mock_tweepy, mock_cursor):
+        reset = timezone.now() + datetime.timedelta(minutes=10)
+        mock_tweepy.return_value.last_response.headers = {'x-rate-limit-remaining': '0',
+                                                          'x-rate-limit-reset': str(int(reset.timestamp()))}
+        mock_cursor.return_value.pages.return_value = [self.mock_tweets[:5], self.mock_tweets[5:]]
+
+        with self.assertRaises(Retry):
+            sync_tweets_task(self.user.username)
+        self.assertEqual(len(Tweet.objects.filter(user=self.user)), 5)
+        bucket = RateLimitBucket.objects.get(key=f'statuses/user_timeline:user:{self.user.id}')
+        self.assertEqual(bucket.blocked_until, reset.replace(microsecond=0))
+
+    @mock.patch('twitterscheduler.tasks.tweepy.Cursor')
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_sync_with_revoked_token_backs_off(self, mock_tweepy, mock_cursor):
+        def unauthorized():
+            raise TweepError('Invalid or expired token.', DictToObj(status_code=401))
+            yield
+        mock_cursor.return_value.pages.return_value = unauthorized()
+        self.assertTrue(Profile.objects.get(user=self.user).claim_sync())
+
+        sync_tweets_task(self.user.username)
+        profile = Profile.objects.get(user=self.user)
+        self.assertIsNone(profile.sync_queued_at)
+        self.assertTrue(profile.synced_tweets_recently())
+
+    def test_sync_without_token_backs_off(self):
+        self.social_tokens.delete()
+        self.assertTrue(Profile.objects.get(user=self.user).claim_sync())
+
+        sync_tweets_task(self.user.username)
+        profile = Profile.objects.get(user=self.user)
+        self.assertIsNone(profile.sync_queued_at)
+        self.assertTrue(profile.synced_tweets_recently())
+
+    @mock.patch('twitterscheduler.management.commands.backfill_tweets.sync_tweets_task')
+    def test_backfill_command_claims_the_sync(self, task_mock):
+        other = User.objects.create_user('alice', password='nice_pass')
+        Profile.objects.filter(user=other).update(sync_queued_at=timezone.now())
+
+        call_command('backfill_tweets', stdout=io.StringIO())
+        task_mock.delay.assert_called_once_with('bob', backfill=True)
+        self.assertIsNotNone(Profile.objects.get(user=self.user).sync_queued_at)
+        self.assertEqual(Profile.objects.get(user=other).suppressed_sync_count, 1)
+
+
+class TestSaveNewTweets(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+
+    def make_tweets(self, ids):
+        return [Tweet(tweet_id=str(i), user=self.user, text=f'text {i}', is_posted=True) for i in ids]
+
+    def test_saves_tweets_in_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            saved = save_new_tweets(self.user, self.make_tweets(range(5)))
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(len(saved), 5)
+        self.assertEqual(len(Tweet.objects.filter(user=self.user)), 5)
+
+    def test_skips_tweets_already_saved(self):
+        Tweet.objects.create(tweet_id='1', user=self.user, text='boogala')
+        saved = save_new_tweets(self.user, self.make_tweets(range(3)))
+        self.assertEqual([tweet.tweet_id for tweet in saved], ['0', '2'])
+        self.assertEqual(Tweet.objects.get(tweet_id='1').text, 'boogala')
+
+    def test_retries_when_another_sync_saves_the_same_tweets_first(self):
+        bulk_create = Tweet.objects.bulk_create
+        calls = []
+
+        def conflicting_bulk_create(tweets):
+            calls.append(tweets)
+            if len(calls) == 1:
+                raise IntegrityError
+            return bulk_create(tweets)
+
+        Tweet.objects.create(tweet_id='1', user=self.user, text='boogala')
+        with mock.patch.object(Tweet.objects, 'bulk_create', side_effect=conflicting_bulk_create):
+            saved = save_new_tweets(self.user, self.make_tweets(range(3)))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual([tweet.tweet_id for tweet in saved], ['0', '2'])
+        self.assertEqual(len(Tweet.objects.filter(user=self.user)), 3)
+
 
 class TestTweetTask(TestCase):
     @classmethod
@@ -174,10 +401,452 @@ class TestTweetTask(TestCase):
         self.assertIs(tweet.is_posted, True)
 
     @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
-    def test_scheduled_tweet_is_deleted_after_sending_tweet(self, mock_tweepy):
+    def test_scheduled_tweet_is_marked_posted_after_sending_tweet(self, mock_tweepy):
         mock_tweepy.return_value.update_status = mock.Mock(autospec=True)
         time_to_tweet = timezone.now() + datetime.timedelta(minutes=2)
         mock_tweepy.return_value.update_status.return_value = DictToObj(id_str='1234', time_posted_at=time_to_tweet)
         scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=time_to_tweet)
         tweet_task('bob', scheduled_tweet.id)
-        self.assertEqual(len(ScheduledTweet.objects.filter(pk=scheduled_tweet.id)), 0)
+        scheduled_tweet.refresh_from_db()
+        self.assertEqual(scheduled_tweet.status, ScheduledTweet.POSTED)
+        self.assertIsNone(scheduled_tweet.claimed_until)
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_redelivered_task_does_not_post_twice(self, mock_tweepy):
+        mock_tweepy.return_value.update_status.return_value = DictToObj(id_str='1234')
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now())
+        tweet_task('bob', scheduled_tweet.id, 0)
+        tweet_task('bob', scheduled_tweet.id, 0)
+        mock_tweepy.return_value.update_status.assert_called_once_with(status='nice tweet')
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_task_does_not_post_tweet_another_task_is_posting(self, mock_tweepy):
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now())
+        self.assertTrue(ScheduledTweet.objects.get(pk=scheduled_tweet.id).start_posting(0))
+        tweet_task('bob', scheduled_tweet.id, 0)
+        mock_tweepy.return_value.update_status.assert_not_called()
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_failed_post_is_retried(self, mock_tweepy):
+        mock_tweepy.return_value.update_status.side_effect = TweepError('Over capacity', api_code=130)
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now())
+        with self.assertRaises(Retry):
+            tweet_task('bob', scheduled_tweet.id)
+        scheduled_tweet.refresh_from_db()
+        self.assertEqual(scheduled_tweet.status, ScheduledTweet.CLAIMED)
+        self.assertGreater(scheduled_tweet.claimed_until, timezone.now() + ScheduledTweet.CLAIM_LEASE)
+        self.assertFalse(DeadLetter.objects.exists())
+
+    @override_settings(TWEET_MAX_RETRIES=2)
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_failed_post_is_dead_lettered_after_last_retry(self, mock_tweepy):
+        mock_tweepy.return_value.update_status.side_effect = TweepError('Over capacity', api_code=130)
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now())
+        tweet_task('bob', scheduled_tweet.id, attempt=2)
+        self.assertEqual(ScheduledTweet.objects.get(pk=scheduled_tweet.id).status, ScheduledTweet.FAILED)
+        dead_letter = DeadLetter.objects.get(scheduled_tweet=scheduled_tweet)
+        self.assertEqual(dead_letter.attempts, 3)
+        self.assertFalse(dead_letter.permanent)
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_permanent_failure_is_dead_lettered_without_retrying(self, mock_tweepy):
+        response = DictToObj(status_code=403, text='{"errors":[{"code":187,"message":"Status is a duplicate."}]}')
+        mock_tweepy.return_value.update_status.side_effect = TweepError('Status is a duplicate.', response, 187)
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now())
+        tweet_task('bob', scheduled_tweet.id)
+        self.assertEqual(ScheduledTweet.objects.get(pk=scheduled_tweet.id).status, ScheduledTweet.FAILED)
+        dead_letter = DeadLetter.objects.get(scheduled_tweet=scheduled_tweet)
+        self.assertEqual((dead_letter.api_code, dead_letter.status_code), (187, 403))
+        self.assertEqual(dead_letter.response, response.text)
+        self.assertTrue(dead_letter.permanent)
+
+    def test_errors_that_retrying_cannot_fix(self):
+        self.assertTrue(is_permanent_error(TweepError('Invalid or expired token.', api_code=89)))
+        self.assertTrue(is_permanent_error(TweepError('Unauthorized', DictToObj(status_code=401))))
+        self.assertFalse(is_permanent_error(TweepError('Over daily limit', DictToObj(status_code=403), 185)))
+        self.assertFalse(is_permanent_error(TweepError('Internal error', DictToObj(status_code=500), 131)))
+        self.assertFalse(is_permanent_error(TweepError('Connection reset')))
+
+    @override_settings(TWEET_RETRY_BACKOFF=10, TWEET_RETRY_BACKOFF_MAX=60)
+    def test_retry_backoff_doubles_with_jitter_up_to_max(self):
+        for attempt, backoff in [(0, 10), (1, 20), (2, 40), (3, 60), (10, 60)]:
+            self.assertGreaterEqual(retry_backoff(attempt), backoff / 2)
+            self.assertLessEqual(retry_backoff(attempt), backoff)
+
+    def test_tweet_task_acks_late(self):
+        self.assertTrue(tweet_task.acks_late)
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_task_for_old_version_is_dropped(self, mock_tweepy):
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now(), version=2)
+        tweet_task('bob', scheduled_tweet.id, 1)
+        mock_tweepy.return_value.update_status.assert_not_called()
+        self.assertTrue(ScheduledTweet.objects.filter(pk=scheduled_tweet.id).exists())
+
+        mock_tweepy.return_value.update_status.return_value = DictToObj(id_str='1234')
+        tweet_task('bob', scheduled_tweet.id, 2)
+        mock_tweepy.return_value.update_status.assert_called_once_with(status='nice tweet')
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_task_for_deleted_scheduled_tweet_is_dropped(self, mock_tweepy):
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now())
+        scheduled_tweet.delete()
+        tweet_task('bob', scheduled_tweet.id, 0)
+        mock_tweepy.return_value.update_status.assert_not_called()
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_records_actual_post_time_and_lag(self, mock_tweepy):
+        mock_tweepy.return_value.update_status.return_value = DictToObj(id_str='1234')
+        time_to_tweet = timezone.now() - datetime.timedelta(seconds=30)
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=time_to_tweet)
+        tweet_task('bob', scheduled_tweet.id)
+        record = PostRecord.objects.get(tweet=self.tweet)
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.time_posted_at, record.posted_at)
+        self.assertGreater(record.posted_at, time_to_tweet)
+        self.assertAlmostEqual(record.lag, (record.posted_at - time_to_tweet).total_seconds())
+        self.assertIsNotNone(record.api_latency)
+        self.assertFalse(record.failed)
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_records_failed_post(self, mock_tweepy):
+        mock_tweepy.return_value.update_status.side_effect = TweepError('Over capacity')
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now())
+        with self.assertRaises(Retry):
+            tweet_task('bob', scheduled_tweet.id)
+        record = PostRecord.objects.get(tweet=self.tweet)
+        self.assertTrue(record.failed)
+        self.assertEqual(record.error, 'Over capacity')
+        self.assertIsNone(record.posted_at)
+        self.assertTrue(ScheduledTweet.objects.filter(pk=scheduled_tweet.id).exists())
+
+
+    @override_settings(TWITTER_RATE_LIMITS={'statuses/update': {'user': (1, 3600), 'app': (10, 3600)}})
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_task_retries_later_when_out_of_rate_limit(self, mock_tweepy):
+        mock_tweepy.return_value.update_status.return_value = DictToObj(id_str='1234')
+        tweet_task('bob', ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now()).id)
+        scheduled_tweet = ScheduledTweet.objects.create(
+            tweet=Tweet.objects.create(user=self.user, text='second tweet'), time_to_tweet=timezone.now(),
+            status=ScheduledTweet.CLAIMED, claimed_until=timezone.now() + datetime.timedelta(minutes=1)
+        )
+        with self.assertRaises(Retry):
+            tweet_task('bob', scheduled_tweet.id)
+        mock_tweepy.return_value.update_status.assert_called_once_with(status='nice tweet')
+        scheduled_tweet.refresh_from_db()
+        self.assertEqual(scheduled_tweet.status, ScheduledTweet.CLAIMED)
+        # held for the hour until a token is back
+        self.assertGreater(scheduled_tweet.claimed_until, timezone.now() + datetime.timedelta(minutes=60))
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_records_failed_attempts_not_rate_limit_waits_as_retries(self, mock_tweepy):
+        mock_tweepy.return_value.update_status.return_value = DictToObj(id_str='1234')
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now())
+        # retried three times by celery, twice of them waiting on the rate limit
+        tweet_task.push_request(retries=3)
+        try:
+            tweet_task('bob', scheduled_tweet.id, attempt=1)
+        finally:
+            tweet_task.pop_request()
+        self.assertEqual(PostRecord.objects.get(tweet=self.tweet).retries, 1)
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_user_without_token_is_dead_lettered(self, mock_tweepy):
+        self.social_tokens.delete()
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now(),
+                                                        status=ScheduledTweet.CLAIMED)
+        tweet_task('bob', scheduled_tweet.id, attempt=1)
+        self.assertEqual(ScheduledTweet.objects.get(pk=scheduled_tweet.id).status, ScheduledTweet.FAILED)
+        dead_letter = DeadLetter.objects.get(scheduled_tweet=scheduled_tweet)
+        self.assertTrue(dead_letter.permanent)
+        self.assertEqual((dead_letter.attempts, dead_letter.api_code, dead_letter.status_code), (2, None, None))
+        mock_tweepy.return_value.update_status.assert_not_called()
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_dropped_task_takes_no_rate_limit_token(self, mock_tweepy):
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now(),
+                                                        status=ScheduledTweet.POSTED)
+        tweet_task('bob', scheduled_tweet.id)
+        mock_tweepy.return_value.update_status.assert_not_called()
+        self.assertFalse(RateLimitBucket.objects.exists())
+
+    @mock.patch('twitterscheduler.tasks.get_authed_tweepy')
+    def test_rate_limited_post_is_retried_not_failed(self, mock_tweepy):
+        reset = timezone.now() + datetime.timedelta(minutes=10)
+        response = DictToObj(headers={'x-rate-limit-remaining': '0', 'x-rate-limit-reset': str(int(reset.timestamp()))})
+        mock_tweepy.return_value.update_status.side_effect = RateLimitError('Rate limit exceeded', response)
+        scheduled_tweet = ScheduledTweet.objects.create(tweet=self.tweet, time_to_tweet=timezone.now())
+        with self.assertRaises(Retry):
+            tweet_task('bob', scheduled_tweet.id)
+        self.assertEqual(ScheduledTweet.objects.get(pk=scheduled_tweet.id).status, ScheduledTweet.CLAIMED)
+        self.assertTrue(PostRecord.objects.get(tweet=self.tweet).failed)
+        bucket = RateLimitBucket.objects.get(key=f'statuses/update:user:{self.user.id}')
+        self.assertEqual(bucket.blocked_until, reset.replace(microsecond=0))
+
+@run_on_commit
+@override_settings(TWEET_DISPATCH_MODE='poll', TWEET_DISPATCH_BATCH_SIZE=2)
+class TestDispatchDueTweetsTask(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.due = [
+            ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=self.user, text=f'due {i}'),
+                                          time_to_tweet=timezone.now() - datetime.timedelta(minutes=i))
+            for i in range(3)
+        ]
+        self.future = ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=self.user, text='future'),
+                                                    time_to_tweet=timezone.now() + datetime.timedelta(minutes=5))
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_sends_tweet_task_for_each_due_tweet(self, task_mock):
+        dispatched = dispatch_due_tweets_task()
+        self.assertEqual(dispatched, 3)
+        task_mock.apply_async.assert_has_calls([
+            mock.call(('bob', scheduled.id, 0), task_id=mock.ANY) for scheduled in reversed(self.due)
+        ])
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_records_task_id_on_dispatched_tweets(self, task_mock):
+        dispatch_due_tweets_task()
+        sent = {args[0][1]: kwargs['task_id'] for args, kwargs in task_mock.apply_async.call_args_list}
+        for scheduled in self.due:
+            self.assertEqual(ScheduledTweet.objects.get(pk=scheduled.id).task_id, sent[scheduled.id])
+        self.assertIsNone(ScheduledTweet.objects.get(pk=self.future.id).task_id)
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_tasks_are_sent_once_claims_are_committed(self, task_mock):
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            dispatch_due_tweets_task()
+        task_mock.apply_async.assert_not_called()
+        self.assertEqual(ScheduledTweet.objects.get(pk=self.due[0].id).status, ScheduledTweet.CLAIMED)
+        for args, kwargs in on_commit.call_args_list:
+            args[0]()
+        self.assertEqual(task_mock.apply_async.call_count, 3)
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_already_dispatched_tweets_are_not_sent_again(self, task_mock):
+        dispatch_due_tweets_task()
+        task_mock.apply_async.reset_mock()
+        self.assertEqual(dispatch_due_tweets_task(), 0)
+        task_mock.apply_async.assert_not_called()
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_dispatched_tweets_are_claimed_with_lease(self, task_mock):
+        dispatch_due_tweets_task()
+        scheduled = ScheduledTweet.objects.get(pk=self.due[0].id)
+        self.assertEqual(scheduled.status, ScheduledTweet.CLAIMED)
+        self.assertGreater(scheduled.claimed_until, timezone.now())
+        self.assertEqual(ScheduledTweet.objects.get(pk=self.future.id).status, ScheduledTweet.PENDING)
+
+    @override_settings(TWEET_DISPATCH_MODE='eta')
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_does_nothing_in_eta_mode(self, task_mock):
+        self.assertEqual(dispatch_due_tweets_task(), 0)
+        task_mock.apply_async.assert_not_called()
+
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_tweets_of_rate_limited_users_stay_pending(self, task_mock):
+        RateLimitBucket.objects.create(key=f'statuses/update:user:{self.user.id}', user=self.user, tokens=0,
+                                       blocked_until=timezone.now() + datetime.timedelta(minutes=10))
+        other_user = User.objects.create_user('alice', password='nice_pass')
+        other = ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=other_user, text='due'),
+                                              time_to_tweet=timezone.now())
+        self.assertEqual(dispatch_due_tweets_task(), 1)
+        task_mock.apply_async.assert_called_once_with(('alice', other.id, 0), task_id=mock.ANY)
+        self.assertEqual(ScheduledTweet.objects.get(pk=self.due[0].id).status, ScheduledTweet.PENDING)
+
+@override_settings(TWEET_SYNC_PLAN_INTERVAL=300, TWEET_SYNC_BUDGET=3)
+class TestPlanTweetSyncsTask(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        app = SocialApp.objects.create(provider='twitter', name='twitter', client_id='id_1234', secret='secret_1234')
+        self.users = [User.objects.create_user(f'user{i}', password='nice_pass') for i in range(5)]
+        for i, user in enumerate(self.users):
+            Profile.objects.filter(user=user).update(last_sync_time=now - datetime.timedelta(hours=i + 1))
+            account = SocialAccount.objects.create(user=user, provider='twitter', uid=str(i))
+            SocialToken.objects.create(account=account, app=app, token='1', token_secret='2')
+
+    @mock.patch('twitterscheduler.tasks.sync_tweets_task')
+    def test_queues_stalest_profiles_within_budget(self, task_mock):
+        self.assertEqual(plan_tweet_syncs_task(), 3)
+        task_mock.apply_async.assert_has_calls([
+            mock.call(('user4',), countdown=0),
+            mock.call(('user3',), countdown=100),
+            mock.call(('user2',), countdown=200),
+        ])
+
+    @mock.patch('twitterscheduler.tasks.sync_tweets_task')
+    def test_skips_recently_synced_and_already_queued_profiles(self, task_mock):
+        Profile.objects.filter(user=self.users[4]).update(last_sync_time=timezone.now())
+        Profile.objects.get(user=self.users[3]).claim_sync()
+        plan_tweet_syncs_task()
+        queued = [args[0][0][0] for args in task_mock.apply_async.call_args_list]
+        self.assertEqual(queued, ['user2', 'user1', 'user0'])
+
+    @mock.patch('twitterscheduler.tasks.sync_tweets_task')
+    def test_skips_profiles_without_token(self, task_mock):
+        SocialToken.objects.filter(account__user__in=self.users[3:]).delete()
+        plan_tweet_syncs_task()
+        queued = [args[0][0][0] for args in task_mock.apply_async.call_args_list]
+        self.assertEqual(queued, ['user2', 'user1', 'user0'])
+        self.assertFalse(Profile.objects.filter(user__in=self.users[3:], sync_queued_at__isnull=False).exists())
+
+    @mock.patch('twitterscheduler.tasks.sync_tweets_task')
+    def test_marks_queued_profiles_as_syncing(self, task_mock):
+        plan_tweet_syncs_task()
+        task_mock.apply_async.reset_mock()
+        plan_tweet_syncs_task()
+        queued = [args[0][0][0] for args in task_mock.apply_async.call_args_list]
+        self.assertEqual(queued, ['user1', 'user0'])
+
+
+@run_on_commit
+class TestReclaimScheduledTweetsTask(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.expired = timezone.now() - datetime.timedelta(seconds=1)
+
+    def create_scheduled_tweet(self, text, status, claimed_until):
+        return ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=self.user, text=text),
+                                             time_to_tweet=timezone.now() - datetime.timedelta(minutes=10),
+                                             status=status, claimed_until=claimed_until, task_id='old')
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_expired_claims_are_dispatched_again(self, task_mock):
+        expired = self.create_scheduled_tweet('expired', ScheduledTweet.CLAIMED, self.expired)
+        leased = self.create_scheduled_tweet('leased', ScheduledTweet.CLAIMED,
+                                             timezone.now() + datetime.timedelta(minutes=1))
+        self.assertEqual(reclaim_scheduled_tweets_task(), 1)
+        task_mock.apply_async.assert_called_once_with(('bob', expired.id, 0), task_id=mock.ANY)
+        self.assertEqual(ScheduledTweet.objects.get(pk=expired.id).task_id,
+                         task_mock.apply_async.call_args[1]['task_id'])
+        self.assertEqual(ScheduledTweet.objects.get(pk=leased.id).task_id, 'old')
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    @mock.patch('twitterscheduler.tasks.get_user_twitter_api')
+    def test_expired_post_found_on_twitter_is_marked_posted(self, mock_api, task_mock):
+        posting = self.create_scheduled_tweet('made it', ScheduledTweet.POSTING, self.expired)
+        posted_at = (self.expired - ScheduledTweet.POSTING_LEASE + datetime.timedelta(seconds=30)).replace(tzinfo=None)
+        mock_api.return_value = (self.user, mock.Mock())
+        mock_api.return_value[1].user_timeline.return_value = [
+            DictToObj(id_str='99', text='made it', created_at=posted_at),
+        ]
+        self.assertEqual(reclaim_scheduled_tweets_task(), 0)
+        posting.refresh_from_db()
+        self.assertEqual(posting.status, ScheduledTweet.POSTED)
+        self.assertEqual(Tweet.objects.get(pk=posting.tweet.id).tweet_id, '99')
+        task_mock.apply_async.assert_not_called()
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    @mock.patch('twitterscheduler.tasks.get_user_twitter_api')
+    def test_expired_post_with_links_and_escaped_text_is_found_on_twitter(self, mock_api, task_mock):
+        posting = self.create_scheduled_tweet('R&D <3 see https://example.com/a and example.org',
+                                              ScheduledTweet.POSTING, self.expired)
+        posted_at = (self.expired - ScheduledTweet.POSTING_LEASE + datetime.timedelta(seconds=30)).replace(tzinfo=None)
+        mock_api.return_value = (self.user, mock.Mock())
+        mock_api.return_value[1].user_timeline.return_value = [
+            DictToObj(id_str='99', text='R&amp;D &lt;3 see https://t.co/abc and https://t.co/def',
+                      created_at=posted_at),
+        ]
+        self.assertEqual(reclaim_scheduled_tweets_task(), 0)
+        self.assertEqual(ScheduledTweet.objects.get(pk=posting.id).status, ScheduledTweet.POSTED)
+        task_mock.apply_async.assert_not_called()
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    @mock.patch('twitterscheduler.tasks.get_user_twitter_api')
+    def test_expired_post_already_synced_replaces_synced_copy(self, mock_api, task_mock):
+        posting = self.create_scheduled_tweet('made it', ScheduledTweet.POSTING, self.expired)
+        posted_at = (self.expired - ScheduledTweet.POSTING_LEASE + datetime.timedelta(seconds=30)).replace(tzinfo=None)
+        save_new_tweets(self.user, [Tweet(user=self.user, tweet_id='99', text='made it', is_posted=True,
+                                          time_posted_at=posted_at.replace(tzinfo=timezone.utc))])
+        mock_api.return_value = (self.user, mock.Mock())
+        mock_api.return_value[1].user_timeline.return_value = [
+            DictToObj(id_str='99', text='made it', created_at=posted_at),
+        ]
+        self.assertEqual(reclaim_scheduled_tweets_task(), 0)
+        self.assertEqual(ScheduledTweet.objects.get(pk=posting.id).status, ScheduledTweet.POSTED)
+        self.assertEqual(list(Tweet.objects.filter(tweet_id='99').values_list('pk', flat=True)), [posting.tweet.id])
+        self.assertEqual(sum(PostingTimeBucket.objects.values_list('tweets', flat=True)), 1)
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_expired_post_of_user_without_token_is_dead_lettered(self, task_mock):
+        posting = self.create_scheduled_tweet('unknown', ScheduledTweet.POSTING, self.expired)
+        self.assertEqual(reclaim_scheduled_tweets_task(), 0)
+        self.assertEqual(ScheduledTweet.objects.get(pk=posting.id).status, ScheduledTweet.FAILED)
+        dead_letter = DeadLetter.objects.get(scheduled_tweet=posting)
+        self.assertTrue(dead_letter.permanent)
+        self.assertEqual(dead_letter.attempts, 1)
+        task_mock.apply_async.assert_not_called()
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    @mock.patch('twitterscheduler.tasks.get_user_twitter_api')
+    def test_one_failing_reconcile_does_not_stop_the_others(self, mock_api, task_mock):
+        claimed = self.create_scheduled_tweet('expired', ScheduledTweet.CLAIMED, self.expired)
+        self.create_scheduled_tweet('unknown', ScheduledTweet.POSTING, self.expired)
+        mock_api.side_effect = RuntimeError('connection reset')
+        self.assertEqual(reclaim_scheduled_tweets_task(), 1)
+        task_mock.apply_async.assert_called_once_with(('bob', claimed.id, 0), task_id=mock.ANY)
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    @mock.patch('twitterscheduler.tasks.get_user_twitter_api')
+    def test_expired_post_missing_from_twitter_is_sent_again(self, mock_api, task_mock):
+        posting = self.create_scheduled_tweet('lost', ScheduledTweet.POSTING, self.expired)
+        mock_api.return_value = (self.user, mock.Mock())
+        # the same text posted long before this attempt doesn't count
+        mock_api.return_value[1].user_timeline.return_value = [
+            DictToObj(id_str='1', text='lost', created_at=datetime.datetime(2017, 1, 1)),
+        ]
+        self.assertEqual(reclaim_scheduled_tweets_task(), 1)
+        task_mock.apply_async.assert_called_once_with(('bob', posting.id, 0), task_id=mock.ANY)
+        self.assertEqual(ScheduledTweet.objects.get(pk=posting.id).status, ScheduledTweet.CLAIMED)
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    @mock.patch('twitterscheduler.tasks.get_user_twitter_api')
+    def test_expired_post_left_alone_when_twitter_unreachable(self, mock_api, task_mock):
+        posting = self.create_scheduled_tweet('unknown', ScheduledTweet.POSTING, self.expired)
+        mock_api.return_value = (self.user, mock.Mock())
+        mock_api.return_value[1].user_timeline.side_effect = TweepError('Over capacity')
+        self.assertEqual(reclaim_scheduled_tweets_task(), 0)
+        self.assertEqual(ScheduledTweet.objects.get(pk=posting.id).status, ScheduledTweet.POSTING)
+
+
+
+@run_on_commit
+class TestRedriveDeadLetters(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.scheduled_tweet = ScheduledTweet.objects.create(
+            tweet=Tweet.objects.create(user=self.user, text='lost in an outage'),
+            time_to_tweet=timezone.now() - datetime.timedelta(hours=1), status=ScheduledTweet.FAILED, version=1
+        )
+        self.dead_letter = DeadLetter.objects.create(scheduled_tweet=self.scheduled_tweet, error='Over capacity')
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_redrive_sends_failed_tweet_again(self, task_mock):
+        self.assertEqual(redrive_dead_letters(DeadLetter.objects.all()), 1)
+        self.scheduled_tweet.refresh_from_db()
+        self.assertEqual(self.scheduled_tweet.status, ScheduledTweet.PENDING)
+        self.assertEqual(self.scheduled_tweet.version, 2)
+        task_mock.apply_async.assert_called_once_with(('bob', self.scheduled_tweet.id, 2),
+                                                      task_id=self.scheduled_tweet.task_id)
+        self.assertIsNotNone(DeadLetter.objects.get(pk=self.dead_letter.id).redriven_at)
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_redrive_only_once(self, task_mock):
+        redrive_dead_letters(DeadLetter.objects.all())
+        self.assertEqual(redrive_dead_letters(DeadLetter.objects.all()), 0)
+        task_mock.apply_async.assert_called_once()
+
+    @override_settings(TWEET_DISPATCH_MODE='poll')
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_redrive_in_poll_mode_leaves_tweet_to_dispatcher(self, task_mock):
+        redrive_dead_letters(DeadLetter.objects.all())
+        task_mock.apply_async.assert_not_called()
+        self.assertEqual(dispatch_due_tweets_task(), 1)
+        task_mock.apply_async.assert_called_once_with(('bob', self.scheduled_tweet.id, 2), task_id=mock.ANY)
+
+    @mock.patch('twitterscheduler.tasks.tweet_task')
+    def test_redrive_skips_tweet_edited_since(self, task_mock):
+        ScheduledTweet.objects.filter(pk=self.scheduled_tweet.id).update(status=ScheduledTweet.PENDING, version=2)
+        self.assertEqual(redrive_dead_letters(DeadLetter.objects.all()), 0)
+        task_mock.apply_async.assert_not_called()
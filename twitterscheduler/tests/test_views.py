@@ -1,19 +1,25 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.shortcuts import reverse
 from django.http import Http404
 from django.contrib.sites.models import Site
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 import datetime
 from unittest import mock
 
 from allauth.socialaccount.models import SocialApp, SocialAccount, SocialToken
 
-from twitterscheduler.models import Tweet, ScheduledTweet, Profile
+from twitterscheduler.models import (Tweet, ScheduledTweet, Profile, PostRecord, DeadLetter, RecurringTweet,
+                                     MetricCounter)
+from twitterscheduler.metrics import save_post_record, rebuild_counters
 import twitterscheduler.tasks
 
 
+# a TestCase never commits, so the timelines invalidated on commit are invalidated straight away
+@mock.patch('django.db.transaction.on_commit', lambda func: func())
 class TestIndexView(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -47,6 +53,21 @@ class TestIndexView(TestCase):
         resp = self.client.get(self.view_reverse)
         self.assertTemplateUsed(resp, 'twitterscheduler/index.html')
 
+    @mock.patch('twitterscheduler.views.sync_tweets_task')
+    def test_sync_not_queued_on_page_view_by_default(self, task_mock):
+        login = self.client.login(username='test_user1', password='nice_pass')
+        self.client.get(self.view_reverse)
+        task_mock.delay.assert_not_called()
+
+    @override_settings(SYNC_TWEETS_ON_PAGE_VIEW=True)
+    @mock.patch('twitterscheduler.views.sync_tweets_task')
+    def test_only_one_sync_queued_at_a_time(self, task_mock):
+        login = self.client.login(username='test_user1', password='nice_pass')
+        self.client.get(self.view_reverse)
+        self.client.get(self.view_reverse)
+        task_mock.delay.assert_called_once_with('test_user1')
+        self.assertEqual(Profile.objects.get(user=self.user1).suppressed_sync_count, 1)
+
     def test_user_tweets_context_is_passed_in(self):
         login = self.client.login(username='test_user1', password='nice_pass')
         resp = self.client.get(self.view_reverse)
@@ -70,6 +91,196 @@ class TestIndexView(TestCase):
         for tweet in resp.context['user_tweets']:
             self.assertEqual(tweet.user.username, 'test_user1')
 
+    @override_settings(TIMELINE_PAGE_SIZE=2)
+    def test_user_tweets_are_paginated_newest_first(self):
+        login = self.client.login(username='test_user1', password='nice_pass')
+        tweets = [Tweet.objects.create(user=self.user1, text=f'text {i}', is_posted=True,
+                                       time_posted_at=timezone.now() - datetime.timedelta(minutes=i))
+                  for i in range(3)]
+        resp = self.client.get(self.view_reverse)
+        self.assertEqual(list(resp.context['user_tweets']), tweets[:2])
+        self.assertIsNotNone(resp.context['next_tweets_cursor'])
+
+    @override_settings(TIMELINE_PAGE_SIZE=2)
+    def test_load_more_tweets_returns_next_page(self):
+        login = self.client.login(username='test_user1', password='nice_pass')
+        tweets = [Tweet.objects.create(user=self.user1, text=f'text {i}', is_posted=True,
+                                       time_posted_at=timezone.now() - datetime.timedelta(minutes=i))
+                  for i in range(3)]
+        cursor = self.client.get(self.view_reverse).context['next_tweets_cursor']
+        resp = self.client.get(reverse('twitterscheduler:load-more-tweets'), {'cursor': cursor})
+        page = resp.json()
+        self.assertEqual([tweet['id'] for tweet in page['tweets']], [tweets[2].id])
+        self.assertIsNone(page['next_cursor'])
+
+    @override_settings(TIMELINE_PAGE_SIZE=2)
+    def test_load_more_scheduled_tweets_returns_next_page(self):
+        login = self.client.login(username='test_user1', password='nice_pass')
+        scheduled = [
+            ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=self.user1, text=f'text {i}'),
+                                          time_to_tweet=timezone.now() + datetime.timedelta(minutes=i))
+            for i in range(3)
+        ]
+        cursor = self.client.get(self.view_reverse).context['next_scheduled_cursor']
+        resp = self.client.get(reverse('twitterscheduler:load-more-scheduled-tweets'), {'cursor': cursor})
+        page = resp.json()
+        self.assertEqual([tweet['id'] for tweet in page['scheduled_tweets']], [scheduled[2].id])
+        self.assertEqual(page['scheduled_tweets'][0]['text'], 'text 2')
+        self.assertEqual(page['scheduled_tweets'][0]['status'], ScheduledTweet.PENDING)
+
+    def test_load_more_bad_cursor_is_400(self):
+        login = self.client.login(username='test_user1', password='nice_pass')
+        resp = self.client.get(reverse('twitterscheduler:load-more-tweets'), {'cursor': 'nope'})
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get(reverse('twitterscheduler:load-more-tweets'), {'cursor': f'{10 ** 20}_1'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_scheduled_tweets_text_doesnt_cost_a_query_each(self):
+        login = self.client.login(username='test_user1', password='nice_pass')
+        Profile.objects.filter(user=self.user1).update(last_sync_time=timezone.now())
+        ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=self.user1, text='text'),
+                                      time_to_tweet=timezone.now())
+        with CaptureQueriesContext(connection) as one_scheduled:
+            self.client.get(self.view_reverse)
+        for i in range(5):
+            ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=self.user1, text=f'text {i}'),
+                                          time_to_tweet=timezone.now())
+        with CaptureQueriesContext(connection) as six_scheduled:
+            self.client.get(self.view_reverse)
+        self.assertEqual(len(one_scheduled.captured_queries), len(six_scheduled.captured_queries))
+
+    def test_posted_scheduled_tweets_not_listed(self):
+        login = self.client.login(username='test_user1', password='nice_pass')
+        for status in [ScheduledTweet.PENDING, ScheduledTweet.POSTED]:
+            ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=self.user1, text=status),
+                                          time_to_tweet=timezone.now(), status=status)
+        resp = self.client.get(self.view_reverse)
+        self.assertEqual([scheduled.tweet.text for scheduled in resp.context['scheduled_tweets']], ['pending'])
+
+
+    def test_repeat_views_dont_query_timelines(self):
+        login = self.client.login(username='test_user1', password='nice_pass')
+        Tweet.objects.create(user=self.user1, text='posted', is_posted=True)
+        ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=self.user1, text='scheduled'),
+                                      time_to_tweet=timezone.now())
+        self.client.get(self.view_reverse)
+        with CaptureQueriesContext(connection) as context:
+            resp = self.client.get(self.view_reverse)
+        self.assertEqual([tweet.text for tweet in resp.context['user_tweets']], ['posted'])
+        self.assertEqual([scheduled.tweet.text for scheduled in resp.context['scheduled_tweets']], ['scheduled'])
+        self.assertEqual([query['sql'] for query in context.captured_queries if 'twitterscheduler_' in query['sql']],
+                         [])
+
+    def test_cached_timelines_are_invalidated_by_changes(self):
+        login = self.client.login(username='test_user1', password='nice_pass')
+        scheduled = ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=self.user1, text='scheduled'),
+                                                  time_to_tweet=timezone.now())
+        self.client.get(self.view_reverse)
+        # status changes made with update(), once they are committed, and synced tweets saved with a bulk insert
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            self.assertTrue(scheduled.start_posting())
+        self.assertEqual(self.client.get(self.view_reverse).context['scheduled_tweets'][0].status,
+                         ScheduledTweet.PENDING)
+        on_commit.call_args[0][0]()
+        self.assertEqual(self.client.get(self.view_reverse).context['scheduled_tweets'][0].status,
+                         ScheduledTweet.POSTING)
+        twitterscheduler.tasks.save_new_tweets(self.user1, [Tweet(user=self.user1, tweet_id='1', text='synced',
+                                                                  is_posted=True)])
+        resp = self.client.get(self.view_reverse)
+        self.assertEqual([tweet.text for tweet in resp.context['user_tweets']], ['synced'])
+
+        scheduled.tweet.delete()
+        self.assertEqual(list(self.client.get(self.view_reverse).context['scheduled_tweets']), [])
+
+    def test_saved_tweets_invalidate_timelines_once_committed(self):
+        self.client.login(username='test_user1', password='nice_pass')
+        self.client.get(self.view_reverse)
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=self.user1, text='scheduled'),
+                                          time_to_tweet=timezone.now())
+        self.assertEqual(list(self.client.get(self.view_reverse).context['scheduled_tweets']), [])
+        for args, kwargs in on_commit.call_args_list:
+            args[0]()
+        self.assertEqual(len(self.client.get(self.view_reverse).context['scheduled_tweets']), 1)
+
+    def test_cached_timelines_are_per_user(self):
+        Tweet.objects.create(user=self.user1, text='text 1', is_posted=True)
+        self.client.login(username='test_user1', password='nice_pass')
+        self.client.get(self.view_reverse)
+        self.client.login(username='test_user2', password='nice_pass')
+        self.assertEqual(list(self.client.get(self.view_reverse).context['user_tweets']), [])
+
+
+@override_settings(TIMELINE_PAGE_SIZE=2)
+class TestSearchTweets(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.client.login(username='bob', password='nice_pass')
+        self.url = reverse('twitterscheduler:search-tweets')
+
+    def search(self, query, cursor=None):
+        params = {'q': query, 'cursor': cursor} if cursor else {'q': query}
+        return self.client.get(self.url, params).json()
+
+    def test_returns_best_matches_first(self):
+        once = Tweet.objects.create(user=self.user, text='a dog and a cat and a bird', is_posted=True)
+        thrice = Tweet.objects.create(user=self.user, text='dog dog dog', is_posted=True)
+        Tweet.objects.create(user=self.user, text='only a cat', is_posted=True)
+        self.assertEqual([tweet['id'] for tweet in self.search('dog')['tweets']], [thrice.id, once.id])
+
+    def test_only_matches_users_posted_tweets(self):
+        posted = Tweet.objects.create(user=self.user, text='going for a run', is_posted=True)
+        Tweet.objects.create(user=self.user, text='scheduled run', is_posted=False)
+        Tweet.objects.create(user=User.objects.create_user('alice'), text='alices run', is_posted=True)
+        self.assertEqual([tweet['id'] for tweet in self.search('running')['tweets']], [posted.id])
+
+    def test_pages_through_results(self):
+        tweets = [Tweet.objects.create(user=self.user, text=f'tweet number {i}', is_posted=True) for i in range(5)]
+        found = []
+        page = self.search('tweet')
+        while True:
+            found += [tweet['id'] for tweet in page['tweets']]
+            if not page['next_cursor']:
+                break
+            page = self.search('tweet', page['next_cursor'])
+        self.assertEqual(sorted(found), sorted(tweet.id for tweet in tweets))
+
+    def test_edited_and_deleted_tweets_are_reindexed(self):
+        tweet = Tweet.objects.create(user=self.user, text='hello world', is_posted=True)
+        tweet.text = 'goodbye world'
+        tweet.save()
+        self.assertEqual(self.search('hello')['tweets'], [])
+        self.assertEqual(len(self.search('goodbye')['tweets']), 1)
+        tweet.delete()
+        self.assertEqual(self.search('world')['tweets'], [])
+
+    def test_query_syntax_is_matched_as_words(self):
+        Tweet.objects.create(user=self.user, text='cats OR dogs', is_posted=True)
+        self.assertEqual(len(self.search('"cats" OR (dogs*')['tweets']), 1)
+        self.assertEqual(self.search('  ?! ')['tweets'], [])
+
+    def test_bad_cursor_is_400(self):
+        self.assertEqual(self.client.get(self.url, {'q': 'dog', 'cursor': 'nope'}).status_code, 400)
+
+class TestBestTimes(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.client.login(username='bob', password='nice_pass')
+
+    def test_shows_busiest_hours(self):
+        tuesday_noon = timezone.make_aware(datetime.datetime(2018, 1, 2, 12))
+        tweets = [Tweet(tweet_id=str(i), user=self.user, text='text', is_posted=True, time_posted_at=tuesday_noon)
+                  for i in range(3)]
+        twitterscheduler.tasks.save_new_tweets(self.user, tweets)
+        response = self.client.get(reverse('twitterscheduler:best-times'))
+        self.assertEqual(response.context['busiest'], [('Tuesday', 12, 3)])
+        self.assertContains(response, 'Tuesday 12:00 - 3 tweets')
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.get(reverse('twitterscheduler:best-times'))
+        self.assertEqual(response.status_code, 302)
+
 
 class TestCreateScheduledTweet(TestCase):
     def setUp(self):
@@ -142,7 +353,89 @@ class TestCreateScheduledTweet(TestCase):
 
         task_mock.apply_async.assert_called()
         scheduled_tweet = ScheduledTweet.objects.get(tweet__text='nice tweet dood')
-        task_mock.apply_async.assert_called_with(('test_user1', scheduled_tweet.id), eta=scheduled_tweet.time_to_tweet)
+        task_mock.apply_async.assert_called_with(('test_user1', scheduled_tweet.id, 0), eta=scheduled_tweet.time_to_tweet,
+                                                 task_id=scheduled_tweet.task_id)
+        self.assertIsNotNone(scheduled_tweet.task_id)
+
+    @mock.patch('twitterscheduler.views.tweet_task', autospec=True)
+    def test_task_that_already_started_posting_is_not_undone(self, task_mock):
+        def start_posting(args, **kwargs):
+            ScheduledTweet.objects.filter(pk=args[1]).update(status=ScheduledTweet.POSTING)
+        task_mock.apply_async.side_effect = start_posting
+        self.client.login(username='test_user1', password='nice_pass')
+        self.client.post(self.view_reverse, {'time_to_tweet': datetime.datetime.now(), 'text': 'nice tweet dood'})
+        scheduled_tweet = ScheduledTweet.objects.get(tweet__text='nice tweet dood')
+        self.assertEqual(scheduled_tweet.status, ScheduledTweet.POSTING)
+
+    @override_settings(TWEET_DISPATCH_MODE='poll')
+    @mock.patch('twitterscheduler.views.tweet_task', autospec=True)
+    def test_tweet_task_not_sent_in_poll_mode(self, task_mock):
+        login = self.client.login(username='test_user1', password='nice_pass')
+        time_to_tweet = datetime.datetime.now()+datetime.timedelta(minutes=5)
+        resp = self.client.post(self.view_reverse, {'time_to_tweet': time_to_tweet, 'text': 'nice tweet dood'})
+
+        task_mock.apply_async.assert_not_called()
+        scheduled_tweet = ScheduledTweet.objects.get(tweet__text='nice tweet dood')
+        self.assertIsNone(scheduled_tweet.task_id)
+
+    @mock.patch('twitterscheduler.views.tweet_task', autospec=True)
+    def test_tweet_sentiment_is_set(self, task_mock):
+        task_mock.configure_mock(**{'apply_async.return_value.id': '123'})
+        login = self.client.login(username='test_user1', password='nice_pass')
+        time_to_tweet = datetime.datetime.now()+datetime.timedelta(minutes=5)
+        resp = self.client.post(self.view_reverse, {'time_to_tweet': time_to_tweet, 'text': 'what a great tweet'})
+        self.assertEqual(Tweet.objects.get(text='what a great tweet').sentiment, 'p')
+
+    @mock.patch('twitterscheduler.views.tweet_task', autospec=True)
+    def test_negative_tweet_rejected_when_profile_requires_positive_sentiment(self, task_mock):
+        Profile.objects.filter(user=self.user1).update(require_positive_sentiment=True)
+        login = self.client.login(username='test_user1', password='nice_pass')
+        time_to_tweet = datetime.datetime.now()+datetime.timedelta(minutes=5)
+        resp = self.client.post(self.view_reverse, {'time_to_tweet': time_to_tweet, 'text': 'what an awful tweet'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.context['tweet_form'].has_error('text'))
+        self.assertEqual(len(Tweet.objects.filter(text='what an awful tweet')), 0)
+
+
+class TestCreateRecurringTweet(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='nice_pass')
+        self.client.login(username='bob', password='nice_pass')
+        self.url = reverse('twitterscheduler:create-recurring-tweet')
+        self.data = {'text': 'evergreen', 'frequency': 'weekly', 'interval': 1, 'weekdays': ['0', '3'],
+                     'time_of_day': '09:00', 'starts_on': '2030-01-01'}
+
+    def test_redirected_to_login_if_not_authed(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_preview_shows_next_occurrences_without_saving(self):
+        response = self.client.post(self.url, dict(self.data, preview=''))
+        self.assertEqual(response.status_code, 200)
+        # 2030-01-01 is a tuesday
+        self.assertEqual([timezone.localtime(occurrence).date() for occurrence in response.context['occurrences']],
+                         [datetime.date(2030, 1, 3), datetime.date(2030, 1, 7), datetime.date(2030, 1, 10),
+                          datetime.date(2030, 1, 14), datetime.date(2030, 1, 17)])
+        self.assertEqual(RecurringTweet.objects.count(), 0)
+
+    def test_creates_rule_without_scheduling_far_off_occurrences(self):
+        response = self.client.post(self.url, self.data)
+        self.assertRedirects(response, reverse('twitterscheduler:index'))
+        rule = RecurringTweet.objects.get()
+        self.assertEqual((rule.user, rule.weekdays), (self.user, '0,3'))
+        self.assertEqual(timezone.localtime(rule.next_occurrence).date(), datetime.date(2030, 1, 3))
+        self.assertEqual(ScheduledTweet.objects.count(), 0)
+
+    def test_weekly_tweet_needs_days(self):
+        response = self.client.post(self.url, dict(self.data, weekdays=[]))
+        self.assertFormError(response, 'form', 'weekdays', 'Pick the days a weekly tweet is posted on.')
+
+    def test_rule_that_ended_is_rejected(self):
+        response = self.client.post(self.url, dict(self.data, starts_on='2017-01-01', ends_on='2017-02-01'))
+        self.assertFormError(response, 'form', None,
+                             'This tweet would never be posted, it ends before its next occurrence.')
+        self.assertEqual(RecurringTweet.objects.count(), 0)
 
 
 class TestEditScheduledTweet(TestCase):
@@ -174,6 +467,21 @@ class TestEditScheduledTweet(TestCase):
         resp = self.client.get(self.scheduled_tweet.get_absolute_url())
         self.assertEqual(resp.status_code, 404)
 
+    def test_404_if_scheduled_tweet_is_being_posted(self):
+        ScheduledTweet.objects.filter(pk=self.scheduled_tweet.id).update(status=ScheduledTweet.POSTING)
+        login = self.client.login(username='test_user1', password='nice_pass')
+        resp = self.client.get(self.scheduled_tweet.get_absolute_url())
+        self.assertEqual(resp.status_code, 404)
+
+    @mock.patch('twitterscheduler.views.tweet_task', autospec=True)
+    def test_editing_failed_tweet_makes_it_pending(self, task_mock):
+        ScheduledTweet.objects.filter(pk=self.scheduled_tweet.id).update(status=ScheduledTweet.FAILED)
+        self.client.login(username='test_user1', password='nice_pass')
+        time_to_tweet = datetime.datetime.now() + datetime.timedelta(minutes=5)
+        self.client.post(self.scheduled_tweet.get_absolute_url(), {'time_to_tweet': time_to_tweet, 'text': 'again',
+                                                               'version': 0})
+        self.assertEqual(ScheduledTweet.objects.get(pk=self.scheduled_tweet.id).status, ScheduledTweet.PENDING)
+
     def test_updates_scheduled_tweet_with_valid_data(self):
         import pytz
         timezone = pytz.timezone("America/Los_Angeles")
@@ -181,8 +489,109 @@ class TestEditScheduledTweet(TestCase):
         time_to_tweet = datetime.datetime.now() + datetime.timedelta(minutes=5)
         resp = self.client.post(
             self.scheduled_tweet.get_absolute_url(),
-            {'time_to_tweet': time_to_tweet, 'text': 'boondocks'}
+            {'time_to_tweet': time_to_tweet, 'text': 'boondocks', 'version': 0}
         )
         scheduled_tweet = ScheduledTweet.objects.get(pk=self.scheduled_tweet.id)
         self.assertEqual(scheduled_tweet.tweet.text, 'boondocks')
         self.assertEqual(scheduled_tweet.time_to_tweet, timezone.localize(time_to_tweet))
+
+
+    @mock.patch('twitterscheduler.views.tweet_task', autospec=True)
+    def test_edit_bumps_version_and_sends_task_for_it(self, task_mock):
+        self.client.login(username='test_user1', password='nice_pass')
+        time_to_tweet = datetime.datetime.now() + datetime.timedelta(minutes=5)
+        self.client.post(self.scheduled_tweet.get_absolute_url(),
+                         {'time_to_tweet': time_to_tweet, 'text': 'boondocks', 'version': 0})
+        scheduled_tweet = ScheduledTweet.objects.get(pk=self.scheduled_tweet.id)
+        self.assertEqual(scheduled_tweet.version, 1)
+        args, kwargs = task_mock.apply_async.call_args
+        self.assertEqual(args, (('test_user1', scheduled_tweet.id, 1),))
+        self.assertEqual(kwargs['eta'], scheduled_tweet.time_to_tweet)
+        self.assertEqual(kwargs['task_id'], scheduled_tweet.task_id)
+
+    @override_settings(TWEET_DISPATCH_MODE='poll')
+    @mock.patch('twitterscheduler.views.tweet_task', autospec=True)
+    def test_edit_in_poll_mode_leaves_tweet_for_dispatcher(self, task_mock):
+        ScheduledTweet.objects.filter(pk=self.scheduled_tweet.id).update(task_id='123')
+        self.client.login(username='test_user1', password='nice_pass')
+        time_to_tweet = datetime.datetime.now() + datetime.timedelta(minutes=5)
+        self.client.post(self.scheduled_tweet.get_absolute_url(),
+                         {'time_to_tweet': time_to_tweet, 'text': 'boondocks', 'version': 0})
+        scheduled_tweet = ScheduledTweet.objects.get(pk=self.scheduled_tweet.id)
+        self.assertEqual(scheduled_tweet.version, 1)
+        self.assertIsNone(scheduled_tweet.task_id)
+        task_mock.apply_async.assert_not_called()
+
+    @mock.patch('twitterscheduler.views.tweet_task', autospec=True)
+    def test_edit_of_an_older_version_is_rejected(self, task_mock):
+        self.client.login(username='test_user1', password='nice_pass')
+        resp = self.client.get(self.scheduled_tweet.get_absolute_url())
+        self.assertEqual(resp.context['form']['version'].value(), 0)
+        # edited in another tab since the form was opened
+        ScheduledTweet.objects.filter(pk=self.scheduled_tweet.id).update(version=5)
+
+        time_to_tweet = datetime.datetime.now() + datetime.timedelta(minutes=5)
+        resp = self.client.post(self.scheduled_tweet.get_absolute_url(),
+                                {'time_to_tweet': time_to_tweet, 'text': 'boondocks', 'version': 0})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.context['form'].non_field_errors())
+        self.assertEqual(resp.context['form']['version'].value(), 5)
+        self.assertEqual(Tweet.objects.get(pk=self.tweet.id).text, 'nice tweet')
+        task_mock.apply_async.assert_not_called()
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('bob', password='nice_pass')
+        now = timezone.now()
+        # the first two records share a shard, the second adds to some of its counters and creates the rest
+        with mock.patch('twitterscheduler.metrics.random.randrange', side_effect=[0, 0, 1]):
+            for lag, failed, retries in [(0.2, False, 0), (3, False, 2), (None, True, 1)]:
+                save_post_record(PostRecord(tweet=Tweet.objects.create(user=user, text='nice tweet'),
+                                            time_to_tweet=now, lag=lag, api_latency=0.3, failed=failed,
+                                            retries=retries))
+        ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=user, text='late'),
+                                      time_to_tweet=now - datetime.timedelta(minutes=2))
+        ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=user, text='not due'),
+                                      time_to_tweet=now + datetime.timedelta(minutes=2))
+        failed = ScheduledTweet.objects.create(tweet=Tweet.objects.create(user=user, text='duplicate'),
+                                               time_to_tweet=now, status=ScheduledTweet.FAILED)
+        DeadLetter.objects.create(scheduled_tweet=failed, error='Status is a duplicate.', api_code=187)
+
+    def metrics_lines(self):
+        resp = self.client.get(reverse('twitterscheduler:metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(resp.status_code, 200)
+        return resp.content.decode().splitlines()
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics(self):
+        with self.assertNumQueries(3):
+            lines = self.metrics_lines()
+        self.assertIn('twitterscheduler_post_lag_seconds_bucket{le="0.25"} 1', lines)
+        self.assertIn('twitterscheduler_post_lag_seconds_bucket{le="5"} 2', lines)
+        self.assertIn('twitterscheduler_post_lag_seconds_bucket{le="+Inf"} 2', lines)
+        self.assertIn('twitterscheduler_post_lag_seconds_sum 3.2', lines)
+        self.assertIn('twitterscheduler_twitter_api_latency_seconds_count 3', lines)
+        self.assertIn('twitterscheduler_posts_total{result="posted"} 2', lines)
+        self.assertIn('twitterscheduler_posts_total{result="failed"} 1', lines)
+        self.assertIn('twitterscheduler_post_retries_total 2', lines)
+        self.assertIn('twitterscheduler_overdue_scheduled_tweets 1', lines)
+        self.assertIn('twitterscheduler_dead_letters 1', lines)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_requires_token(self):
+        self.assertEqual(self.client.get(reverse('twitterscheduler:metrics')).status_code, 403)
+        resp = self.client.get(reverse('twitterscheduler:metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(resp.status_code, 403)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_off_without_token(self):
+        self.assertEqual(self.client.get(reverse('twitterscheduler:metrics')).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_rebuilt_counters_match(self):
+        lines = [line for line in self.metrics_lines() if '_total' in line or '_bucket' in line]
+        MetricCounter.objects.all().delete()
+        self.assertEqual(rebuild_counters(), 3)
+        self.assertEqual([line for line in self.metrics_lines() if '_total' in line or '_bucket' in line], lines)
+
@@ -0,0 +1,50 @@
+"""
+Per user cache of the first pages of the index view's timelines, so repeat page views don't query them.
+Every user has a version in the cache that is part of the keys of their cached pages. Invalidating sets a new
+version, so the pages cached before are never read again and expire on their own.
+The cache has to be shared with the celery workers, which invalidate it as they post and sync tweets.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def version_key(user_id):
+    return f'timeline-version:{user_id}'
+
+
+def timeline_version(user_id):
+    version = cache.get(version_key(user_id))
+    if version is None:
+        cache.add(version_key(user_id), uuid.uuid4().hex, None)
+        version = cache.get(version_key(user_id))
+    return version
+
+
+def cached_timelines(user_id, **builds):
+    """
+    Returns a dict of the users timelines by name, read from the cache
+    or made by calling the build function given for them when they aren't cached.
+    """
+    version = timeline_version(user_id)
+    keys = {name: f'timeline:{user_id}:{version}:{name}' for name in builds}
+    cached = cache.get_many(keys.values())
+    timelines = {}
+    built = {}
+    for name, key in keys.items():
+        if key in cached:
+            timelines[name] = cached[key]
+        else:
+            timelines[name] = built[key] = builds[name]()
+    if built:
+        cache.set_many(built, settings.TIMELINE_CACHE_TIMEOUT)
+    return timelines
+
+
+def invalidate_timelines(user_ids):
+    """
+    Drops the cached timelines of the users.
+    Call it once changes to their tweets are committed, otherwise a page view in between can cache the old ones.
+    """
+    cache.set_many({version_key(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
@@ -6,6 +6,14 @@ app_name = 'twitterscheduler'
 
 urlpatterns = [
     url(r'^$', views.index, name='index'),
+    url(r'^tweets/$', views.load_more_tweets, name='load-more-tweets'),
+    url(r'^tweets/search/$', views.search_tweets, name='search-tweets'),
+    url(r'^tweets/export/$', views.export_tweets, name='export-tweets'),
+    url(r'^scheduled-tweets/$', views.load_more_scheduled_tweets, name='load-more-scheduled-tweets'),
     url(r'^tweet/create/$', views.create_scheduled_tweet, name='create-scheduled-tweet'),
+    url(r'^tweet/recurring/create/$', views.create_recurring_tweet, name='create-recurring-tweet'),
+    url(r'^tweet/import/$', views.import_scheduled_tweets, name='import-scheduled-tweets'),
     url(r'^scheduled-tweet/(?P<pk>\d+)/edit/$', views.update_scheduled_tweet, name='edit-scheduled-tweet'),
+    url(r'^best-times/$', views.best_times, name='best-times'),
+    url(r'^metrics/$', views.metrics, name='metrics'),
 ]
@@ -1,50 +1,133 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse, HttpResponseRedirect
+from django.http import (JsonResponse, HttpResponse, HttpResponseRedirect, HttpResponseBadRequest,
+                         HttpResponseForbidden, StreamingHttpResponse)
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.views.generic.edit import UpdateView
 
-from twitter_site.task_scheduler import app
+from .models import Tweet, ScheduledTweet, Profile, RecurringTweet
+from .forms import CreateScheduleTweetForm, ScheduledTweetUpdateForm, ImportScheduledTweetsForm, RecurringTweetForm
+from .importer import import_scheduled_tweets as import_tweets, format_for_filename
+from . import exporter
+from .analytics import best_times as user_best_times
+from .metrics import render_metrics
+from .pagination import paginate
+from .recurrence import next_occurrences
+from .search import search_tweets as search_user_tweets
+from .sentiment import classify_tweets
+from .timeline_cache import cached_timelines, invalidate_timelines
 
-from .models import Tweet, ScheduledTweet, Profile
-from .forms import CreateScheduleTweetForm, ScheduledTweetUpdateForm
-
-from .tasks import tweet_task, sync_tweets_task
+from .tasks import tweet_task, sync_tweets_task, schedule_occurrences
 
 import datetime
+import io
+
+from celery.utils import uuid
 
 
 @login_required
 def index(request):
-    profile = Profile.objects.get(user=request.user)
-    if not profile.synced_tweets_recently():
-        sync_tweets_task.delay(request.user.username)
+    if settings.SYNC_TWEETS_ON_PAGE_VIEW:
+        profile = Profile.objects.get(user=request.user)
+        if not profile.synced_tweets_recently() and profile.claim_sync():
+            sync_tweets_task.delay(request.user.username)
 
-    user_tweets = Tweet.objects.filter(user=request.user, is_posted=True)
-    scheduled_tweets = ScheduledTweet.objects.filter(tweet__user=request.user)
+    timelines = cached_timelines(request.user.id, user_tweets=lambda: paginate_user_tweets(request.user),
+                                 scheduled_tweets=lambda: paginate_scheduled_tweets(request.user))
+    user_tweets, next_tweets_cursor = timelines['user_tweets']
+    scheduled_tweets, next_scheduled_cursor = timelines['scheduled_tweets']
     context = {
         'user_tweets': user_tweets,
         'scheduled_tweets': scheduled_tweets,
+        'next_tweets_cursor': next_tweets_cursor,
+        'next_scheduled_cursor': next_scheduled_cursor,
     }
     return render(request, 'twitterscheduler/index.html', context=context)
 
 
+@login_required
+def load_more_tweets(request):
+    """Returns the next page of the users posted tweets as json."""
+    try:
+        tweets, next_cursor = paginate_user_tweets(request.user, request.GET.get('cursor'))
+    except (ValueError, OverflowError):
+        return HttpResponseBadRequest('invalid cursor')
+    return JsonResponse({
+        'tweets': [{'id': tweet.id, 'text': tweet.text, 'time_posted_at': tweet.time_posted_at} for tweet in tweets],
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+def search_tweets(request):
+    """Returns a page of the users posted tweets matching the q parameter as json, best matches first."""
+    try:
+        tweets, next_cursor = search_user_tweets(request.user, request.GET.get('q', ''), request.GET.get('cursor'),
+                                                 page_size=settings.TIMELINE_PAGE_SIZE)
+    except (ValueError, OverflowError):
+        return HttpResponseBadRequest('invalid cursor')
+    return JsonResponse({
+        'tweets': [{'id': tweet.id, 'text': tweet.text, 'time_posted_at': tweet.time_posted_at} for tweet in tweets],
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+def load_more_scheduled_tweets(request):
+    """Returns the next page of the users scheduled tweets as json."""
+    try:
+        scheduled_tweets, next_cursor = paginate_scheduled_tweets(request.user, request.GET.get('cursor'))
+    except (ValueError, OverflowError):
+        return HttpResponseBadRequest('invalid cursor')
+    return JsonResponse({
+        'scheduled_tweets': [
+            {
+                'id': scheduled.id,
+                'text': scheduled.tweet.text,
+                'time_to_tweet': scheduled.time_to_tweet,
+                'status': scheduled.status,
+                'edit_url': scheduled.get_absolute_url(),
+            }
+            for scheduled in scheduled_tweets
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
+def paginate_user_tweets(user, cursor=None):
+    return paginate(Tweet.objects.filter(user=user, is_posted=True), 'time_posted_at', cursor,
+                    page_size=settings.TIMELINE_PAGE_SIZE, descending=True)
+
+
+def paginate_scheduled_tweets(user, cursor=None):
+    scheduled_tweets = ScheduledTweet.objects.filter(tweet__user=user, status__in=ScheduledTweet.UNPOSTED)
+    return paginate(scheduled_tweets.select_related('tweet'), 'time_to_tweet', cursor,
+                    page_size=settings.TIMELINE_PAGE_SIZE)
+
+
 @login_required
 def create_scheduled_tweet(request):
     if request.method == 'POST':
-        tweet_form = CreateScheduleTweetForm(request.POST)
+        tweet_form = CreateScheduleTweetForm(request.POST, profile=Profile.objects.get(user=request.user))
         if tweet_form.is_valid():
-            new_tweet = Tweet.objects.create(user=request.user, text=tweet_form.cleaned_data['text'])
-            new_scheduled_tweet = ScheduledTweet.objects.create(tweet=new_tweet,
-                                                                time_to_tweet=tweet_form.cleaned_data['time_to_tweet'])
-            task = tweet_task.apply_async(
-                (request.user.username, new_scheduled_tweet.id),
-                eta=tweet_form.cleaned_data['time_to_tweet']
-            )
-            new_scheduled_tweet.task_id = task.id
-            new_scheduled_tweet.save()
+            # The task id is saved with the row and the task only sent once it is committed. Saving the id after
+            # sending would overwrite the status of a tweet the task already started posting.
+            task_id = uuid() if settings.TWEET_DISPATCH_MODE == 'eta' else None
+            with transaction.atomic():
+                new_tweet = Tweet(user=request.user, text=tweet_form.cleaned_data['text'])
+                classify_tweets([new_tweet])
+                new_tweet.save()
+                new_scheduled_tweet = ScheduledTweet.objects.create(
+                    tweet=new_tweet, time_to_tweet=tweet_form.cleaned_data['time_to_tweet'], task_id=task_id
+                )
+            if task_id:
+                tweet_task.apply_async((request.user.username, new_scheduled_tweet.id, new_scheduled_tweet.version),
+                                       eta=tweet_form.cleaned_data['time_to_tweet'], task_id=task_id)
 
             return HttpResponseRedirect(reverse('twitterscheduler:index'))
     else:
@@ -52,28 +135,114 @@ def create_scheduled_tweet(request):
     return render(request, 'twitterscheduler/create_scheduled_tweet.html', context={'tweet_form': tweet_form})
 
 
+@login_required
+def create_recurring_tweet(request):
+    """Creates a recurring tweet, or with the preview button only shows when it would be posted."""
+    occurrences = None
+    if request.method == 'POST':
+        form = RecurringTweetForm(request.POST, profile=Profile.objects.get(user=request.user))
+        if form.is_valid():
+            rule = RecurringTweet(user=request.user, **form.cleaned_data)
+            occurrences = next_occurrences(rule, settings.RECURRING_TWEET_PREVIEW_SIZE)
+            if not occurrences:
+                form.add_error(None, 'This tweet would never be posted, it ends before its next occurrence.')
+            elif 'preview' not in request.POST:
+                rule.next_occurrence = occurrences[0]
+                rule.save()
+                horizon = timezone.now() + datetime.timedelta(seconds=settings.RECURRING_TWEET_HORIZON)
+                schedule_occurrences(rule, horizon)
+                return HttpResponseRedirect(reverse('twitterscheduler:index'))
+    else:
+        form = RecurringTweetForm(initial={'starts_on': timezone.localtime().date(), 'time_of_day': '09:00'})
+    return render(request, 'twitterscheduler/create_recurring_tweet.html',
+                  context={'form': form, 'occurrences': occurrences})
+
+
 @login_required
 def update_scheduled_tweet(request, pk):
-    scheduled_tweet = get_object_or_404(ScheduledTweet, pk=pk, tweet__user=request.user)
+    scheduled_tweet = get_object_or_404(ScheduledTweet, pk=pk, tweet__user=request.user,
+                                        status__in=ScheduledTweet.EDITABLE)
     if request.method == 'POST':
-        form = ScheduledTweetUpdateForm(request.POST)
+        profile = Profile.objects.get(user=request.user)
+        form = ScheduledTweetUpdateForm(request.POST, profile=profile)
         if form.is_valid():
-            scheduled_tweet.time_to_tweet = form.cleaned_data['time_to_tweet']
-            scheduled_tweet.tweet.text = form.cleaned_data['text']
-            scheduled_tweet.tweet.save()
-
-            app.control.revoke(scheduled_tweet.task_id)
-            task = tweet_task.apply_async(
-                (request.user.username, scheduled_tweet.id),
-                eta=form.cleaned_data['time_to_tweet']
-            )
-            scheduled_tweet.task_id = task.id
-            scheduled_tweet.save()
+            # Bumping the version makes any task already sent for this tweet drop itself when it runs.
+            # The update only applies to the version the user opened the form for, so an edit made since,
+            # in another tab or by a concurrent request, isn't overwritten, and only while the tweet hasn't
+            # started posting.
+            version = form.cleaned_data['version'] + 1
+            task_id = uuid() if settings.TWEET_DISPATCH_MODE == 'eta' else None
+            with transaction.atomic():
+                updated = ScheduledTweet.objects.filter(
+                    pk=scheduled_tweet.pk, version=form.cleaned_data['version'], status__in=ScheduledTweet.EDITABLE
+                ).update(time_to_tweet=form.cleaned_data['time_to_tweet'], version=version, task_id=task_id,
+                         status=ScheduledTweet.PENDING, claimed_until=None)
+                if updated:
+                    scheduled_tweet.tweet.text = form.cleaned_data['text']
+                    classify_tweets([scheduled_tweet.tweet])
+                    scheduled_tweet.tweet.save()
+            if not updated:
+                # shown again for the current version, so saving it once more overwrites the other edit
+                data = request.POST.copy()
+                data['version'] = (ScheduledTweet.objects.filter(pk=scheduled_tweet.pk)
+                                   .values_list('version', flat=True).first())
+                form = ScheduledTweetUpdateForm(data, profile=profile)
+                form.is_valid()
+                form.add_error(None, 'This tweet was changed while you were editing it, please try again.')
+                return render(request, 'twitterscheduler/update_scheduled_tweet.html', context={'form': form})
+            invalidate_timelines([request.user.id])
+
+            if task_id:
+                tweet_task.apply_async((request.user.username, scheduled_tweet.id, version),
+                                       eta=form.cleaned_data['time_to_tweet'], task_id=task_id)
 
             return HttpResponseRedirect(reverse('twitterscheduler:index'))
     else:
         form = ScheduledTweetUpdateForm(initial={
             'time_to_tweet': scheduled_tweet.time_to_tweet,
-            'text': scheduled_tweet.tweet.text
+            'text': scheduled_tweet.tweet.text,
+            'version': scheduled_tweet.version,
         })
     return render(request, 'twitterscheduler/update_scheduled_tweet.html', context={'form': form})
+
+
+@login_required
+def best_times(request):
+    """When the user has tweeted the most, by hour of the week."""
+    week, busiest = user_best_times(request.user)
+    context = {'week': week, 'busiest': busiest, 'hours': range(24), 'time_zone': settings.TIME_ZONE}
+    return render(request, 'twitterscheduler/best_times.html', context=context)
+
+
+@login_required
+def import_scheduled_tweets(request):
+    result = None
+    if request.method == 'POST':
+        form = ImportScheduledTweetsForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            lines = io.TextIOWrapper(upload.file, encoding='utf-8', errors='replace', newline='')
+            result = import_tweets(request.user, lines, format_for_filename(upload.name))
+    else:
+        form = ImportScheduledTweetsForm()
+    return render(request, 'twitterscheduler/import_scheduled_tweets.html', context={'form': form, 'result': result})
+
+
+@login_required
+def export_tweets(request):
+    """Streams all of the users tweets and scheduled tweets as a csv file, or a json lines one with format=jsonl."""
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in exporter.FORMATS:
+        return HttpResponseBadRequest('invalid format')
+    response = StreamingHttpResponse(exporter.export_lines(request.user, file_format),
+                                     content_type=exporter.CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="tweets.{file_format}"'
+    return response
+
+
+def metrics(request):
+    """Posting metrics for prometheus to scrape. Requires the METRICS_TOKEN bearer token, and is off without one."""
+    if not settings.METRICS_TOKEN or not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''),
+                                                               f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')